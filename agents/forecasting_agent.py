@@ -163,7 +163,7 @@ class ForecastingAgent:
         ORDER BY date
         """
         
-        result = self.db_manager.execute_query(query, (item_id,))
+        result = self.db_manager.execute_query(query, (item_id,), use_cache=True)
         
         if not result.get("success", False) or result.get("data") is None:
             raise ValueError(f"No sales data found for item {item_id}")
@@ -402,7 +402,7 @@ class ForecastingAgent:
             
             # Get item description
             item_query = "SELECT description FROM item_dim WHERE item_id = ?"
-            item_result = self.db_manager.execute_query(item_query, (params['item_id'],))
+            item_result = self.db_manager.execute_query(item_query, (params['item_id'],), use_cache=True)
             if item_result.get("success", False) and not item_result["data"].empty:
                 item_name = item_result["data"]['description'].iloc[0]
             else:
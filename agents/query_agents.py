@@ -124,20 +124,19 @@ class ResponseFormatterAgent:
         if data is None or len(data) == 0:
             return "📭 No data found matching your query."
         
-        # Convert DataFrame to a more readable format
-        if hasattr(data, 'to_dict'):
-            data_dict = data.to_dict('records')
+        # Only a preview goes into the prompt; never convert the whole result
+        if hasattr(data, 'head'):
             data_preview = str(data.head(10)) if len(data) > 10 else str(data)
         else:
-            data_dict = data
             data_preview = str(data)
+        row_count = f"{len(data)}+ (result truncated at this size)" if query_result.get("truncated") else len(data)
         
         prompt = f"""
 You are a retail data analyst AI. Based on the user's question and query results, provide a comprehensive analytical response.
 
 User Question: {question}
 Query Executed: {query_info.get('query', 'N/A') if query_info else 'N/A'}
-Number of Rows Returned: {len(data)}
+Number of Rows Returned: {row_count}
 
 Query Results Preview:
 {data_preview}
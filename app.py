@@ -17,7 +17,13 @@ pip install -U streamlit langgraph openai typing_extensions pydantic pandas nump
 #    src/utils.py     -> ensure_dirs, get_data_paths, logger
 #    src/cleaning.py  -> clean_inventory_df, save_cleaned_inventory
 #    src/forecast.py  -> compute_reorder_plan
+#    src/reorder_plan.py -> shared_plan_table (incrementally maintained reorder plan)
+#    src/safety_stock.py -> service-level safety stock from DuckDB demand sigma
+#    src/reorder_sql.py -> reorder_plan view (sort/page/export inside DuckDB)
 #    src/detect.py    -> detect_shelf_gaps
+#    src/gap_cache.py -> default_cache (content-addressed result cache)
+#    src/gap_batch.py -> iter_gap_scores (bounded thread-pool scoring)
+#    src/gap_pyramid.py -> enable_pyramids (pre-decoded image levels + thumbnails)
 #    src/tools.py     -> tool_load_inventory, tool_lookup_sku, tool_reorder_plan, tool_detect_gap
 
 # 3) Environment
@@ -56,8 +62,16 @@ from langgraph.graph.message import add_messages
 # --- Project utils (user-provided) ---
 from src.utils import ensure_dirs, get_data_paths
 from src.cleaning import clean_inventory_df, save_cleaned_inventory
-from src.forecast import compute_reorder_plan
-from src.detect import detect_shelf_gaps
+from src.reorder_plan import shared_plan_table
+from src.inventory_snapshot import default_snapshot_cache
+from src.search_index import shared_index
+from src.reorder_sql import create_reorder_plan_view, query_reorder_plan, count_reorder_plan, export_reorder_plan
+from src.safety_stock import default_sigma_cache, with_service_level_safety_stock
+from db.database_manager import DatabaseManager
+from db.query_cache import bump_table_version
+from src.gap_batch import iter_gap_scores
+from src.gap_cache import default_cache
+from src.gap_pyramid import enable_pyramids
 
 # ------ Project tools (reused in agent) ------
 from src.tools import (
@@ -76,6 +90,8 @@ st.title("Backroom — Inventory Intelligence")
 # Prepare data directories and known paths
 ensure_dirs()
 DATA_RAW, DATA_PROCESSED, SHELVES = get_data_paths()
+# Re-scoring and browsing saved shelves read pre-built pyramid levels instead of full decodes
+PYRAMIDS = enable_pyramids()
 
 # =============================
 # DuckDB helper (uses Python module, not JS)
@@ -125,9 +141,16 @@ class DB:
                     image TEXT,
                     gap_score DOUBLE,
                     notes TEXT,
-                    created_at TIMESTAMP DEFAULT current_timestamp
+                    created_at TIMESTAMP DEFAULT current_timestamp,
+                    bands TEXT
                 );
             """)
+            # Older databases predate per-shelf bands
+            cls.con.execute("ALTER TABLE shelf_gaps ADD COLUMN IF NOT EXISTS bands TEXT;")
+            try:
+                create_reorder_plan_view(cls.con)
+            except Exception as e:
+                logging.warning("reorder_plan view unavailable: %s", e)
             cls.con.execute("""
                 CREATE TABLE IF NOT EXISTS chat_logs (
                     role TEXT,
@@ -149,6 +172,11 @@ class DB:
         cls.con.register("df_inv", df)
         cls.con.execute("CREATE OR REPLACE TABLE inventory AS SELECT * FROM df_inv;")
         cls.con.unregister("df_inv")
+        # the view's SQL depends on which optional columns (safety_stock, days_of_cover) exist
+        create_reorder_plan_view(cls.con)
+        # chat tools reload their in-memory inventory snapshot on next call
+        default_snapshot_cache().invalidate()
+        bump_table_version(cls.db_path, "inventory")
 
     @classmethod
     def read_inventory_df(cls) -> pd.DataFrame | None:
@@ -160,14 +188,37 @@ class DB:
             return None
 
     @classmethod
-    def insert_shelf_gap(cls, image: str, gap_score: float, notes: str):
+    def insert_shelf_gap(cls, image: str, gap_score: float, notes: str, bands: str = "[]"):
+        """bands: compact JSON from GapResult.bands_json() ([[top, bottom, gap_score], ...])."""
         if not cls.enabled:
             return
         cls.con.execute(
-            "INSERT INTO shelf_gaps(image, gap_score, notes) VALUES (?, ?, ?)",
-            [image, float(gap_score), str(notes or "")],
+            "INSERT INTO shelf_gaps(image, gap_score, notes, bands) VALUES (?, ?, ?, ?)",
+            [image, float(gap_score), str(notes or ""), bands or "[]"],
         )
 
+    @classmethod
+    def insert_shelf_gaps(cls, rows: List[dict]):
+        """Bulk insert of shelf-gap rows (image, gap_score, notes, bands) in one statement."""
+        if not cls.enabled or not rows:
+            return
+        df = pd.DataFrame(
+            {
+                "image": [r["image"] for r in rows],
+                "gap_score": [float(r["gap_score"]) for r in rows],
+                "notes": [str(r.get("notes") or "") for r in rows],
+                "bands": [r.get("bands") or "[]" for r in rows],
+            }
+        )
+        cls.con.register("df_gaps", df)
+        try:
+            cls.con.execute(
+                "INSERT INTO shelf_gaps(image, gap_score, notes, bands) "
+                "SELECT image, gap_score, notes, bands FROM df_gaps;"
+            )
+        finally:
+            cls.con.unregister("df_gaps")
+
     @classmethod
     def log_chat(cls, role: str, content: str):
         if not cls.enabled:
@@ -349,48 +400,135 @@ elif page == "Forecast":
     processed_fp_csv = DATA_PROCESSED / "inventory_clean.csv"
     processed_fp_parq = DATA_PROCESSED / "inventory_clean.parquet"
 
-    # Prefer DuckDB inventory, else local files
-    df = DB.read_inventory_df() if DB.enabled else None
-    if df is None:
-        if processed_fp_parq.exists():
-            df = pd.read_parquet(processed_fp_parq)
-        elif processed_fp_csv.exists():
-            df = pd.read_csv(processed_fp_csv)
-        else:
-            st.warning("No processed data yet. Upload & clean first.")
+    ss_mode = st.radio("Safety stock", ["Flat (days)", "Service level"], horizontal=True)
+    has_db_inventory = False
+    if DB.enabled:
+        try:
+            has_db_inventory = count_reorder_plan(DB.con)["skus"] > 0
+        except Exception:
+            pass  # no reorder_plan view (e.g. legacy inventory columns): plan from pandas below
+
+    if has_db_inventory and ss_mode == "Flat (days)":
+        # Plan computed by the `reorder_plan` view: sort, filter and paging run in DuckDB,
+        # so only the visible page reaches pandas.
+        c1, c2, c3 = st.columns([2, 1, 1])
+        search = c1.text_input("Filter by SKU / product", "").strip() or None
+        flagged_only = c2.checkbox("Needs reorder only", value=False)
+        page_size = int(c3.selectbox("Rows per page", [50, 200, 1000], index=1))
+        counts = count_reorder_plan(DB.con, search=search)
+        total = counts["flagged"] if flagged_only else counts["skus"]
+        pages = max(1, -(-total // page_size))
+        page_no = int(st.number_input("Page", min_value=1, max_value=pages, value=1, step=1))
+        st.dataframe(
+            query_reorder_plan(DB.con, limit=page_size, offset=(page_no - 1) * page_size,
+                               flagged_only=flagged_only, search=search),
+            width='stretch',
+        )
+        st.caption(f"{counts['flagged']} of {counts['skus']} SKUs need reordering · page {page_no}/{pages}")
+        fmt = st.radio("Export format", ["csv", "parquet"], horizontal=True)
+        if st.button("Prepare plan export"):
+            out = export_reorder_plan(DB.con, DATA_PROCESSED / f"reorder_plan.{fmt}",
+                                      flagged_only=flagged_only, search=search)
+            st.download_button(f"Download Reorder Plan {fmt.upper()}", data=out.read_bytes(), file_name=out.name)
+    else:
+        # Local files (or service-level safety stock, which joins per-SKU sigma in pandas)
+        df = DB.read_inventory_df() if DB.enabled else None
+        plan_source = ("duckdb", DB.db_path)
+        if df is None:
+            if processed_fp_parq.exists():
+                df = pd.read_parquet(processed_fp_parq)
+                plan_source = ("file", str(processed_fp_parq))
+            elif processed_fp_csv.exists():
+                df = pd.read_csv(processed_fp_csv)
+                plan_source = ("file", str(processed_fp_csv))
+            else:
+                st.warning("No processed data yet. Upload & clean first.")
 
-    if isinstance(df, pd.DataFrame):
-        plan = compute_reorder_plan(df)
-        st.dataframe(plan, width='stretch')  # <- updated
-        csv = plan.to_csv(index=False).encode("utf-8")
-        st.download_button("Download Reorder Plan CSV", data=csv, file_name="reorder_plan.csv")
+        if isinstance(df, pd.DataFrame):
+            service_level_applied = False
+            if ss_mode == "Service level":
+                level = st.slider("Target service level", 0.80, 0.995, 0.95, 0.005)
+                try:
+                    # sigma of daily demand for all SKUs from one aggregate over `sales`, cached per watermark
+                    sigma = default_sigma_cache().get(DatabaseManager())
+                    df = with_service_level_safety_stock(df, sigma, service_level=level)
+                    service_level_applied = True
+                    st.caption(f"z·σ·√lead_time safety stock for {df['sku'].astype(str).isin(sigma['item_id']).sum()} "
+                               f"SKUs with sales history; others keep the flat default.")
+                except Exception as e:
+                    st.warning(f"Service-level safety stock unavailable, using flat default: {e}")
+
+            # Incrementally maintained plan: only SKUs that changed since the last load are recomputed.
+            # One table per data source (the chat tools plan from the processed file) and per safety-stock
+            # mode, so no reader is served a plan synced from other data.
+            table = shared_plan_table((*plan_source, "service_level") if service_level_applied else plan_source)
+            table.sync(df)
+            top_n = st.number_input("Show top N by reorder quantity", min_value=10, max_value=max(10, len(table)),
+                                    value=min(200, max(10, len(table))), step=10)
+            st.dataframe(table.top_n(int(top_n)), width='stretch')  # <- updated
+            ps = table.stats
+            st.caption(f"{ps['flagged']} of {ps['skus']} SKUs need reordering")
+            if st.button("Prepare full plan CSV"):
+                csv = table.to_frame().to_csv(index=False).encode("utf-8")
+                st.download_button("Download Reorder Plan CSV", data=csv, file_name="reorder_plan.csv")
 
 elif page == "Shelf Gaps (Vision)":
     st.subheader("Shelf Gap Detection (Demo Stub)")
     st.markdown("Upload shelf images to detect likely gaps (demo uses a lightweight heuristic).")
     imgs = st.file_uploader("Shelf images", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
     if imgs:
-        results = []
+        # Save uploads to shelves/ first (cheap), then decode + score on a bounded
+        # thread pool; rows show up as each image finishes instead of at the end.
+        uploads = []
         for f in imgs:
-            # Save to shelves/ and run stub detector
-            out = SHELVES / f.name
-            out.write_bytes(f.read())
-            gaps = detect_shelf_gaps(out)
-            row = {
-                "image": f.name,
-                "gap_score": float(gaps.get("gap_score", 0.0)),
-                "notes": gaps.get("notes", ""),
-            }
-            results.append(row)
-
-            # NEW: persist result to DuckDB if available
-            if DB.enabled:
-                try:
-                    DB.insert_shelf_gap(row["image"], row["gap_score"], row["notes"])
-                except Exception as e:
-                    st.warning(f"Could not persist shelf gap for {f.name}: {e}")
+            data = f.getvalue()
+            (SHELVES / f.name).write_bytes(data)
+            uploads.append((f.name, data))
+        # thumbnails + grayscale levels for later browsing / re-analysis
+        PYRAMIDS.build_async([SHELVES / name for name, _ in uploads])
 
-        st.dataframe(pd.DataFrame(results), width='stretch')  # <- updated
+        results = []
+        progress = st.progress(0.0, text=f"Scoring {len(uploads)} image(s)…")
+        table = st.empty()
+        for name, gaps in iter_gap_scores(uploads, cache=default_cache()):
+            results.append({
+                "image": name,
+                "gap_score": float(gaps.gap_score),
+                "notes": gaps.notes,
+                # per-shelf scores, top to bottom (local mode)
+                "shelf_bands": ", ".join(f"{b.gap_score:.2f}" for b in gaps.bands),
+                "bands": gaps.bands_json(),
+            })
+            progress.progress(len(results) / len(uploads), text=f"Scored {len(results)}/{len(uploads)}")
+            table.dataframe(pd.DataFrame(results).drop(columns=["bands"]), width='stretch')
+        progress.empty()
+
+        # Persist the whole upload in one DuckDB insert
+        if DB.enabled:
+            try:
+                DB.insert_shelf_gaps(results)
+            except Exception as e:
+                st.warning(f"Could not persist shelf gaps: {e}")
+
+        cs = default_cache().stats
+        st.caption(f"Result cache: {cs['hits'] + cs['disk_hits']} hits / {cs['misses']} misses")
+
+    with st.expander("Saved shelf images"):
+        saved = sorted(
+            (p for p in SHELVES.glob("*") if p.suffix.lower() in {".jpg", ".jpeg", ".png"}),
+            key=lambda p: p.stat().st_mtime, reverse=True,
+        )[:24]
+        thumbs, missing = [], []
+        for p in saved:
+            t = PYRAMIDS.thumbnail(p, 128, build=False)
+            (thumbs if t is not None else missing).append((p, t))
+        if missing:
+            PYRAMIDS.build_async([p for p, _ in missing])
+            st.caption(f"Building thumbnails for {len(missing)} image(s)…")
+        if thumbs:
+            st.image([str(t) for _, t in thumbs], caption=[p.name for p, _ in thumbs], width=128)
+        elif not saved:
+            st.caption("No saved shelf images yet.")
 
 elif page == "Admin (DB Browser)":
     st.subheader("🗄️ Admin — Browse DuckDB Tables")
@@ -411,13 +549,15 @@ elif page == "Admin (DB Browser)":
                 top_n = st.number_input("Max rows", 50, 5000, 500, step=50)
             df_view = inv
             if q:
-                q_lower = q.lower()
-                mask = inv["sku"].astype(str).str.lower().str.contains(q_lower) | inv["product_name"].astype(str).str.lower().str.contains(q_lower)
-                df_view = inv[mask]
+                # n-gram index built once per inventory version (bumped on every upsert), ranked results;
+                # a filter (and its CSV export) only lists rows that actually contain the query
+                idx = shared_index(("duckdb", DB.db_path, default_snapshot_cache().version), inv)
+                df_view = idx.search_frame(inv, q, limit=len(inv), fuzzy=False)
             st.dataframe(df_view.head(int(top_n)), width='stretch')  # <- updated
             st.download_button(
                 "⬇️ Download inventory (CSV)",
-                data=df_view.to_csv(index=False).encode("utf-8"),
+                # every match, not just the rows displayed
+                data=df_view.drop(columns="match_score", errors="ignore").to_csv(index=False).encode("utf-8"),
                 file_name="inventory_admin_export.csv",
                 mime="text/csv"
             )
@@ -0,0 +1,167 @@
+# db/async_database.py
+"""
+Async facade over DatabaseManager for the FastAPI service.
+
+DuckDB calls block, so running them inside ``async def`` endpoints would stall
+the event loop. AsyncDatabase runs each query on its own bounded thread pool:
+
+- at most ``max_concurrent`` queries execute at once (the rest wait on a
+  semaphore, in arrival order), which keeps one chatty client from
+  occupying every pooled cursor and every DuckDB worker thread,
+- cancelling the awaiting task (timeout, client disconnect) interrupts the
+  running statement on its cursor instead of letting it finish unobserved.
+
+Results are the same dicts DatabaseManager.execute_query returns; an
+interrupted query raises asyncio.CancelledError in the caller.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from db.database_manager import DatabaseManager
+
+__all__ = ["AsyncDatabase"]
+
+
+class _Running:
+    """Cursor of one in-flight query, so another thread can interrupt it."""
+
+    def __init__(self):
+        self.con = None
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def attach(self, con) -> bool:
+        with self._lock:
+            self.con = con
+            return not self.cancelled
+
+    def detach(self) -> None:
+        with self._lock:
+            self.con = None
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            if self.con is not None:
+                self.con.interrupt()
+
+
+class AsyncDatabase:
+    """
+    Awaitable query API on a bounded thread pool.
+
+    Parameters
+    ----------
+    db : DatabaseManager
+        Manager whose pooled cursors the queries run on; its pool_size should be
+        at least `max_concurrent`.
+    max_concurrent : int
+        Queries executing at once; also the thread-pool size.
+    timeout : float | None
+        Default per-query timeout in seconds (None = no limit).
+    """
+
+    def __init__(self, db: DatabaseManager, *, max_concurrent: int = 4, timeout: Optional[float] = None):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be >= 1")
+        self.db = db
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queries = 0
+        self.running = 0
+        self.waiting = 0
+        self.cancelled = 0
+        self.timeouts = 0
+
+    # ---------- lifecycle ----------
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # semaphores belong to the loop they were first awaited on
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+            self._loop = loop
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="duckdb-async")
+
+    async def close(self) -> None:
+        """Shut the thread pool down (queries already running finish first)."""
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.get_running_loop().run_in_executor(None, pool.shutdown)
+
+    # ---------- public API ----------
+
+    def _run(self, running: _Running, query: str, params, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            with self.db.get_connection(write=self.db.is_write(query)) as con:
+                if not running.attach(con):
+                    return {"success": False, "error": "cancelled", "data": None, "row_count": 0}
+                try:
+                    return self.db.execute_query(query, params, con=con, **kwargs)
+                finally:
+                    running.detach()
+        except Exception as e:      # opening the database / borrowing a cursor failed
+            return {"success": False, "error": str(e), "data": None, "row_count": 0}
+
+    async def execute_query(self, query: str, params=None, *, timeout: Optional[float] = None,
+                            **kwargs: Any) -> Dict[str, Any]:
+        """
+        Run DatabaseManager.execute_query(query, params, **kwargs) off the event loop.
+
+        Raises asyncio.TimeoutError after `timeout` seconds (default: the
+        instance timeout) and asyncio.CancelledError when the awaiting task is
+        cancelled; in both cases the statement is interrupted first.
+        """
+        self._ensure_started()
+        self.queries += 1
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.waiting -= 1
+        running = _Running()
+        self.running += 1
+        try:
+            fut = asyncio.get_running_loop().run_in_executor(self._pool, self._run, running, query, params, kwargs)
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                return await asyncio.wait_for(asyncio.shield(fut), remaining)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                running.cancel()
+                await asyncio.gather(fut, return_exceptions=True)
+                raise
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                running.cancel()
+                # keep the slot until the worker has actually stopped
+                await asyncio.gather(fut, return_exceptions=True)
+                raise
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "queries": self.queries,
+            "running": self.running,
+            "waiting": self.waiting,
+            "cancelled": self.cancelled,
+            "timeouts": self.timeouts,
+        }
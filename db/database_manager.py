@@ -1,23 +1,497 @@
 import duckdb
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, FrozenSet, Iterator, Optional, Tuple, Union
+from contextlib import contextmanager, nullcontext
 import os
+import re
+import threading
+import time
+
+from db.query_cache import QueryResultCache, default_result_cache, is_single_read, referenced_names
+
+# Statement types allowed through a read-only DatabaseManager
+_READ_STATEMENTS = {"SELECT", "EXPLAIN", "PRAGMA"}
+
+# Streaming fetch unit: DuckDB vectors hold 2048 rows, so 32 vectors = 65,536 rows per chunk
+_CHUNK_VECTORS = 32
+_BATCH_ROWS = 2048 * _CHUNK_VECTORS
+
+
+# Seconds a pool may sit with nothing borrowed before it closes its instance and
+# releases the file lock (None = keep it open until close_pools())
+POOL_IDLE_TIMEOUT: Optional[float] = float(os.getenv("DUCKDB_POOL_IDLE_S", "10")) or None
+
+# Seconds to wait for the file lock held by another process (and, for writes, for
+# this process's borrowed read cursors to come back) before giving up
+LOCK_TIMEOUT: float = float(os.getenv("DUCKDB_LOCK_TIMEOUT_S", "30"))
+
+
+def _connect(db_path: str, read_only: bool, deadline: float) -> duckdb.DuckDBPyConnection:
+    """duckdb.connect, retrying while another process holds a conflicting lock on the file."""
+    delay = 0.01
+    while True:
+        try:
+            return duckdb.connect(db_path, read_only=read_only)
+        except duckdb.IOException as e:
+            if "lock" not in str(e).lower() or time.monotonic() + delay > deadline:
+                raise
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+
+
+class ConnectionPool:
+    """
+    Cursors over one persistent DuckDB database instance.
+
+    Opening a DuckDB file re-attaches the database and starts with cold caches,
+    so instead of connect() per query the pool keeps one root connection and
+    hands out up to `size` cursors (each cursor is an independent connection to
+    the same database, safe to use from its borrowing thread).
+
+    File databases are opened read-only, so any number of processes (the
+    Streamlit app, the API, scripts) can read the same file at once. DuckDB
+    allows a single writer per file, and a read-write instance locks out every
+    other process, readers included, so writes never go through the pooled
+    instance: write_connection() waits for the borrowed cursors to come back,
+    closes the instance, and holds a read-write connection only for the
+    duration of the write. While another process has the file open
+    read-write, opens wait up to `lock_timeout` seconds for it; a writer also
+    waits for other processes' pools to go idle. After `idle_timeout` seconds
+    with no cursor borrowed the pool closes its instance, releasing the lock,
+    and the next acquire() reopens it.
+
+    ":memory:" databases are private to the process and stay read-write; writes
+    run on a pooled cursor.
+    """
+
+    def __init__(self, db_path: str, size: int = 4, idle_timeout: Optional[float] = POOL_IDLE_TIMEOUT,
+                 lock_timeout: float = LOCK_TIMEOUT):
+        self.db_path = db_path
+        self.read_only = db_path != ":memory:"
+        self.size = max(1, int(size))
+        self.idle_timeout = idle_timeout
+        self.lock_timeout = lock_timeout
+        self._root: Optional[duckdb.DuckDBPyConnection] = None
+        self._idle: List[duckdb.DuckDBPyConnection] = []
+        self._created = 0
+        self._borrowed = 0
+        self._writing = False
+        self._last_used = 0.0
+        self._reaper: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._write_lock = threading.Lock()
+        self.generation = 0       # bumped every time the instance is (re)opened
+        self.acquired = 0
+        self.waits = 0
+        self.writes = 0
+        self.idle_closes = 0
+
+    def _open(self) -> None:
+        # caller holds self._lock
+        self._root = _connect(self.db_path, self.read_only, time.monotonic() + self.lock_timeout)
+        self.generation += 1
+
+    def acquire(self, timeout: Optional[float] = None) -> duckdb.DuckDBPyConnection:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        with self._cond:
+            while True:
+                if not self._writing:
+                    if self._idle:
+                        cur = self._idle.pop()
+                        break
+                    if self._created < self.size:
+                        if self._root is None:
+                            self._open()
+                        cur = self._root.cursor()
+                        self._created += 1
+                        break
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No DuckDB connection available within {timeout}s (pool size {self.size})")
+                self._cond.wait(remaining)
+            self._borrowed += 1
+            self.acquired += 1
+            return cur
+
+    def release(self, cur: duckdb.DuckDBPyConnection, discard: bool = False) -> None:
+        with self._cond:
+            self._borrowed -= 1
+            if discard:
+                self._created -= 1
+            else:
+                self._idle.append(cur)
+            self._last_used = time.monotonic()
+            if not self._borrowed and self.idle_timeout is not None and self._reaper is None:
+                self._schedule_reaper(self.idle_timeout)
+            self._cond.notify_all()
+        if discard:
+            try:
+                cur.close()
+            except Exception:
+                pass
+
+    @contextmanager
+    def write_connection(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """
+        A read-write connection for the duration of a `with` block.
+
+        Writes in this process run one at a time; new acquire() calls wait
+        until the block ends. Raises TimeoutError if the cursors borrowed in
+        this process are not all released within `lock_timeout` (a thread that
+        holds a read cursor while writing would wait on itself).
+        """
+        if not self.read_only:
+            cur = self.acquire(self.lock_timeout)
+            try:
+                yield cur
+            finally:
+                self.release(cur)
+            return
+        deadline = time.monotonic() + self.lock_timeout
+        if not self._write_lock.acquire(timeout=self.lock_timeout):
+            raise TimeoutError(f"Another write to {self.db_path} did not finish within {self.lock_timeout}s")
+        try:
+            with self._cond:
+                self._writing = True
+                while self._borrowed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._writing = False
+                        self._cond.notify_all()
+                        raise TimeoutError(f"DuckDB cursors still borrowed after {self.lock_timeout}s; cannot write")
+                    self._cond.wait(remaining)
+                self._close_instance()
+            try:
+                con = _connect(self.db_path, False, deadline)
+                try:
+                    yield con
+                finally:
+                    con.close()
+                    self.writes += 1
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+        finally:
+            self._write_lock.release()
+
+    def _schedule_reaper(self, delay: float) -> None:
+        # caller holds self._lock; one timer at a time, re-armed while the pool stays busy
+        self._reaper = threading.Timer(delay, self._reap)
+        self._reaper.daemon = True
+        self._reaper.start()
+
+    def _reap(self) -> None:
+        with self._lock:
+            self._reaper = None
+            if self._root is None:
+                return
+            if self._borrowed:
+                return              # the next release re-arms the timer
+            remaining = self._last_used + self.idle_timeout - time.monotonic()
+            if remaining > 0:
+                self._schedule_reaper(remaining)
+                return
+            self._close_instance()
+            self.idle_closes += 1
+
+    def _close_instance(self) -> None:
+        # caller holds self._lock
+        for cur in self._idle:
+            cur.close()
+        self._idle.clear()
+        self._created = self._borrowed
+        if self._root is not None:
+            self._root.close()
+            self._root = None
+
+    def resize(self, size: int) -> None:
+        with self._cond:
+            self.size = max(self.size, int(size))
+            self._cond.notify_all()
+
+    @property
+    def borrowed(self) -> int:
+        return self._borrowed
+
+    def close(self) -> None:
+        with self._lock:
+            if self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+            self._close_instance()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "open": self._created,
+            "borrowed": self._borrowed,
+            "acquired": self.acquired,
+            "waits": self.waits,
+            "writes": self.writes,
+            "read_only": self.read_only,
+            "instance_open": self._root is not None,
+            "idle_closes": self.idle_closes,
+        }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, size: int = 4) -> ConnectionPool:
+    """
+    Process-wide pool per database file.
+
+    DuckDB allows one configuration per file in a process, so every manager of
+    a file shares one pool and one read-only instance, and writes from every
+    manager go through its write_connection() (see ConnectionPool); a pool is
+    never closed underneath its users except by close_pools().
+    """
+    key = _db_key(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_path, size=size)
+        else:
+            pool.resize(size)
+        return pool
+
+
+def close_pools() -> None:
+    """Close every pooled database (e.g. before deleting or replacing the files)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# Catalog fingerprint: one scalar over every column of every table/view in the main schema
+_CATALOG_FINGERPRINT_SQL = """
+SELECT md5(coalesce(string_agg(table_name || '.' || column_name || ':' || data_type, ','
+                               ORDER BY table_name, column_index), ''))
+FROM duckdb_columns()
+WHERE schema_name = 'main' AND database_name = current_database()
+"""
+_DDL_RE = re.compile(r"\b(CREATE|DROP|ALTER|ATTACH|DETACH|IMPORT)\b", re.IGNORECASE)
+
+# db file -> (catalog fingerprint, summary); shared by every manager of that file
+_schema_cache: Dict[str, tuple] = {}
+_schema_lock = threading.Lock()
+_schema_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _db_key(db_path: str) -> str:
+    return db_path if db_path == ":memory:" else os.path.abspath(db_path)
+
+
+def _arrow_reader(con, batch_rows: int):
+    """RecordBatchReader over the cursor's pending result (to_arrow_reader in DuckDB >= 1.4)."""
+    reader = getattr(con, "to_arrow_reader", None) or con.fetch_record_batch
+    return reader(batch_rows)
+
+
+_VIEWS_SQL = """
+SELECT lower(view_name), sql FROM duckdb_views()
+WHERE NOT internal AND database_name = current_database()
+"""
+
+
+def _view_tables(con, query: str) -> FrozenSet[str]:
+    """Names read by the views `query` mentions, following views of views."""
+    views = {name: sql for name, sql in con.execute(_VIEWS_SQL).fetchall()}
+    if not views:
+        return frozenset()
+    out, todo = set(), [n for n in referenced_names(query) if n in views]
+    seen = set(todo)
+    while todo:
+        for name in referenced_names(views[todo.pop()]):
+            out.add(name)
+            if name in views and name not in seen:
+                seen.add(name)
+                todo.append(name)
+    return frozenset(out)
+
+
+def invalidate_schema_cache(db_path: Optional[str] = None) -> None:
+    """Drop cached schema summaries (one file, or all when db_path is None)."""
+    with _schema_lock:
+        if db_path is None:
+            _schema_cache.clear()
+        else:
+            _schema_cache.pop(_db_key(db_path), None)
+        _schema_stats["invalidations"] += 1
+
+
+def schema_cache_stats() -> Dict[str, int]:
+    with _schema_lock:
+        return {"entries": len(_schema_cache), **_schema_stats}
+
 
 class DatabaseManager:
     """Manages DuckDB database connections and queries for retail data."""
     
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, read_only: bool = False, pool_size: int = 4,
+                 result_cache: Union[bool, QueryResultCache] = False):
+        """
+        Args:
+            db_path: DuckDB file (default notebooks/retail.duckdb)
+            read_only: Only allow SELECT / EXPLAIN / PRAGMA statements (query traffic);
+                such a manager never opens the file read-write
+            pool_size: Max concurrent cursors on the shared (read-only) database instance
+            result_cache: Serve repeated read queries from memory (True = the process-wide
+                default_result_cache(), or a QueryResultCache instance)
+        """
         # Default to the retail.duckdb in the notebooks directory
         if db_path is None:
             base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             self.db_path = os.path.join(base_dir, "notebooks", "retail.duckdb")
         else:
             self.db_path = db_path
+        self.read_only = read_only
+        self.pool_size = pool_size
+        if result_cache is True:
+            result_cache = default_result_cache()
+        self.result_cache: Optional[QueryResultCache] = result_cache or None
     
-    def get_connection(self):
-        """Get a DuckDB connection."""
-        return duckdb.connect(self.db_path)
+    @property
+    def pool(self) -> ConnectionPool:
+        return get_pool(self.db_path, size=self.pool_size)
+
+    def is_write(self, query: str) -> bool:
+        """Whether execute_query runs `query` on a read-write connection."""
+        return not self.read_only and not is_single_read(query)
+
+    @contextmanager
+    def get_connection(self, write: bool = False):
+        """
+        Borrow a pooled DuckDB cursor for the duration of a `with` block.
+
+        The pooled instance of a database file is read-only; `write=True` yields
+        a read-write connection instead, held exclusively for the block (see
+        ConnectionPool.write_connection). Don't hold a read cursor in the same
+        thread while asking for one.
+        """
+        pool = self.pool
+        if write:
+            if self.read_only:
+                raise PermissionError("Write connections are not available on a read-only DatabaseManager")
+            with pool.write_connection() as con:
+                yield con
+            return
+        cur = pool.acquire()
+        discard = False
+        try:
+            yield cur
+        except (duckdb.ConnectionException, duckdb.FatalException):
+            discard = True
+            raise
+        finally:
+            pool.release(cur, discard=discard)
+
+    def _check_read_only(self, con, query: str) -> None:
+        if not self.read_only:
+            return
+        for stmt in con.extract_statements(query):
+            if stmt.type.name not in _READ_STATEMENTS:
+                raise PermissionError(f"{stmt.type.name} statements are not allowed on a read-only DatabaseManager")
     
+    def _run(self, con, query: str, params=None):
+        self._check_read_only(con, query)
+        return con.execute(query, params) if params else con.execute(query)
+
+    @staticmethod
+    def _fetch_capped(con, max_rows: Optional[int], max_bytes: Optional[int]) -> Tuple[pd.DataFrame, bool]:
+        """
+        Stream the pending result in chunks until it ends or a bound is hit.
+
+        Returns (frame, truncated). The rest of the result is never fetched;
+        DuckDB stops producing it when the cursor runs its next statement.
+        """
+        chunks: List[pd.DataFrame] = []
+        rows = size = 0
+        truncated = False
+        while True:
+            chunk = con.fetch_df_chunk(_CHUNK_VECTORS)
+            if len(chunk) == 0:
+                if not chunks:
+                    chunks.append(chunk)        # keep the column layout of an empty result
+                break
+            if max_rows is not None and rows + len(chunk) > max_rows:
+                chunks.append(chunk.iloc[: max_rows - rows])
+                truncated = True
+                break
+            if max_bytes is not None:
+                chunk_bytes = int(chunk.memory_usage(index=False, deep=True).sum())
+                if size + chunk_bytes > max_bytes:
+                    fit = int(len(chunk) * (max_bytes - size) / max(chunk_bytes, 1))
+                    chunks.append(chunk.iloc[:fit])
+                    truncated = True
+                    break
+                size += chunk_bytes
+            chunks.append(chunk)
+            rows += len(chunk)
+            if max_rows is not None and rows == max_rows:
+                # exactly at the cap: truncated only if anything follows
+                truncated = len(con.fetch_df_chunk(1)) > 0
+                break
+        data = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+        return data.reset_index(drop=True), truncated
+
+    def fetch_row(self, query: str, params=None) -> Optional[Dict[str, Any]]:
+        """
+        First row of a query as {column: value}, or None when it returns no rows.
+
+        For hot single-item lookups: skips the DataFrame conversion of
+        execute_query (most of a point query's cost). Errors are raised.
+        """
+        with self.get_connection() as con:
+            cur = self._run(con, query, params)
+            row = cur.fetchone()
+            if row is None:
+                return None
+            return dict(zip((d[0] for d in cur.description), row))
+
+    def fetch_arrow(self, query: str, params=None, max_rows: Optional[int] = None):
+        """
+        Run a query and return a pyarrow.Table (no pandas conversion).
+
+        With `max_rows`, only that many rows are pulled from the result stream.
+        Requires pyarrow.
+        """
+        import pyarrow as pa
+
+        with self.get_connection() as con:
+            self._run(con, query, params)
+            if max_rows is None:
+                return (getattr(con, "to_arrow_table", None) or con.fetch_arrow_table)()
+            reader = _arrow_reader(con, _BATCH_ROWS)
+            batches, rows = [], 0
+            for batch in reader:
+                if rows >= max_rows:
+                    break
+                batches.append(batch.slice(0, max_rows - rows))
+                rows += batches[-1].num_rows
+            return pa.Table.from_batches(batches, schema=reader.schema)
+
+    def iter_batches(self, query: str, params=None, batch_rows: int = _BATCH_ROWS) -> Iterator[Any]:
+        """
+        Yield the result as pyarrow.RecordBatch objects of up to `batch_rows` rows.
+
+        Only one batch is held at a time, so arbitrarily large results can be
+        written out (files, HTTP responses) in bounded memory. The pooled cursor
+        stays borrowed until the iterator is exhausted or closed.
+        """
+        with self.get_connection() as con:
+            self._run(con, query, params)
+            yield from _arrow_reader(con, batch_rows)
+
     def get_table_schema(self, table_name: str) -> Dict[str, Any]:
         """Get schema information for a specific table."""
         with self.get_connection() as con:
@@ -51,29 +525,109 @@ class DatabaseManager:
             """).fetchall()
             return [table[0] for table in tables]
     
-    def execute_query(self, query: str, params=None) -> Dict[str, Any]:
-        """Execute a SQL query and return results."""
-        with self.get_connection() as con:
-            try:
-                if params:
-                    result = con.execute(query, params).df()
+    def execute_query(self, query: str, params=None, use_cache: Optional[bool] = None,
+                      max_rows: Optional[int] = None, max_bytes: Optional[int] = None,
+                      con=None) -> Dict[str, Any]:
+        """
+        Execute a SQL query and return results.
+
+        With a result cache (constructor `result_cache`, or `use_cache=True` for the
+        process-wide one), single read statements are served from memory until the
+        TTL expires or a table they mention is written.
+
+        `max_rows` / `max_bytes` bound what is materialized: the result is streamed
+        in chunks and fetching stops at the cap, with "truncated": True in the
+        returned dict (row_count is then the number of rows returned).
+
+        Statements other than a single read (see is_write) run on a short-lived
+        read-write connection; DuckDB admits one writer per file, so they wait
+        for the reads in flight and for other processes to let go of the file.
+
+        `con` runs the query on a cursor the caller already borrowed from
+        get_connection(write=self.is_write(query)) (e.g. to be able to interrupt
+        it from another thread).
+
+        Errors, including failing to open the database or borrow a cursor, come
+        back as {"success": False, "error": ...}.
+        """
+        capped = max_rows is not None or max_bytes is not None
+        cache = self.result_cache
+        if use_cache is not None:
+            cache = (cache or default_result_cache()) if use_cache else None
+        key = None
+        if cache is not None and is_single_read(query):
+            key = cache.key(_db_key(self.db_path), query, params, variant=(max_rows, max_bytes) if capped else None)
+            hit = cache.get(key)
+            if hit is not None:
+                data, truncated = hit
+                return {"success": True, "data": data, "row_count": len(data), "cached": True,
+                        **({"truncated": truncated} if capped else {})}
+
+        write = self.is_write(query)
+        try:
+            with nullcontext(con) if con is not None else self.get_connection(write=write) as con:
+                if key is not None:
+                    # snapshot before running, so a write landing meanwhile keeps the result out of the
+                    # cache; views count as reads of the tables behind them
+                    versions = cache.versions(key, _view_tables(con, query))
+                self._run(con, query, params)
+                truncated = False
+                if capped:
+                    result, truncated = self._fetch_capped(con, max_rows, max_bytes)
                 else:
-                    result = con.execute(query).df()
-                return {
+                    result = con.df()
+                if write:
+                    # writes bump table versions for every cached result (whichever manager cached it)
+                    default_result_cache().note_write(_db_key(self.db_path), query)
+                    if cache is not None and cache is not default_result_cache():
+                        cache.note_write(_db_key(self.db_path), query)
+                    if _DDL_RE.search(query):
+                        invalidate_schema_cache(self.db_path)   # explicit DDL hook; the fingerprint catches the rest
+                if key is not None:
+                    cache.put(key, result, truncated, versions=versions)
+                out = {
                     "success": True,
                     "data": result,
                     "row_count": len(result)
                 }
-            except Exception as e:
-                return {
-                    "success": False,
-                    "error": str(e),
-                    "data": None,
-                    "row_count": 0
-                }
+                if capped:
+                    out["truncated"] = truncated
+                return out
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "data": None,
+                "row_count": 0
+            }
     
+    def catalog_fingerprint(self) -> str:
+        """md5 over (table, column, type) of the main schema; changes on any DDL."""
+        with self.get_connection() as con:
+            return con.execute(_CATALOG_FINGERPRINT_SQL).fetchone()[0]
+
     def get_database_summary(self) -> Dict[str, Any]:
-        """Get a comprehensive summary of the database."""
+        """
+        Get a comprehensive summary of the database.
+
+        Built once per catalog version: later calls cost one fingerprint query and
+        return the cached summary until a table or column is added, dropped or changed
+        (sample rows reflect the data at the time the summary was built).
+        """
+        key = _db_key(self.db_path)
+        fingerprint = self.catalog_fingerprint()
+        with _schema_lock:
+            entry = _schema_cache.get(key)
+            if entry is not None and entry[0] == fingerprint:
+                _schema_stats["hits"] += 1
+                return {**entry[1], "tables": dict(entry[1]["tables"])}
+        summary = self._build_database_summary()
+        with _schema_lock:
+            _schema_cache[key] = (fingerprint, summary)
+            _schema_stats["misses"] += 1
+        return {**summary, "tables": dict(summary["tables"])}
+
+    def _build_database_summary(self) -> Dict[str, Any]:
         summary = {
             "tables": {},
             "table_descriptions": {
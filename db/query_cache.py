@@ -0,0 +1,214 @@
+# db/query_cache.py
+"""
+Result cache for DatabaseManager.execute_query.
+
+Entries are keyed by (database file, normalized SQL, parameters) and hold the
+result DataFrame. An entry is served only while
+
+- it is younger than the TTL, and
+- every table the query mentions (plus, for views, the tables they read; see
+  ``versions(key, depends_on)``) still has the version it had when cached.
+
+Table versions are bumped by writes that go through DatabaseManager (INSERT /
+UPDATE / DELETE / COPY ... FROM / CREATE / DROP / ALTER on a table) and by
+``bump_table_version`` for out-of-band ingest. A write whose target table
+cannot be determined bumps every table of that database.
+
+Memory is bounded by an LRU over the DataFrames' deep memory usage.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, Optional, Tuple
+
+import pandas as pd
+
+__all__ = ["QueryResultCache", "normalize_sql", "default_result_cache", "bump_table_version"]
+
+_WRITE_TARGET_RE = re.compile(
+    r"""^\s*(?:
+        INSERT\s+(?:OR\s+\w+\s+)?INTO |
+        UPDATE |
+        DELETE\s+FROM |
+        COPY |
+        CREATE\s+(?:OR\s+REPLACE\s+)?(?:TEMP(?:ORARY)?\s+)?(?:TABLE|VIEW)(?:\s+IF\s+NOT\s+EXISTS)? |
+        DROP\s+(?:TABLE|VIEW)(?:\s+IF\s+EXISTS)? |
+        ALTER\s+TABLE |
+        TRUNCATE(?:\s+TABLE)?
+    )\s+"?([\w.]+)"?""",
+    re.IGNORECASE | re.VERBOSE,
+)
+_READ_RE = re.compile(r"^\s*\(?\s*(SELECT|WITH|FROM|VALUES|TABLE|EXPLAIN|DESCRIBE|SHOW|SUMMARIZE|PRAGMA)\b", re.IGNORECASE)
+_IDENT_RE = re.compile(r'"([^"]+)"|\b([A-Za-z_][\w]*)\b')
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace and drop trailing semicolons (literals are left as they are)."""
+    return " ".join(query.split()).rstrip("; ")
+
+
+def is_single_read(query: str) -> bool:
+    """True for one read-only statement (the only kind whose result is cached)."""
+    sql = normalize_sql(query)
+    return bool(_READ_RE.match(sql)) and ";" not in sql
+
+
+def write_target(query: str) -> Optional[str]:
+    """Table a write statement modifies, lower-cased, or None if it cannot be determined."""
+    m = _WRITE_TARGET_RE.match(query)
+    return m.group(1).split(".")[-1].lower() if m else None
+
+
+def referenced_names(query: str) -> FrozenSet[str]:
+    """Every identifier-like token of the query, lower-cased (a superset of its table names)."""
+    return frozenset((q or w).lower() for q, w in _IDENT_RE.findall(query))
+
+
+class QueryResultCache:
+    """
+    LRU of query results with TTL and per-table version checks.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Budget for cached DataFrames (deep memory usage). Results larger than a
+        quarter of it are not cached.
+    ttl : float | None
+        Seconds an entry stays valid (None = until invalidated).
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl: Optional[float] = 300.0):
+        self.max_bytes = int(max_bytes)
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, int], int, pd.DataFrame, bool]]" = OrderedDict()
+        self._versions: Dict[str, Dict[str, int]] = {}     # db -> table -> version
+        self._epoch: Dict[str, int] = {}                   # db -> bumped on untargeted writes
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+
+    # ---------- versions ----------
+
+    def _table_versions(self, db: str, names: Iterable[str]) -> Dict[str, int]:
+        v = self._versions.get(db, {})
+        out = {n: v.get(n, 0) for n in names}
+        out["*"] = self._epoch.get(db, 0)
+        return out
+
+    def bump(self, db: str, table: Optional[str] = None) -> None:
+        """Invalidate cached results touching `table` (every table when None)."""
+        with self._lock:
+            if table is None:
+                self._epoch[db] = self._epoch.get(db, 0) + 1
+            else:
+                v = self._versions.setdefault(db, {})
+                v[table.lower()] = v.get(table.lower(), 0) + 1
+            self.invalidations += 1
+
+    def note_write(self, db: str, query: str) -> None:
+        """Bump the table a write statement targets (all tables for multi-statement or unparsed SQL)."""
+        self.bump(db, None if ";" in normalize_sql(query) else write_target(query))
+
+    # ---------- entries ----------
+
+    def key(self, db: str, query: str, params: Any, variant: Hashable = None) -> Hashable:
+        """`variant` separates results of the same SQL fetched differently (e.g. row caps)."""
+        return (db, normalize_sql(query), repr(tuple(params)) if params is not None else None, variant)
+
+    def get(self, key: Hashable) -> Optional[Tuple[pd.DataFrame, bool]]:
+        """(copy of the cached frame, truncated flag), or None on a miss."""
+        db, sql = key[0], key[1]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, versions, _, df, truncated = entry
+                fresh = self.ttl is None or time.monotonic() - created < self.ttl
+                if fresh and self._table_versions(db, [n for n in versions if n != "*"]) == versions:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return df.copy(), truncated
+                self._drop(key)
+            self.misses += 1
+            return None
+
+    def versions(self, key: Hashable, depends_on: Iterable[str] = ()) -> Dict[str, int]:
+        """
+        Current versions of the tables `key`'s query mentions, plus `depends_on`
+        (e.g. the base tables of views it reads); take this before running it (see put).
+        """
+        with self._lock:
+            return self._table_versions(key[0], referenced_names(key[1]) | frozenset(depends_on))
+
+    def put(self, key: Hashable, df: pd.DataFrame, truncated: bool = False,
+            versions: Optional[Dict[str, int]] = None) -> None:
+        """
+        Cache `df` for `key`. `versions` is the versions() snapshot taken before the
+        query ran: if a table it reads was written since, the result may predate that
+        write and is not cached.
+        """
+        db, sql = key[0], key[1]
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            names = referenced_names(sql) if versions is None else [n for n in versions if n != "*"]
+            current = self._table_versions(db, names)
+            if versions is not None and versions != current:
+                self.stale_puts += 1
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic(), current, size, df.copy(), truncated)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, size, _, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_puts": self.stale_puts,
+        }
+
+
+_default: Optional[QueryResultCache] = None
+_default_lock = threading.Lock()
+
+
+def default_result_cache() -> QueryResultCache:
+    """Process-wide cache shared by every DatabaseManager with result caching on."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = QueryResultCache()
+        return _default
+
+
+def bump_table_version(db_path: str, table: Optional[str] = None) -> None:
+    """Call after ingesting into `db_path` outside DatabaseManager (table=None: all tables)."""
+    db = db_path if db_path == ":memory:" else os.path.abspath(db_path)
+    default_result_cache().bump(db, table)
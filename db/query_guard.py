@@ -0,0 +1,274 @@
+# db/query_guard.py
+"""
+Guarded execution for generated (untrusted) SQL.
+
+Before a query runs, QueryGuard
+
+- injects a LIMIT when the statement has none (one row more than returned,
+  so truncation can be reported),
+- runs ``EXPLAIN (FORMAT json)`` and estimates the query's cost as the
+  largest row count any plan operator is expected to produce (cross products
+  count as the product of their inputs),
+- rejects the query when that estimate exceeds ``max_estimated_rows``.
+
+While it runs, a timer interrupts the cursor after ``timeout`` seconds, and
+results are materialized only up to ``row_limit`` rows (see
+DatabaseManager.execute_query's max_rows / max_bytes).
+
+Rejected or interrupted queries come back as the usual result dict with
+``success: False`` plus ``too_expensive: True``, a ``reason``
+("estimated_rows", "cross_product" or "timeout") and ``estimated_rows``, so
+callers can tell the user to narrow the question instead of showing an error.
+
+DuckDB only accepts ``memory_limit`` and ``threads`` for a whole database
+instance, and every manager of a file shares one instance in a process
+(see db.database_manager.get_pool). So the caps are set only while guarded
+queries are running and reset to DuckDB's defaults when the last one
+finishes. Unguarded queries that run at the same time (ingest, the app) are
+held to the same caps meanwhile.
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import duckdb
+
+from db.database_manager import DatabaseManager
+
+__all__ = ["QueryGuard", "add_limit", "estimate_rows"]
+
+_WORD_RE = re.compile(r"\w+")
+
+# pool -> guarded queries running with caps; the last one to finish resets them
+_caps_running: Dict[Any, int] = {}
+_caps_lock = threading.Lock()
+
+
+def _word(sql: str, pos: int) -> str:
+    m = _WORD_RE.match(sql, pos)
+    return m.group(0).upper() if m else ""
+
+
+def add_limit(query: str, limit: int) -> Tuple[str, bool]:
+    """
+    (query with at most `limit` rows, whether it was rewritten).
+
+    The query text is kept as written (comments included); only a trailing
+    ``;`` is removed. A trailing LIMIT no larger than `limit` is kept; anything
+    else is wrapped in ``SELECT * FROM (...) LIMIT n``, which preserves the
+    inner ORDER BY. The wrapper puts the query on its own lines so a trailing
+    ``--`` comment cannot swallow the closing parenthesis.
+    """
+    sql = query
+    # DuckDB's tokenizer skips comments and string contents
+    tokens = duckdb.tokenize(sql)
+    if tokens and sql.startswith(";", tokens[-1][0]):
+        sql, tokens = sql[: tokens[-1][0]], tokens[:-1]
+    sql = sql.strip()
+    words = [_word(sql, pos) for pos, _ in tokens[-4:]]
+    tail = words[-4:-2] if len(words) == 4 and words[-2] == "OFFSET" else words
+    if len(tail) >= 2 and tail[-2] == "LIMIT" and tail[-1].isdigit() and int(tail[-1]) <= limit:
+        return sql, False
+    return f"SELECT * FROM (\n{sql}\n) AS _guarded LIMIT {int(limit)}", True
+
+
+def _node_rows(node: Dict[str, Any]) -> Tuple[float, bool]:
+    """(largest estimated rows in this subtree, whether it came from a cross product)."""
+    best, from_cross = 0.0, False
+    child_rows = []
+    for child in node.get("children", []):
+        rows, cross = _node_rows(child)
+        child_rows.append(_own_rows(child))
+        if rows > best:
+            best, from_cross = rows, cross
+    own = _own_rows(node)
+    if node.get("name") in ("CROSS_PRODUCT", "NESTED_LOOP_JOIN", "BLOCKWISE_NL_JOIN") and child_rows:
+        product = 1.0
+        for r in child_rows:
+            product *= max(r, 1.0)
+        if product > best:
+            best, from_cross = product, True
+    if own > best:
+        best, from_cross = own, False
+    return best, from_cross
+
+
+def _own_rows(node: Dict[str, Any]) -> float:
+    info = node.get("extra_info") or {}
+    try:
+        return float(info.get("Estimated Cardinality", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def estimate_rows(con, query: str) -> Tuple[float, bool]:
+    """(largest estimated operator row count of `query`'s plan, whether a cross product produced it)."""
+    rows = con.execute(f"EXPLAIN (FORMAT json) {query}").fetchall()
+    best, from_cross = 0.0, False
+    for _, plan in rows:
+        for node in json.loads(plan):
+            r, cross = _node_rows(node)
+            if r > best:
+                best, from_cross = r, cross
+    return best, from_cross
+
+
+class QueryGuard:
+    """
+    Cost-checked, time- and size-bounded execution on a DatabaseManager.
+
+    Parameters
+    ----------
+    db : DatabaseManager
+        Manager to run on (normally read-only).
+    max_estimated_rows : float
+        Reject queries whose plan is expected to produce more rows than this
+        in any operator.
+    row_limit : int
+        Rows returned at most (a LIMIT is injected when missing).
+    max_bytes : int | None
+        Bound on the materialized result.
+    timeout : float | None
+        Wall-clock seconds before the running query is interrupted.
+    memory_limit, threads : str / int | None
+        Instance-wide DuckDB caps while guarded queries run (None = leave as
+        configured); see the module docstring.
+    """
+
+    def __init__(
+        self,
+        db: DatabaseManager,
+        *,
+        max_estimated_rows: float = 1_000_000_000,
+        row_limit: int = 10_000,
+        max_bytes: Optional[int] = 64 * 1024 * 1024,
+        timeout: Optional[float] = 30.0,
+        memory_limit: Optional[str] = None,
+        threads: Optional[int] = None,
+    ):
+        self.db = db
+        self.max_estimated_rows = max_estimated_rows
+        self.row_limit = row_limit
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.threads = threads
+        self.checked = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    @contextmanager
+    def _capped(self, con) -> Iterator[None]:
+        settings = [(name, value) for name, value in (("memory_limit", self.memory_limit), ("threads", self.threads))
+                    if value is not None]
+        if not settings:
+            yield
+            return
+        # a borrowed cursor keeps its pool's instance open, so the pool identifies the instance here
+        pool = self.db.pool
+        with _caps_lock:
+            for name, value in settings:
+                if name == "threads":
+                    con.execute(f"SET threads = {max(1, int(value))}")
+                else:
+                    con.execute(f"SET {name} = ?", (str(value),))
+            _caps_running[pool] = _caps_running.get(pool, 0) + 1
+        try:
+            yield
+        finally:
+            with _caps_lock:
+                _caps_running[pool] -= 1
+                if not _caps_running[pool]:
+                    del _caps_running[pool]
+                    for name, _ in settings:
+                        try:
+                            con.execute(f"RESET {name}")
+                        except duckdb.Error:
+                            pass
+
+    @staticmethod
+    def _too_expensive(reason: str, message: str, estimated: float) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "too_expensive": True,
+            "reason": reason,
+            "error": message,
+            "estimated_rows": int(estimated),
+            "data": None,
+            "row_count": 0,
+        }
+
+    def execute(self, query: str, params=None) -> Dict[str, Any]:
+        """Run `query` under the guard; returns an execute_query-style dict (see module docstring)."""
+        self.checked += 1
+        try:
+            with self.db.get_connection() as con:
+                try:
+                    statements = con.extract_statements(query)
+                except duckdb.Error as e:
+                    return {"success": False, "error": str(e), "data": None, "row_count": 0}
+                if len(statements) != 1 or statements[0].type.name != "SELECT":
+                    return {"success": False, "error": "Only a single SELECT statement can be run",
+                            "data": None, "row_count": 0}
+                # one extra row tells the capped fetch whether more rows existed
+                guarded, injected = add_limit(query, self.row_limit + 1)
+                try:
+                    estimated, from_cross = estimate_rows(con, guarded)
+                except Exception as e:
+                    return {"success": False, "error": str(e), "data": None, "row_count": 0}
+                if estimated > self.max_estimated_rows:
+                    self.rejected += 1
+                    reason = "cross_product" if from_cross else "estimated_rows"
+                    what = "a cross join" if from_cross else "the query plan"
+                    return self._too_expensive(
+                        reason,
+                        f"Query too expensive: {what} is estimated at ~{int(estimated):,} rows "
+                        f"(limit {int(self.max_estimated_rows):,})",
+                        estimated,
+                    )
+
+                lock = threading.Lock()
+                state = {"running": True, "fired": False}
+
+                def _interrupt():
+                    with lock:
+                        if state["running"]:
+                            state["fired"] = True
+                            con.interrupt()
+
+                timer = threading.Timer(self.timeout, _interrupt) if self.timeout else None
+                started = time.perf_counter()
+                if timer is not None:
+                    timer.daemon = True
+                    timer.start()
+                try:
+                    with self._capped(con):
+                        result = self.db.execute_query(guarded, params, con=con,
+                                                       max_rows=self.row_limit, max_bytes=self.max_bytes)
+                finally:
+                    with lock:
+                        state["running"] = False      # the cursor goes back to the pool after this block
+                    if timer is not None:
+                        timer.cancel()
+        except Exception as e:      # opening the database / borrowing a cursor failed
+            return {"success": False, "error": str(e), "data": None, "row_count": 0}
+
+        if state["fired"]:
+            self.timeouts += 1
+            return self._too_expensive(
+                "timeout", f"Query too expensive: interrupted after {self.timeout:g}s", estimated)
+        result["guard"] = {
+            "estimated_rows": int(estimated),
+            "limit_injected": injected,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        return result
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {"checked": self.checked, "rejected": self.rejected, "timeouts": self.timeouts}
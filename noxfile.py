@@ -7,7 +7,7 @@ def tests(session):
     # Install app deps
     session.install("-r", "requirements.txt")
     # Install test deps
-    session.install("pytest")
+    session.install("-r", "requirements-dev.txt")
 
     #repo_root = str(pathlib.Path(__file__).resolve().parent)
     #env = {"PYTHONPATH": repo_root}  # IMPORTANT: parent of `src/`, i.e., the repo root
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+DatabaseManager per-query overhead benchmark
+--------------------------------------------
+Runs the same small queries (SELECT 1, a point lookup on `inv`, the
+information_schema table list) N times
+
+  - with a fresh duckdb.connect() per query (the previous DatabaseManager
+    behaviour), and
+  - through the pooled DatabaseManager (one persistent database instance,
+    reused cursors),
+
+plus a multi-threaded run against the pool, and writes the timings as JSON.
+
+Usage:
+  python scripts/bench_db_overhead.py
+  python scripts/bench_db_overhead.py --db notebooks/retail.duckdb -n 500 --threads 4
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import duckdb
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from db.database_manager import DatabaseManager, close_pools  # noqa: E402
+
+QUERIES = {
+    "select_1": ("SELECT 1", None),
+    "point_lookup": ("SELECT unit FROM inv WHERE item_id = ?", ("FOODS_3_090",)),
+    "list_tables": ("SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'", None),
+}
+
+
+def _connect_per_query(db_path: str, query: str, params) -> None:
+    with duckdb.connect(db_path) as con:
+        (con.execute(query, params) if params else con.execute(query)).df()
+
+
+def bench(db_path: str, n: int, threads: int) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for name, (query, params) in QUERIES.items():
+        t0 = time.perf_counter()
+        for _ in range(n):
+            _connect_per_query(db_path, query, params)
+        before = (time.perf_counter() - t0) / n
+
+        db = DatabaseManager(db_path, read_only=True, pool_size=threads)
+        db.execute_query(query, params)                       # open the pool
+        t0 = time.perf_counter()
+        for _ in range(n):
+            db.execute_query(query, params)
+        after = (time.perf_counter() - t0) / n
+        close_pools()                                         # next connect-per-query run starts cold
+
+        out[name] = {
+            "connect_per_query_ms": round(before * 1e3, 3),
+            "pooled_ms": round(after * 1e3, 3),
+            "speedup": round(before / after, 1),
+        }
+
+    db = DatabaseManager(db_path, read_only=True, pool_size=threads)
+    query, params = QUERIES["point_lookup"]
+    db.execute_query(query, params)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        list(ex.map(lambda _: db.execute_query(query, params), range(n)))
+    wall = time.perf_counter() - t0
+    out["threaded_point_lookup"] = {
+        "threads": threads,
+        "queries": n,
+        "qps": round(n / wall, 1),
+        "pool": db.pool.stats,
+    }
+    close_pools()
+    return out
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark DatabaseManager per-query overhead")
+    ap.add_argument("--db", type=Path, default=REPO_ROOT / "notebooks" / "retail.duckdb")
+    ap.add_argument("-n", type=int, default=200, help="Queries per measurement.")
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("-o", "--output-json", type=Path, default=Path("bench_db_overhead.json"))
+    args = ap.parse_args(argv)
+
+    # work on a copy so the benchmark never holds a lock on the real database
+    with tempfile.TemporaryDirectory() as tmp:
+        db_copy = str(Path(tmp) / args.db.name)
+        shutil.copy(args.db, db_copy)
+        report = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "duckdb": duckdb.__version__,
+                "platform": platform.platform(),
+                "db": str(args.db),
+            },
+            "queries": bench(db_copy, args.n, args.threads),
+        }
+
+    for name, r in report["queries"].items():
+        if "speedup" in r:
+            print(f"{name}: {r['connect_per_query_ms']}ms -> {r['pooled_ms']}ms per query (x{r['speedup']})")
+    t = report["queries"]["threaded_point_lookup"]
+    print(f"{t['threads']} threads: {t['qps']} point lookups/s")
+
+    args.output_json.parent.mkdir(parents=True, exist_ok=True)
+    args.output_json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote {args.output_json}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Reorder-plan benchmark
+----------------------
+Synthetic inventory of N SKUs; measures
+
+  - compute_reorder_plan (one policy per call), and
+  - sweep_reorder_scenarios over S safety-stock / lead-time policies vs calling
+    compute_reorder_plan once per policy
+  - ReorderPlanTable: applying a delta of K changed SKUs + top-N vs a full
+    compute_reorder_plan + sort
+  - demand sigma for service-level safety stock: one grouped DuckDB aggregate
+    over M synthetic sales rows (cold and cached) vs one query per item
+
+and writes the timings as JSON.
+
+Usage:
+  python scripts/bench_reorder_plan.py
+  python scripts/bench_reorder_plan.py --skus 100000 --scenarios 500 -o bench/reorder.json
+  python scripts/bench_reorder_plan.py --sales-rows 5000000 --sales-items 20000
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from src.forecast import compute_reorder_plan, sweep_reorder_scenarios  # noqa: E402
+from src.reorder_plan import ReorderPlanTable  # noqa: E402
+from src.safety_stock import DemandSigmaCache  # noqa: E402
+from db.database_manager import DatabaseManager, close_pools  # noqa: E402
+
+
+def make_inventory(n: int, *, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    on_hand = rng.integers(0, 300, n).astype(float)
+    return pd.DataFrame({
+        "sku": [f"SKU{i:07d}" for i in range(n)],
+        "product_name": [f"Product {i}" for i in range(n)],
+        "on_hand": on_hand,
+        "backroom_units": np.floor(on_hand * 0.6),
+        "shelf_units": on_hand - np.floor(on_hand * 0.6),
+        "avg_daily_sales": rng.gamma(2.0, 3.0, n),
+        "lead_time_days": rng.integers(1, 15, n).astype(float),
+    })
+
+
+def make_scenarios(s: int) -> pd.DataFrame:
+    """Safety stock 1..14 days crossed with lead-time shocks of 0..+N days."""
+    ss = np.linspace(1.0, 14.0, max(1, s // 5))
+    shocks = np.arange(5, dtype=float)
+    grid = pd.DataFrame({"safety_stock": np.repeat(ss, len(shocks)), "lead_time_add": np.tile(shocks, len(ss))})
+    return grid.head(s)
+
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_sweep(df: pd.DataFrame, scenarios: pd.DataFrame, *, repeat: int, loop_sample: int = 10) -> Dict[str, Any]:
+    sweep = _best(lambda: sweep_reorder_scenarios(df, scenarios), repeat)
+
+    sample = scenarios.head(loop_sample)
+
+    def _loop():
+        for row in sample.itertuples(index=False):
+            compute_reorder_plan(df.assign(
+                safety_stock=row.safety_stock, lead_time_days=df["lead_time_days"] + row.lead_time_add,
+            ))
+
+    per_policy = _best(_loop, 1) / len(sample)
+    loop_est = per_policy * len(scenarios)
+    return {
+        "skus": len(df),
+        "scenarios": len(scenarios),
+        "pairs": len(df) * len(scenarios),
+        "sweep_s": round(sweep, 3),
+        "loop_s_estimated": round(loop_est, 3),
+        "speedup": round(loop_est / sweep, 2),
+    }
+
+
+def bench_incremental(df: pd.DataFrame, *, delta_skus: int, top_n: int = 50, repeat: int = 3) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    table = ReorderPlanTable(df)
+    build = time.perf_counter() - t0
+
+    rng = np.random.default_rng(1)
+    deltas = []
+    for _ in range(repeat):
+        idx = rng.choice(len(df), size=min(delta_skus, len(df)), replace=False)
+        deltas.append(pd.DataFrame({
+            "sku": df["sku"].to_numpy()[idx],
+            "on_hand": rng.integers(0, 300, len(idx)).astype(float),
+        }))
+    best = float("inf")
+    for d in deltas:
+        t0 = time.perf_counter()
+        table.upsert(d)
+        table.top_n(top_n)
+        best = min(best, time.perf_counter() - t0)
+
+    full = _best(lambda: compute_reorder_plan(df).sort_values("reorder_qty", ascending=False).head(top_n), repeat)
+    return {
+        "skus": len(df),
+        "delta_skus": delta_skus,
+        "top_n": top_n,
+        "initial_build_s": round(build, 3),
+        "delta_plus_top_n_s": round(best, 4),
+        "full_recompute_plus_sort_s": round(full, 4),
+        "speedup": round(full / best, 2),
+    }
+
+
+def bench_demand_sigma(rows: int, items: int, *, repeat: int = 3, loop_sample: int = 20) -> Dict[str, Any]:
+    days = max(2, rows // items)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "sales.duckdb")
+        with duckdb.connect(path) as con:
+            con.execute(f"""
+                CREATE TABLE sales AS
+                SELECT 'ITEM_' || lpad(CAST(i % {items} AS VARCHAR), 7, '0') AS item_id,
+                       TIMESTAMP '2024-01-01' + INTERVAL (i // {items}) DAY AS date,
+                       CAST(floor(random() * 50) AS BIGINT) AS sale
+                FROM range({days * items}) t(i)
+            """)
+        db = DatabaseManager(db_path=path)
+
+        def _cold():
+            DemandSigmaCache().get(db)
+
+        cold = _best(_cold, repeat)
+        cache = DemandSigmaCache()
+        cache.get(db)
+        warm = _best(lambda: cache.get(db), repeat)
+
+        ids = [f"ITEM_{i:07d}" for i in range(min(loop_sample, items))]
+
+        def _loop():
+            for item in ids:
+                db.execute_query("SELECT stddev_samp(sale) FROM sales WHERE item_id = ?", (item,))
+
+        per_item = _best(_loop, 1) / len(ids)
+        close_pools()
+    return {
+        "sales_rows": days * items,
+        "items": items,
+        "grouped_cold_s": round(cold, 3),
+        "cached_s": round(warm, 4),
+        "per_item_loop_s_estimated": round(per_item * items, 2),
+        "speedup": round(per_item * items / cold, 1),
+    }
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark reorder-plan computation")
+    ap.add_argument("-o", "--output-json", type=Path, default=Path("bench_reorder_plan.json"))
+    ap.add_argument("--skus", type=int, default=100_000)
+    ap.add_argument("--scenarios", type=int, default=500)
+    ap.add_argument("--delta-skus", type=int, default=300, help="SKUs changed per incremental update.")
+    ap.add_argument("--sales-rows", type=int, default=2_000_000, help="Synthetic sales rows for the sigma job.")
+    ap.add_argument("--sales-items", type=int, default=10_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    df = make_inventory(args.skus)
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+        },
+        "compute_reorder_plan_s": round(_best(lambda: compute_reorder_plan(df), args.repeat), 4),
+        "scenario_sweep": bench_sweep(df, make_scenarios(args.scenarios), repeat=args.repeat),
+        "incremental": bench_incremental(df, delta_skus=args.delta_skus, repeat=args.repeat),
+        "demand_sigma": bench_demand_sigma(args.sales_rows, args.sales_items, repeat=args.repeat),
+    }
+    sw = report["scenario_sweep"]
+    print(f"compute_reorder_plan: {report['compute_reorder_plan_s']}s for {args.skus} SKUs")
+    print(f"sweep {sw['skus']} x {sw['scenarios']}: {sw['sweep_s']}s "
+          f"(loop est. {sw['loop_s_estimated']}s, x{sw['speedup']})")
+    inc = report["incremental"]
+    print(f"incremental: {inc['delta_skus']}-SKU delta + top-{inc['top_n']} {inc['delta_plus_top_n_s']}s "
+          f"vs full recompute + sort {inc['full_recompute_plus_sort_s']}s (x{inc['speedup']})")
+    ds = report["demand_sigma"]
+    print(f"demand sigma over {ds['sales_rows']} sales rows / {ds['items']} items: {ds['grouped_cold_s']}s grouped, "
+          f"{ds['cached_s']}s cached (per-item loop est. {ds['per_item_loop_s_estimated']}s, x{ds['speedup']})")
+
+    args.output_json.parent.mkdir(parents=True, exist_ok=True)
+    args.output_json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote {args.output_json}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Shelf-gap detection throughput benchmark
+----------------------------------------
+Generates synthetic shelf photos at several resolutions and measures:
+
+  - end-to-end images/sec for ``detect_shelf_gaps`` and ``batch_gap_scores``
+  - per-stage time: decode, EXIF transpose (+ grayscale), resize, variance
+  - peak traced memory (tracemalloc: Python + NumPy allocations)
+  - frame-stream throughput with unchanged-frame skipping (``GapStream``)
+  - multi-process scoring: shared-memory slots (``ShmGapPool``) vs a pool
+    that pickles decoded arrays to its workers
+  - optionally (--onnx-model) the ONNX detector backend vs the heuristic
+
+across a grid of ``max_side``, ``tile`` and ``mode`` settings. Results are
+written as JSON so runs from different versions can be diffed.
+
+Usage:
+  python scripts/bench_shelf_gaps.py -o bench/shelf_gaps.json
+  python scripts/bench_shelf_gaps.py --sizes 1280x960 4000x3000 --repeat 5
+  python scripts/bench_shelf_gaps.py -o new.json --compare bench/shelf_gaps.json
+"""
+
+from __future__ import annotations
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from src.detect import (  # noqa: E402
+    _open_image, _to_gray, _downscale, _score_array, detect_shelf_gaps,
+)
+from src.gap_batch import batch_gap_scores  # noqa: E402
+from src.gap_stream import GapStream, _gray_array  # noqa: E402
+from src.detectors import make_backend  # noqa: E402
+from src.gap_shm import ShmGapPool  # noqa: E402
+
+DEFAULT_SIZES = ["640x480", "1920x1080", "4032x3024"]
+DEFAULT_MAX_SIDES = ["1024", "2048", "none"]
+DEFAULT_TILES = [32, 48, 96]
+DEFAULT_MODES = ["local", "global"]
+
+# -------------------------
+# Synthetic shelf images
+# -------------------------
+
+def make_shelf_image(width: int, height: int, *, seed: int = 0, gap_frac: float = 0.25) -> np.ndarray:
+    """
+    RGB shelf-like image: horizontal shelves of noisy "product" facings, with a
+    fraction of facings left as flat (empty) back panel.
+    """
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width, 3), 200, np.uint8)  # back panel
+    n_shelves = 4
+    band_h = height // n_shelves
+    facing_w = max(16, width // 12)
+    for s in range(n_shelves):
+        y0 = s * band_h
+        img[y0:y0 + max(2, band_h // 20)] = 90  # shelf lip
+        for x0 in range(0, width, facing_w):
+            if rng.random() < gap_frac:
+                continue
+            y1, x1 = y0 + band_h // 10, min(width, x0 + facing_w - 2)
+            base = rng.integers(40, 220, size=3)
+            noise = rng.integers(-100, 100, size=(y0 + band_h - y1, x1 - x0, 1))
+            img[y1:y0 + band_h, x0:x1] = np.clip(base + noise, 0, 255)
+    return img
+
+
+def encode_jpeg(arr: np.ndarray, *, exif_rotate: bool = False, quality: int = 90) -> bytes:
+    """Encode as JPEG; optionally tag EXIF orientation=6 so exif_transpose does real work."""
+    im = Image.fromarray(arr)
+    buf = io.BytesIO()
+    if exif_rotate:
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        im.save(buf, format="JPEG", quality=quality, exif=exif.tobytes())
+    else:
+        im.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+# -------------------------
+# Measurements
+# -------------------------
+
+def _parse_size(s: str) -> Tuple[int, int]:
+    w, h = s.lower().split("x")
+    return int(w), int(h)
+
+
+def _parse_max_side(s: str) -> Optional[int]:
+    return None if str(s).lower() in ("none", "0", "") else int(s)
+
+
+def time_stages(data: bytes, *, mode: str, tile: int, max_side: Optional[int], accumulate: str = "int") -> Dict[str, float]:
+    """Run the detect_shelf_gaps pipeline stage by stage; returns seconds per stage."""
+    t0 = time.perf_counter()
+    im = _open_image(data)
+    t1 = time.perf_counter()
+    im = _to_gray(im)
+    t2 = time.perf_counter()
+    im = _downscale(im, max_side)
+    t3 = time.perf_counter()
+    _score_array(np.asarray(im), mode=mode, variance_ref=5000.0, tile=tile, uniform_thresh=800.0,
+                 accumulate=accumulate)
+    t4 = time.perf_counter()
+    return {"decode": t1 - t0, "exif_transpose": t2 - t1, "resize": t3 - t2, "variance": t4 - t3}
+
+
+def peak_memory(data: bytes, *, mode: str, tile: int, max_side: Optional[int], accumulate: str = "int") -> int:
+    """Peak traced bytes for one detect_shelf_gaps call (PIL's C buffers are not traced)."""
+    tracemalloc.start()
+    try:
+        detect_shelf_gaps(data, mode=mode, tile=tile, max_side=max_side, accumulate=accumulate)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return int(peak)
+
+
+def bench_case(
+    images: List[bytes], *, mode: str, tile: int, max_side: Optional[int], repeat: int, accumulate: str = "int",
+) -> Dict[str, Any]:
+    kw = dict(mode=mode, tile=tile, max_side=max_side, accumulate=accumulate)
+    # warm-up (imports, allocator, PIL plugin registry)
+    detect_shelf_gaps(images[0], **kw)
+
+    stage_totals = {"decode": 0.0, "exif_transpose": 0.0, "resize": 0.0, "variance": 0.0}
+    for _ in range(repeat):
+        for data in images:
+            for k, v in time_stages(data, **kw).items():
+                stage_totals[k] += v
+
+    n = repeat * len(images)
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for data in images:
+            detect_shelf_gaps(data, **kw)
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "mode": mode,
+        "tile": tile,
+        "max_side": max_side,
+        "accumulate": accumulate,
+        "images": n,
+        "images_per_sec": round(n / elapsed, 3) if elapsed > 0 else None,
+        "ms_per_image": round(1000.0 * elapsed / n, 3),
+        "stage_ms": {k: round(1000.0 * v / n, 3) for k, v in stage_totals.items()},
+        "peak_traced_bytes": peak_memory(images[0], **kw),
+    }
+
+
+def bench_batch(images: List[bytes], *, max_side: Optional[int]) -> Dict[str, Any]:
+    """End-to-end batch_gap_scores over a temp folder (includes file I/O and CSV write)."""
+    with tempfile.TemporaryDirectory() as td:
+        root = Path(td)
+        for i, data in enumerate(images):
+            (root / f"SKU{i:05d}.jpg").write_bytes(data)
+        t0 = time.perf_counter()
+        processed, _ = batch_gap_scores(root, root / "out.csv", max_side=max_side, show_progress=False)
+        elapsed = time.perf_counter() - t0
+    return {
+        "max_side": max_side,
+        "images": processed,
+        "images_per_sec": round(processed / elapsed, 3) if elapsed > 0 else None,
+    }
+
+
+def bench_stream(width: int, height: int, *, frames: int = 120, change_every: int = 30) -> Dict[str, Any]:
+    """
+    Static-camera frame stream (RGB arrays with sensor noise, scene change every
+    `change_every` frames): GapStream with change skipping vs scoring every frame.
+    """
+    rng = np.random.default_rng(0)
+    scenes = [make_shelf_image(width, height, seed=i) for i in range(frames // change_every + 1)]
+    noise = [rng.integers(-2, 3, size=(height, width, 1), dtype=np.int16) for _ in range(4)]
+    seq = [
+        np.clip(scenes[i // change_every] + noise[i % 4], 0, 255).astype(np.uint8)
+        for i in range(frames)
+    ]
+
+    t0 = time.perf_counter()
+    for f in seq:
+        _score_array(_gray_array(f, 1024), mode="local", variance_ref=5000.0, tile=48, uniform_thresh=800.0)
+    full = time.perf_counter() - t0
+
+    stream = GapStream(tile=48)
+    t0 = time.perf_counter()
+    for f in seq:
+        stream.push(f)
+    streamed = time.perf_counter() - t0
+
+    return {
+        "size": f"{width}x{height}",
+        "frames": frames,
+        "change_every": change_every,
+        "every_frame_fps": round(frames / full, 2),
+        "stream_fps": round(frames / streamed, 2),
+        "speedup": round(full / streamed, 2),
+        **stream.stats,
+    }
+
+
+def _score_pickled(arr: np.ndarray, params: Dict[str, Any]):
+    return _score_array(arr, **params)
+
+
+def bench_processes(images: List[bytes], *, processes: int, repeat: int, max_side: int = 1024) -> Dict[str, Any]:
+    """
+    images/sec with `processes` scoring workers: ShmGapPool (decode into shared
+    memory, send slot handles) vs ProcessPoolExecutor fed pickled decoded arrays.
+    """
+    params = {"mode": "local", "variance_ref": 5000.0, "tile": 48, "uniform_thresh": 800.0}
+    n = repeat * len(images)
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        list(pool.map(_score_pickled, [np.zeros((8, 8), np.uint8)] * processes, [params] * processes))  # spawn
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            arrays = (np.asarray(_downscale(_to_gray(_open_image(d)), max_side)) for d in images)
+            list(pool.map(_score_pickled, arrays, [params] * len(images)))
+        pickled = time.perf_counter() - t0
+
+    with ShmGapPool(processes=processes, max_side=max_side, **params) as pool:
+        pool.map(images[:processes])  # spawn + attach
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            pool.map(images)
+        shm = time.perf_counter() - t0
+
+    return {
+        "processes": processes,
+        "images": n,
+        "pickling_images_per_sec": round(n / pickled, 3),
+        "shm_images_per_sec": round(n / shm, 3),
+        "speedup": round(pickled / shm, 2),
+    }
+
+
+def bench_backends(
+    images: List[bytes], *, onnx_model: Path, repeat: int,
+    intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None, batch_size: int = 8,
+) -> List[Dict[str, Any]]:
+    """images/sec of the ONNX detector backend vs the tile-variance heuristic on the same images."""
+    backends = [
+        make_backend("heuristic"),
+        make_backend("onnx", model_path=onnx_model, batch_size=batch_size,
+                     intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads),
+    ]
+    out = []
+    for b in backends:
+        b.score_batch(images[:1])  # warm-up (session init, allocator)
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            b.score_batch(images)
+        elapsed = time.perf_counter() - t0
+        n = repeat * len(images)
+        out.append({"backend": b.name, "images": n, "images_per_sec": round(n / elapsed, 3) if elapsed > 0 else None})
+    return out
+
+
+def run(
+    sizes: Iterable[str],
+    max_sides: Iterable[str],
+    tiles: Iterable[int],
+    modes: Iterable[str],
+    accumulates: Iterable[str] = ("int",),
+    *,
+    images_per_size: int,
+    repeat: int,
+    exif_rotate: bool,
+    onnx_model: Optional[Path] = None,
+    onnx_threads: Tuple[Optional[int], Optional[int]] = (None, None),
+    processes: int = 0,
+) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    pools: List[Dict[str, Any]] = []
+    backends: List[Dict[str, Any]] = []
+    batch: List[Dict[str, Any]] = []
+    streams: List[Dict[str, Any]] = []
+    for size in sizes:
+        w, h = _parse_size(size)
+        images = [
+            encode_jpeg(make_shelf_image(w, h, seed=i), exif_rotate=exif_rotate)
+            for i in range(images_per_size)
+        ]
+        for ms in max_sides:
+            max_side = _parse_max_side(ms)
+            for mode in modes:
+                # tile size is irrelevant in global mode
+                for tile in (tiles if mode == "local" else [0]):
+                    for acc in accumulates:
+                        case = bench_case(images, mode=mode, tile=tile, max_side=max_side, repeat=repeat,
+                                          accumulate=acc)
+                        case["size"] = size
+                        results.append(case)
+                        print(f"{size:>10} max_side={str(max_side):>5} {mode:>6} tile={tile:>3} {acc:>5} "
+                              f"{case['images_per_sec']:>9.2f} img/s  stages(ms)={case['stage_ms']}")
+            b = bench_batch(images, max_side=max_side)
+            b["size"] = size
+            batch.append(b)
+        if onnx_model is not None:
+            for b in bench_backends(images, onnx_model=onnx_model, repeat=repeat,
+                                    intra_op_threads=onnx_threads[0], inter_op_threads=onnx_threads[1]):
+                b["size"] = size
+                backends.append(b)
+                print(f"{size:>10} backend={b['backend']:>9} {b['images_per_sec']:>9.2f} img/s")
+        if processes > 0:
+            pb = bench_processes(images, processes=processes, repeat=repeat)
+            pb["size"] = size
+            pools.append(pb)
+            print(f"{size:>10} {processes} procs: shm {pb['shm_images_per_sec']} img/s vs "
+                  f"pickling {pb['pickling_images_per_sec']} img/s (x{pb['speedup']})")
+        st = bench_stream(w, h)
+        streams.append(st)
+        print(f"{size:>10} stream: {st['stream_fps']} fps vs {st['every_frame_fps']} fps every-frame "
+              f"(x{st['speedup']}, skipped {st['skipped']}/{st['frames']})")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pillow": Image.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "images_per_size": images_per_size,
+            "repeat": repeat,
+            "exif_rotate": exif_rotate,
+        },
+        "detect_shelf_gaps": results,
+        "batch_gap_scores": batch,
+        "gap_stream": streams,
+        "backends": backends,
+        "process_pools": pools,
+    }
+
+
+def _case_key(c: Dict[str, Any]) -> Tuple:
+    return (c.get("size"), c.get("max_side"), c.get("mode"), c.get("tile"), c.get("accumulate", "float"))
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], *, tolerance: float = 0.10) -> int:
+    """Print throughput ratios vs a previous run; returns number of regressions beyond tolerance."""
+    base = {_case_key(c): c for c in baseline.get("detect_shelf_gaps", [])}
+    regressions = 0
+    print("\nvs baseline (images/sec ratio, >1 is faster):")
+    for c in current.get("detect_shelf_gaps", []):
+        b = base.get(_case_key(c))
+        if not b or not b.get("images_per_sec") or not c.get("images_per_sec"):
+            continue
+        ratio = c["images_per_sec"] / b["images_per_sec"]
+        flag = ""
+        if ratio < 1.0 - tolerance:
+            regressions += 1
+            flag = "  <-- REGRESSION"
+        print(f"  {c['size']:>10} max_side={str(c['max_side']):>5} {c['mode']:>6} tile={c['tile']:>3} "
+              f"{c.get('accumulate', 'float'):>5}  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark shelf-gap detection throughput")
+    ap.add_argument("-o", "--output-json", type=Path, default=Path("bench_shelf_gaps.json"))
+    ap.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="WxH synthetic image sizes.")
+    ap.add_argument("--max-sides", nargs="+", default=DEFAULT_MAX_SIDES, help="max_side values; 'none' disables.")
+    ap.add_argument("--tiles", nargs="+", type=int, default=DEFAULT_TILES)
+    ap.add_argument("--modes", nargs="+", choices=["local", "global"], default=DEFAULT_MODES)
+    ap.add_argument("--accumulate", nargs="+", choices=["int", "float"], default=["int", "float"],
+                    help="Variance arithmetic paths to compare.")
+    ap.add_argument("--images", type=int, default=4, help="Distinct synthetic images per size.")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--exif-rotate", action="store_true", help="Tag images with EXIF orientation=6.")
+    ap.add_argument("--onnx-model", type=Path, default=None,
+                    help="YOLO-style ONNX model; adds an ONNX-backend vs heuristic comparison.")
+    ap.add_argument("--intra-op-threads", type=int, default=None)
+    ap.add_argument("--inter-op-threads", type=int, default=None)
+    ap.add_argument("--processes", type=int, default=min(4, os.cpu_count() or 1),
+                    help="Worker processes for the shm-vs-pickling pool comparison (0 skips it).")
+    ap.add_argument("--compare", type=Path, default=None, help="Previous JSON result to compare against.")
+    ap.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown before flagging.")
+    args = ap.parse_args(argv)
+
+    report = run(
+        args.sizes, args.max_sides, args.tiles, args.modes, args.accumulate,
+        images_per_size=args.images, repeat=args.repeat, exif_rotate=args.exif_rotate,
+        onnx_model=args.onnx_model, onnx_threads=(args.intra_op_threads, args.inter_op_threads),
+        processes=args.processes,
+    )
+    args.output_json.parent.mkdir(parents=True, exist_ok=True)
+    args.output_json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote {args.output_json}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        return 1 if compare(report, baseline, tolerance=args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
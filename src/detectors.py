@@ -0,0 +1,336 @@
+# src/detectors.py
+"""
+Pluggable shelf-gap detector backends.
+
+- HeuristicBackend:     the tile-variance heuristic (detect_shelf_gaps).
+- OnnxDetectorBackend:  a YOLO-style product detector (e.g. trained on
+                        data/SKU-110K.yaml and exported with `yolo export format=onnx`)
+                        run on CPU with ONNX Runtime. Detected product boxes are
+                        grouped into shelf rows and the uncovered stretches of
+                        each row become gap regions.
+
+Both return GapResult, so callers can switch backends without other changes.
+onnxruntime is optional; it is only imported when the ONNX backend is built.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, List, Literal, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from .detect import GapResult, ImageInput, ShelfBand, _open_image, detect_shelf_gaps
+
+try:  # optional dependency
+    import onnxruntime as ort
+except ImportError:  # pragma: no cover - exercised only without onnxruntime
+    ort = None
+
+__all__ = [
+    "DetectorBackend",
+    "HeuristicBackend",
+    "OnnxDetectorBackend",
+    "Detections",
+    "make_backend",
+    "letterbox_batch",
+    "nms",
+    "gaps_from_boxes",
+]
+
+LETTERBOX_FILL = 114  # YOLO convention
+
+# ---------- interface ----------
+
+class DetectorBackend(Protocol):
+    name: str
+
+    def score_batch(self, images: Sequence[ImageInput]) -> List[GapResult]:
+        ...
+
+
+class HeuristicBackend:
+    """Tile-variance heuristic; kwargs are passed to detect_shelf_gaps."""
+
+    name = "heuristic"
+
+    def __init__(self, **detect_kwargs: Any):
+        self.detect_kwargs = detect_kwargs
+
+    def score_batch(self, images: Sequence[ImageInput]) -> List[GapResult]:
+        return [detect_shelf_gaps(im, **self.detect_kwargs) for im in images]
+
+
+# ---------- pre/post-processing (pure NumPy) ----------
+
+@dataclass(frozen=True)
+class Letterbox:
+    scale: float
+    pad_x: int
+    pad_y: int
+    width: int        # original image size
+    height: int
+
+
+@dataclass(frozen=True)
+class Detections:
+    boxes: np.ndarray       # [N, 4] x1, y1, x2, y2 in original image pixels
+    scores: np.ndarray      # [N]
+    width: int
+    height: int
+
+
+def letterbox_batch(images: Sequence[Image.Image], size: int) -> Tuple[np.ndarray, List[Letterbox]]:
+    """
+    Resize each RGB image to fit size x size (aspect preserved), pad with gray, and
+    return one NCHW float32 batch in [0, 1]. Per-image work is only the resize;
+    padding, layout change and normalization happen once for the whole batch.
+    """
+    canvas = np.full((len(images), size, size, 3), LETTERBOX_FILL, dtype=np.uint8)
+    meta: List[Letterbox] = []
+    for i, im in enumerate(images):
+        w, h = im.size
+        r = min(size / w, size / h)
+        nw, nh = max(1, int(round(w * r))), max(1, int(round(h * r)))
+        px, py = (size - nw) // 2, (size - nh) // 2
+        canvas[i, py:py + nh, px:px + nw] = np.asarray(im.resize((nw, nh), Image.BILINEAR))
+        meta.append(Letterbox(scale=r, pad_x=px, pad_y=py, width=w, height=h))
+    batch = np.ascontiguousarray(canvas.transpose(0, 3, 1, 2), dtype=np.float32)
+    batch *= np.float32(1.0 / 255.0)
+    return batch, meta
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_thresh: float, max_det: int = 300) -> np.ndarray:
+    """Greedy non-maximum suppression; boxes are [N, 4] x1, y1, x2, y2. Returns kept indices."""
+    if boxes.size == 0:
+        return np.empty(0, dtype=np.int64)
+    x1, y1, x2, y2 = boxes.T
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    order = np.argsort(-scores, kind="stable")
+    keep: List[int] = []
+    while order.size and len(keep) < max_det:
+        i = int(order[0])
+        keep.append(i)
+        rest = order[1:]
+        iw = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        ih = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = iw * ih
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[iou <= iou_thresh]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def _decode_yolo(
+    out: np.ndarray, fmt: Literal["auto", "yolov8", "yolov5"],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Raw YOLO head -> (xywh [B, A, 4], score [B, A]).
+
+    yolov8: [B, 4 + nc, A] (no objectness); yolov5: [B, A, 5 + nc].
+    "auto" picks yolov8 when the channel axis is shorter than the anchor axis.
+    """
+    if fmt == "auto":
+        fmt = "yolov8" if out.shape[1] < out.shape[2] else "yolov5"
+    if fmt == "yolov8":
+        out = out.transpose(0, 2, 1)
+        return out[..., :4], out[..., 4:].max(axis=-1)
+    obj = out[..., 4]
+    score = obj * out[..., 5:].max(axis=-1) if out.shape[-1] > 5 else obj
+    return out[..., :4], score
+
+
+def _to_image_boxes(xywh: np.ndarray, lb: Letterbox) -> np.ndarray:
+    cx, cy, w, h = xywh.T
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - lb.pad_x) / lb.scale
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - lb.pad_y) / lb.scale
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, lb.width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, lb.height)
+    return boxes
+
+
+def gaps_from_boxes(
+    boxes: np.ndarray,
+    width: int,
+    height: int,
+    *,
+    min_gap_frac: float = 0.5,
+    row_overlap: float = 0.5,
+) -> GapResult:
+    """
+    Turn product boxes into shelf gaps.
+
+    Boxes are grouped into shelf rows (a box joins a row when it overlaps the row's
+    vertical span by at least row_overlap of its own height). Within each row, any
+    horizontal stretch not covered by a box and at least min_gap_frac x the row's
+    median box width wide is a gap region. gap_score is the height-weighted
+    uncovered fraction across rows.
+    """
+    if len(boxes) == 0:
+        return GapResult(
+            gap_score=1.0, mode="detector", notes="detector products=0",
+            bands=(ShelfBand(top=0.0, bottom=1.0, gap_score=1.0, tiles=0),),
+            regions=((0.0, 0.0, 1.0, 1.0),),
+        )
+
+    rows: List[List[int]] = []
+    spans: List[List[float]] = []
+    for i in np.argsort((boxes[:, 1] + boxes[:, 3]) / 2):
+        y1, y2 = float(boxes[i, 1]), float(boxes[i, 3])
+        bh = max(y2 - y1, 1e-6)
+        for r, (ry1, ry2) in enumerate(spans):
+            if min(y2, ry2) - max(y1, ry1) >= row_overlap * bh:
+                rows[r].append(int(i))
+                spans[r] = [min(ry1, y1), max(ry2, y2)]
+                break
+        else:
+            rows.append([int(i)])
+            spans.append([y1, y2])
+
+    bands: List[ShelfBand] = []
+    regions: List[Tuple[float, float, float, float]] = []
+    weighted, total_h = 0.0, 0.0
+    for idx, (ry1, ry2) in sorted(zip(rows, spans), key=lambda t: t[1][0]):
+        rb = boxes[idx]
+        min_gap = min_gap_frac * float(np.median(rb[:, 2] - rb[:, 0]))
+        uncovered, cursor = 0.0, 0.0
+        for x1, x2 in sorted(zip(rb[:, 0].tolist(), rb[:, 2].tolist())) + [(float(width), float(width))]:
+            if x1 - cursor >= min_gap:
+                uncovered += x1 - cursor
+                regions.append((
+                    round(cursor / width, 3), round(ry1 / height, 3),
+                    round(x1 / width, 3), round(ry2 / height, 3),
+                ))
+            cursor = max(cursor, x2)
+        row_gap = uncovered / width
+        bands.append(ShelfBand(
+            top=round(ry1 / height, 3), bottom=round(ry2 / height, 3),
+            gap_score=round(row_gap, 3), tiles=len(idx),
+        ))
+        weighted += row_gap * (ry2 - ry1)
+        total_h += ry2 - ry1
+
+    score = weighted / total_h if total_h > 0 else 0.0
+    notes = f"detector products={len(boxes)}, rows={len(bands)}, gaps={len(regions)}"
+    return GapResult(
+        gap_score=round(score, 3), mode="detector", notes=notes,
+        bands=tuple(bands), regions=tuple(regions),
+    )
+
+
+# ---------- ONNX Runtime backend ----------
+
+class OnnxDetectorBackend:
+    """
+    CPU object-detector backend on ONNX Runtime.
+
+    Parameters
+    ----------
+    model_path : str | Path
+        Exported YOLO-style ONNX model (single input NCHW float32 in [0, 1]).
+    input_size : int | None
+        Letterbox size; taken from the model's input shape when it is static.
+    conf_thresh, iou_thresh : float
+        Score filter and NMS IoU threshold.
+    intra_op_threads, inter_op_threads : int | None
+        ONNX Runtime thread pools (None keeps ORT defaults).
+    batch_size : int
+        Images per session.run call (clamped to the model's batch dim if static).
+    output_format : "auto" | "yolov8" | "yolov5"
+        Layout of the first model output.
+    min_gap_frac : float
+        Minimum gap width as a fraction of the median product width (see gaps_from_boxes).
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_path: str | Path,
+        *,
+        input_size: Optional[int] = None,
+        conf_thresh: float = 0.25,
+        iou_thresh: float = 0.45,
+        max_det: int = 1000,
+        intra_op_threads: Optional[int] = None,
+        inter_op_threads: Optional[int] = None,
+        batch_size: int = 8,
+        output_format: Literal["auto", "yolov8", "yolov5"] = "auto",
+        min_gap_frac: float = 0.5,
+    ):
+        if ort is None:
+            raise ImportError("onnxruntime is required for OnnxDetectorBackend (pip install onnxruntime)")
+        opts = ort.SessionOptions()
+        if intra_op_threads is not None:
+            opts.intra_op_num_threads = int(intra_op_threads)
+        if inter_op_threads is not None:
+            opts.inter_op_num_threads = int(inter_op_threads)
+            opts.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(model_path), sess_options=opts, providers=["CPUExecutionProvider"])
+
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        n, _, h, w = inp.shape
+        static_size = h if isinstance(h, int) and h == w else None
+        if input_size is None and static_size is None:
+            input_size = 640
+        if static_size is not None and input_size not in (None, static_size):
+            raise ValueError(f"model expects {static_size}x{static_size} input, got input_size={input_size}")
+        self.input_size = int(static_size or input_size)
+        self.batch_size = int(n) if isinstance(n, int) and n > 0 else max(1, int(batch_size))
+        self.conf_thresh = conf_thresh
+        self.iou_thresh = iou_thresh
+        self.max_det = max_det
+        self.output_format = output_format
+        self.min_gap_frac = min_gap_frac
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        n = batch.shape[0]
+        if n < self.batch_size and self.session.get_inputs()[0].shape[0] == self.batch_size:
+            # static batch dim: pad the last chunk
+            pad = np.zeros((self.batch_size - n,) + batch.shape[1:], dtype=batch.dtype)
+            batch = np.concatenate([batch, pad])
+        return self.session.run(None, {self.input_name: batch})[0][:n]
+
+    def detect_batch(self, images: Sequence[ImageInput]) -> List[Optional[Detections]]:
+        """Product boxes per image (None for images that could not be decoded)."""
+        results: List[Optional[Detections]] = [None] * len(images)
+        for start in range(0, len(images), self.batch_size):
+            chunk, pos = [], []
+            for j in range(start, min(start + self.batch_size, len(images))):
+                try:
+                    chunk.append(ImageOps.exif_transpose(_open_image(images[j])).convert("RGB"))
+                    pos.append(j)
+                except Exception:
+                    continue
+            if not chunk:
+                continue
+            batch, meta = letterbox_batch(chunk, self.input_size)
+            xywh, score = _decode_yolo(self._run(batch), self.output_format)
+            for k, (j, lb) in enumerate(zip(pos, meta)):
+                keep = score[k] >= self.conf_thresh
+                boxes = _to_image_boxes(xywh[k][keep].astype(np.float32), lb)
+                s = score[k][keep].astype(np.float32)
+                sel = nms(boxes, s, self.iou_thresh, self.max_det)
+                results[j] = Detections(boxes=boxes[sel], scores=s[sel], width=lb.width, height=lb.height)
+        return results
+
+    def score_batch(self, images: Sequence[ImageInput]) -> List[GapResult]:
+        out: List[GapResult] = []
+        for det in self.detect_batch(images):
+            if det is None:
+                out.append(GapResult(gap_score=0.0, mode="detector", notes="Error processing image: could not decode"))
+            else:
+                out.append(gaps_from_boxes(det.boxes, det.width, det.height, min_gap_frac=self.min_gap_frac))
+        return out
+
+
+def make_backend(kind: Literal["heuristic", "onnx"] = "heuristic", **kwargs: Any) -> DetectorBackend:
+    """Factory: make_backend("onnx", model_path="models/sku110k.onnx", intra_op_threads=4)."""
+    if kind == "heuristic":
+        return HeuristicBackend(**kwargs)
+    if kind == "onnx":
+        return OnnxDetectorBackend(**kwargs)
+    raise ValueError(f"Unknown detector backend: {kind}")
@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from typing import Dict, Sequence, Tuple, Union
 
 def compute_reorder_plan(df: pd.DataFrame) -> pd.DataFrame:
     out = df.copy()
@@ -18,3 +19,121 @@ def compute_reorder_plan(df: pd.DataFrame) -> pd.DataFrame:
 
     cols = ["sku","product_name","on_hand","backroom_units","shelf_units","avg_daily_sales","lead_time_days","safety_stock","days_of_cover","reorder_qty","reorder_flag"]
     return out[cols]
+
+# Scenario parameters and their neutral values (a scenario of all defaults reproduces compute_reorder_plan)
+SCENARIO_DEFAULTS: Dict[str, float] = {
+    "safety_stock": np.nan,     # days; NaN keeps each SKU's own safety_stock
+    "lead_time_scale": 1.0,     # multiplies lead_time_days (e.g. 1.5 = 50% longer lead times)
+    "lead_time_add": 0.0,       # days added to lead_time_days after scaling
+    "demand_scale": 1.0,        # multiplies avg_daily_sales (and shrinks days_of_cover accordingly)
+}
+
+def _reorder_inputs(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Float64 SKU arrays with the same defaults as compute_reorder_plan."""
+    ads = df["avg_daily_sales"].to_numpy(dtype=np.float64)
+    if "days_of_cover" in df.columns:
+        doc = df["days_of_cover"].to_numpy(dtype=np.float64)
+    else:
+        on_hand = df["on_hand"].to_numpy(dtype=np.float64)
+        doc = np.where(on_hand == 0, 0.0001, on_hand) / np.where(ads == 0, 0.0001, ads)
+    ss = df["safety_stock"].to_numpy(dtype=np.float64) if "safety_stock" in df.columns else np.full(len(df), 2.0)
+    return {"ads": ads, "doc": doc, "lead": df["lead_time_days"].to_numpy(dtype=np.float64), "ss": ss}
+
+def _scenario_frame(scenarios: Union[pd.DataFrame, Dict[str, Sequence[float]]]) -> pd.DataFrame:
+    sc = pd.DataFrame(scenarios).reset_index(drop=True)
+    unknown = set(sc.columns) - set(SCENARIO_DEFAULTS) - {"scenario"}
+    if unknown:
+        raise ValueError(f"Unknown scenario parameters: {sorted(unknown)}")
+    for col, default in SCENARIO_DEFAULTS.items():
+        if col not in sc.columns:
+            sc[col] = default
+    if "scenario" not in sc.columns:
+        sc["scenario"] = np.arange(len(sc))
+    if sc["scenario"].duplicated().any():
+        raise ValueError("Scenario labels must be unique")
+    return sc[["scenario", *SCENARIO_DEFAULTS]]
+
+def sweep_reorder_scenarios(
+    df: pd.DataFrame,
+    scenarios: Union[pd.DataFrame, Dict[str, Sequence[float]]],
+    *,
+    flagged_only: bool = True,
+    max_cells: int = 4_000_000,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Evaluate many reorder policies at once.
+
+    `scenarios` has one row per policy with any of the SCENARIO_DEFAULTS columns
+    (plus an optional unique `scenario` label). Parameter vectors are broadcast
+    against the SKU arrays, so reorder_qty for every (scenario, SKU) pair comes from
+    a handful of NumPy operations; scenarios are processed in chunks of at most
+    `max_cells` pairs to bound memory (100k SKUs x 500 scenarios = 50M pairs).
+
+    Returns (results, totals):
+      results  long format [scenario, sku, reorder_qty] (int32), only pairs with
+               reorder_qty > 0 when flagged_only (reorder_flag is then implied),
+               otherwise every pair plus reorder_flag. sku is categorical.
+      totals   one row per scenario: scenario parameters, skus_flagged, total_units.
+    """
+    sc = _scenario_frame(scenarios)
+    base = _reorder_inputs(df)
+    n_sku, n_sc = len(df), len(sc)
+
+    ss_sc = sc["safety_stock"].to_numpy(dtype=np.float64)[:, None]
+    lt_scale = sc["lead_time_scale"].to_numpy(dtype=np.float64)[:, None]
+    lt_add = sc["lead_time_add"].to_numpy(dtype=np.float64)[:, None]
+    d_scale = sc["demand_scale"].to_numpy(dtype=np.float64)[:, None]
+
+    flagged = np.zeros(n_sc, dtype=np.int64)
+    units = np.zeros(n_sc, dtype=np.int64)
+    sc_idx, sku_idx, qtys = [], [], []
+    step = max(1, max_cells // max(n_sku, 1))
+    for s0 in range(0, n_sc, step):
+        sl = slice(s0, s0 + step)
+        # same operation order as compute_reorder_plan, in place on one [chunk, n_sku] buffer
+        x = base["lead"] * lt_scale[sl]
+        x += lt_add[sl]
+        ss_chunk = ss_sc[sl]
+        nan = np.isnan(ss_chunk[:, 0])
+        if nan.all():
+            x += base["ss"]
+        elif not nan.any():
+            x += ss_chunk
+        else:
+            x += np.where(nan[:, None], base["ss"], ss_chunk)
+        ds = d_scale[sl]
+        if (ds == 1.0).all():
+            x -= base["doc"]
+            np.maximum(x, 0, out=x)
+            x *= base["ads"]
+        else:
+            x -= base["doc"] / ds
+            np.maximum(x, 0, out=x)
+            x *= base["ads"] * ds
+        np.ceil(x, out=x)
+        qty = x.astype(np.int32)
+        need = qty > 0
+        flagged[sl] = np.count_nonzero(need, axis=1)
+        units[sl] = qty.sum(axis=1, dtype=np.int64)
+        if flagged_only:
+            flat = np.flatnonzero(need)
+            sc_idx.append(flat // n_sku + s0)
+            sku_idx.append(flat % n_sku)
+            qtys.append(qty.ravel()[flat])
+        else:
+            sc_idx.append(np.repeat(np.arange(s0, s0 + qty.shape[0]), n_sku))
+            sku_idx.append(np.tile(np.arange(n_sku), qty.shape[0]))
+            qtys.append(qty.ravel())
+
+    cat = pd.Categorical(df["sku"])
+    sku_codes = np.concatenate(sku_idx) if sku_idx else np.empty(0, dtype=np.int64)
+    results = pd.DataFrame({
+        "scenario": sc["scenario"].to_numpy()[np.concatenate(sc_idx)] if sc_idx else [],
+        "sku": pd.Categorical.from_codes(cat.codes[sku_codes], categories=cat.categories),
+        "reorder_qty": np.concatenate(qtys) if qtys else np.empty(0, dtype=np.int32),
+    })
+    if not flagged_only:
+        results["reorder_flag"] = results["reorder_qty"] > 0
+
+    totals = sc.assign(skus_flagged=flagged, total_units=units)
+    return results, totals
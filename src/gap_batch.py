@@ -4,11 +4,18 @@ import re
 import sys
 import csv
 import argparse
+import os
+from dataclasses import replace
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Optional, Iterable, Tuple, List
+from typing import Any, Dict, Iterator, Optional, Iterable, Tuple, List
 
 from PIL import UnidentifiedImageError
-from src.detect import detect_shelf_gaps  # import from your module
+import numpy as np
+from src.detect import GapResult, ImageInput, _load_gray, _score_array, detect_shelf_gaps  # import from your module
+from src.gap_cache import GapCache
+from src.gap_dedup import PHashIndex, dhash
+from src.planogram import Planogram, load_planograms
 from tqdm.auto import tqdm
 
 IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif", ".webp"}
@@ -29,6 +36,68 @@ def _extract_sku(p: Path, sku_regex: Optional[str]) -> Optional[str]:
     m = re.match(r"([A-Za-z0-9_-]+)", name)
     return m.group(1) if m else None
 
+def default_workers() -> int:
+    return max(1, min(8, os.cpu_count() or 1))
+
+def iter_gap_scores(
+    items: Iterable[Tuple[Any, ImageInput]],
+    *,
+    max_workers: Optional[int] = None,
+    cache: Optional[GapCache] = None,
+    **params: Any,
+) -> Iterator[Tuple[Any, GapResult]]:
+    """
+    Score (key, image) pairs on a bounded thread pool, yielding (key, result) as each finishes.
+
+    PIL decode/resize and the NumPy variance math release the GIL, so threads scale
+    without pickling images. At most 2 * max_workers images are in flight, so a
+    lazy iterable of many large files never sits in memory all at once.
+    """
+    workers = max_workers or default_workers()
+    score = cache.detect if cache is not None else detect_shelf_gaps
+    it = iter(items)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gap-score") as pool:
+        pending: Dict[Future, Any] = {}
+
+        def _fill() -> None:
+            while len(pending) < 2 * workers:
+                nxt = next(it, None)
+                if nxt is None:
+                    return
+                pending[pool.submit(score, nxt[1], **params)] = nxt[0]
+
+        _fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield pending.pop(fut), fut.result()
+            _fill()
+
+def _score_dedup(
+    img_path: Path, dedup: PHashIndex, cache: Optional[GapCache], *, max_side: int, **params
+) -> GapResult:
+    """
+    Decode once; reuse a near-duplicate's result, else score the same grayscale array.
+
+    Only images scored with the same parameters (planogram included) count as
+    near-duplicates of each other.
+    """
+    im = _load_gray(img_path, max_side=max_side)
+    h = dhash(im)
+    scope = (max_side, tuple(sorted(params.items())))
+    hit = dedup.lookup(h, scope)
+    if hit is not None:
+        src, res = hit
+        return replace(res, notes=f"{res.notes}; near-duplicate of {src}")
+    key = cache.key(img_path, max_side=max_side, **params) if cache is not None else None
+    res = cache.get(key) if key is not None else None
+    if res is None:
+        res = _score_array(np.asarray(im), **params)
+        if key is not None:
+            cache.put(key, res)
+    dedup.add(h, img_path.name, res, scope)
+    return res
+
 def batch_gap_scores(
     input_dir: Path,
     output_csv: Path,
@@ -39,17 +108,26 @@ def batch_gap_scores(
     tile: int = 48,
     uniform_thresh: float = 800.0,
     variance_ref: float = 5000.0,
+    accumulate: str = "int",
     fail_on_no_sku: bool = False,
     show_progress: Optional[bool] = None,
+    cache: Optional[GapCache] = None,
+    dedup: Optional[PHashIndex] = None,
+    planograms: Optional[Dict[str, Planogram]] = None,
 ) -> Tuple[int, int]:
     """
     Returns (processed_count, written_rows).
+    If a GapCache is given, images already scored with the same parameters are not re-scored.
+    If a PHashIndex is given, near-duplicates of an already-scored image inherit its result
+    (notes say which image); dedup.stats["skipped"] counts them afterwards.
+    If planograms ({camera_id: Planogram}) are given, images in a folder named after a
+    camera are scored only inside its SKU regions and get one row per planogram SKU.
     """
     input_dir = Path(input_dir)
     output_csv = Path(output_csv)
     output_csv.parent.mkdir(parents=True, exist_ok=True)
 
-    rows: List[Tuple[str, float, str, str, str]] = []
+    rows: List[Tuple[str, float, str, str, str, str]] = []
     images = list(_iter_images(input_dir))
     auto_progress = (sys.stderr.isatty() and len(images) >= 50)
     use_progress = auto_progress if show_progress is None else bool(show_progress)
@@ -58,28 +136,37 @@ def batch_gap_scores(
     processed = 0
     for img_path in iterator:
         processed += 1
+        planogram = planograms.get(img_path.parent.name) if planograms else None
         sku = _extract_sku(img_path, sku_regex)
         if not sku:
-            if fail_on_no_sku:
+            if fail_on_no_sku and planogram is None:
                 raise ValueError(f"Could not extract SKU from filename: {img_path.name}")
             # write a row with empty sku so you can inspect later
             sku = ""
         try:
-            res = detect_shelf_gaps(
-                img_path,
-                mode=mode, max_side=max_side, tile=tile,
-                uniform_thresh=uniform_thresh, variance_ref=variance_ref,
-            )
-            rows.append((sku, res.gap_score, res.mode, res.notes, str(img_path)))
+            params = dict(mode=mode, tile=tile, uniform_thresh=uniform_thresh,
+                          variance_ref=variance_ref, accumulate=accumulate)
+            if planogram is not None:
+                params["planogram"] = planogram
+            if dedup is not None:
+                res = _score_dedup(img_path, dedup, cache, max_side=max_side, **params)
+            else:
+                score = cache.detect if cache is not None else detect_shelf_gaps
+                res = score(img_path, max_side=max_side, **params)
+            if res.skus:
+                # planogram SKUs are the join key; the filename guess is not needed
+                rows.extend((k.sku, k.gap_score, res.mode, res.notes, str(img_path), "[]") for k in res.skus)
+            else:
+                rows.append((sku, res.gap_score, res.mode, res.notes, str(img_path), res.bands_json()))
         except (UnidentifiedImageError, OSError) as e:
-            rows.append((sku, 0.0, mode, f"Error: {e}", str(img_path)))
+            rows.append((sku, 0.0, mode, f"Error: {e}", str(img_path), "[]"))
         except Exception as e:
-            rows.append((sku, 0.0, mode, f"Unhandled error: {e}", str(img_path)))
+            rows.append((sku, 0.0, mode, f"Unhandled error: {e}", str(img_path), "[]"))
 
     # Write CSV
     with output_csv.open("w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
-        w.writerow(["sku", "gap_score", "mode", "notes", "image_path"])
+        w.writerow(["sku", "gap_score", "mode", "notes", "image_path", "bands"])
         w.writerows(rows)
     return processed, len(rows)
 
@@ -95,6 +182,16 @@ def main(argv: Optional[Iterable[str]] = None) -> int:
     ap.add_argument("--tile", type=int, default=48)
     ap.add_argument("--uniform-thresh", type=float, default=800.0)
     ap.add_argument("--variance-ref", type=float, default=5000.0)
+    ap.add_argument("--accumulate", choices=["int", "float"], default="int",
+                    help="Variance arithmetic: exact uint8 integer sums (default) or legacy float32.")
+    ap.add_argument("--cache-dir", type=Path, default=None,
+                    help="Reuse/store results in a content-addressed cache at this directory.")
+    ap.add_argument("--dedup-threshold", type=int, default=None,
+                    help="Skip re-scoring images whose perceptual hash is within this many bits (of 64) "
+                         "of an already-scored image; they inherit its result.")
+    ap.add_argument("--planograms", type=Path, default=None,
+                    help="JSON of per-camera SKU regions; images in a folder named after a camera "
+                         "are scored per SKU (see src/planogram.py).")
     ap.add_argument("--fail-on-no-sku", action="store_true",
                     help="Raise if a filename does not contain a parseable SKU.")
     # Progress control (tri-state): default auto; --progress to force on; --no-progress to force off
@@ -103,6 +200,7 @@ def main(argv: Optional[Iterable[str]] = None) -> int:
     ap.set_defaults(progress=None)
     args = ap.parse_args(argv)
 
+    dedup = PHashIndex(args.dedup_threshold) if args.dedup_threshold is not None else None
     processed, written = batch_gap_scores(
         args.input_dir,
         args.output_csv,
@@ -112,10 +210,16 @@ def main(argv: Optional[Iterable[str]] = None) -> int:
         tile=args.tile,
         uniform_thresh=args.uniform_thresh,
         variance_ref=args.variance_ref,
+        accumulate=args.accumulate,
         fail_on_no_sku=args.fail_on_no_sku,
         show_progress=args.progress,
+        cache=GapCache(args.cache_dir) if args.cache_dir else None,
+        dedup=dedup,
+        planograms=load_planograms(args.planograms) if args.planograms else None,
     )
     print(f"Processed {processed} images; wrote {written} rows to {args.output_csv}")
+    if dedup is not None:
+        print(f"Skipped {dedup.stats['skipped']} near-duplicate images (threshold {dedup.threshold} bits)")
     return 0
 
 if __name__ == "__main__":
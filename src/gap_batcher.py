@@ -0,0 +1,213 @@
+# src/gap_batcher.py
+"""
+In-process micro-batching for shelf-gap scoring behind the HTTP API.
+
+Cameras send many small, concurrent requests. Scoring each on its own pays the
+per-call NumPy overhead every time, so requests are queued and a collector task
+groups whatever arrives within ``max_wait_ms`` (up to ``max_batch`` images with
+identical parameters) into one ``detect_shelf_gaps_batch`` call on a thread pool.
+
+Metrics (batch sizes, queue latency, scoring time) are kept over a sliding window
+and exposed via ``MicroBatcher.stats``.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+import numpy as np
+
+from .detect import GapResult, detect_shelf_gaps_batch
+from .gap_cache import GapCache
+
+__all__ = ["MicroBatcher"]
+
+
+@dataclass
+class _Pending:
+    data: bytes
+    params: Dict[str, Any]
+    future: asyncio.Future
+    enqueued: float = field(default_factory=time.perf_counter)
+    cache_key: Optional[str] = None
+
+
+def _pct(values: Deque[float], q: float) -> float:
+    return round(float(np.percentile(np.fromiter(values, dtype=float), q)), 3) if values else 0.0
+
+
+class MicroBatcher:
+    """
+    Groups concurrent score() calls into batched detect_shelf_gaps_batch calls.
+
+    Parameters
+    ----------
+    max_batch : int
+        Upper bound on images per scoring call.
+    max_wait_ms : float
+        How long the first request of a batch waits for company.
+    workers : int
+        Thread-pool size; also caps the number of batches being scored at once.
+    cache : GapCache | None
+        When set, cached results are returned without queueing and new ones stored.
+    window : int
+        Number of recent batches/requests the latency and size metrics cover.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+        workers: int = 2,
+        cache: Optional[GapCache] = None,
+        window: int = 1024,
+    ):
+        if max_batch < 1:
+            raise ValueError("max_batch must be >= 1")
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.workers = workers
+        self.cache = cache
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._inflight: set = set()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._batch_sizes: Deque[int] = deque(maxlen=window)
+        self._queue_ms: Deque[float] = deque(maxlen=window)
+        self._score_ms: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self.cache_hits = 0
+
+    # ---------- lifecycle ----------
+
+    def _ensure_started(self) -> None:
+        if self._collector is not None and not self._collector.done():
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="gap-batch")
+        self._collector = asyncio.get_running_loop().create_task(self._collect())
+
+    async def close(self) -> None:
+        """Stop collecting, finish batches already being scored, and shut the pool down."""
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        if self._queue is not None:
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if not item.future.done():
+                    item.future.set_exception(RuntimeError("MicroBatcher closed"))
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    # ---------- public API ----------
+
+    async def score(self, data: bytes, **params: Any) -> GapResult:
+        """Score one encoded image; resolves once its batch has been scored."""
+        self._ensure_started()
+        self.requests += 1
+        item = _Pending(data=data, params=params, future=asyncio.get_running_loop().create_future())
+        if self.cache is not None:
+            item.cache_key = self.cache.key(data, **params)
+            res = self.cache.get(item.cache_key)
+            if res is not None:
+                self.cache_hits += 1
+                return res
+        await self._queue.put(item)
+        return await item.future
+
+    async def score_many(self, images: List[bytes], **params: Any) -> List[GapResult]:
+        """Score several images; they join the queue together and usually share a batch."""
+        return list(await asyncio.gather(*(self.score(d, **params) for d in images)))
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        sizes = self._batch_sizes
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "cache_hits": self.cache_hits,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batch_size_mean": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+            "batch_size_max": max(sizes) if sizes else 0,
+            "queue_ms_p50": _pct(self._queue_ms, 50),
+            "queue_ms_p95": _pct(self._queue_ms, 95),
+            "score_ms_p50": _pct(self._score_ms, 50),
+            "score_ms_p95": _pct(self._score_ms, 95),
+        }
+
+    # ---------- internals ----------
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._queue.get()
+            batch = [first]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # only identical parameters can share one scoring call
+            groups: Dict[str, List[_Pending]] = {}
+            for item in batch:
+                groups.setdefault(json.dumps(item.params, sort_keys=True, default=repr), []).append(item)
+            for items in groups.values():
+                await self._slots.acquire()   # back-pressure: at most `workers` batches in flight
+                task = loop.create_task(self._run_batch(items))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+
+    def _score_batch(self, items: List[_Pending]) -> List[GapResult]:
+        results = detect_shelf_gaps_batch([i.data for i in items], **items[0].params)
+        if self.cache is not None:
+            for item, res in zip(items, results):
+                if item.cache_key and not res.notes.startswith("Error processing image"):
+                    self.cache.put(item.cache_key, res)
+        return results
+
+    async def _run_batch(self, items: List[_Pending]) -> None:
+        try:
+            items = [i for i in items if not i.future.done()]   # drop requests whose client went away
+            if not items:
+                return
+            start = time.perf_counter()
+            for item in items:
+                self._queue_ms.append((start - item.enqueued) * 1000.0)
+            self._batch_sizes.append(len(items))
+            self.batches += 1
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(self._pool, self._score_batch, items)
+            except Exception as e:
+                for item in items:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                return
+            self._score_ms.append((time.perf_counter() - start) * 1000.0)
+            for item, res in zip(items, results):
+                if not item.future.done():
+                    item.future.set_result(res)
+        finally:
+            self._slots.release()
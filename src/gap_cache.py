@@ -0,0 +1,218 @@
+# src/gap_cache.py
+"""
+Content-addressed cache for shelf-gap results.
+
+Key = BLAKE2b(image bytes) + the full, default-filled detect_shelf_gaps
+parameters + CACHE_VERSION. Results live in an in-memory LRU (repeat requests
+are a dict lookup) backed by one small JSON file per key on disk, so they
+survive restarts and are shared between the Streamlit app, the agent tools
+and batch runs.
+
+Paths are additionally memoized by (path, mtime, size) -> content hash, so
+asking about the same file again does not even re-read it.
+"""
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .detect import GapResult, ImageInput, detect_shelf_gaps
+from .utils import project_root
+
+__all__ = ["GapCache", "default_cache", "cached_detect_shelf_gaps", "content_hash"]
+
+# Bump when detect_shelf_gaps' output for the same inputs changes.
+CACHE_VERSION = 2
+
+_DETECT_DEFAULTS: Dict[str, Any] = {
+    name: p.default
+    for name, p in inspect.signature(detect_shelf_gaps).parameters.items()
+    if p.kind is inspect.Parameter.KEYWORD_ONLY
+}
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _params_key(params: Dict[str, Any]) -> str:
+    unknown = set(params) - set(_DETECT_DEFAULTS)
+    if unknown:
+        raise TypeError(f"Unknown detect_shelf_gaps parameters: {sorted(unknown)}")
+    full = {**_DETECT_DEFAULTS, **params}
+    # dataclass parameters (planogram) are keyed by their full contents
+    return json.dumps(full, sort_keys=True, separators=(",", ":"), default=asdict)
+
+
+class GapCache:
+    """
+    LRU-in-memory + on-disk cache of GapResult keyed by image content and parameters.
+
+    Parameters
+    ----------
+    cache_dir : str | Path | None
+        Directory for the on-disk store; None keeps the cache memory-only.
+    max_entries : int
+        In-memory LRU capacity (entries, each a small GapResult).
+    max_path_entries : int
+        Capacity of the (path, mtime, size) -> content-hash memo.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str | Path] = None,
+        *,
+        max_entries: int = 4096,
+        max_path_entries: int = 16384,
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_path_entries = max_path_entries
+        self._mem: "OrderedDict[str, GapResult]" = OrderedDict()
+        self._paths: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0          # served from memory
+        self.disk_hits = 0     # served from disk (then promoted to memory)
+        self.misses = 0        # computed
+
+    # ---------- keys ----------
+
+    def _image_hash(self, image: ImageInput) -> Tuple[str, Optional[bytes]]:
+        """Content hash of the image; also returns the bytes when they had to be read."""
+        if isinstance(image, bytes):
+            return content_hash(image), image
+        if isinstance(image, (str, Path)):
+            p = Path(image)
+            st = p.stat()
+            pkey = (str(p.resolve()), st.st_mtime_ns, st.st_size)
+            with self._lock:
+                h = self._paths.get(pkey)
+                if h is not None:
+                    self._paths.move_to_end(pkey)
+                    return h, None
+            data = p.read_bytes()
+            h = content_hash(data)
+            with self._lock:
+                self._paths[pkey] = h
+                while len(self._paths) > self.max_path_entries:
+                    self._paths.popitem(last=False)
+            return h, data
+        data = image.read()
+        return content_hash(data), data
+
+    def key(self, image: ImageInput, **params: Any) -> str:
+        h, _ = self._image_hash(image)
+        return self._key(h, params)
+
+    @staticmethod
+    def _key(image_hash: str, params: Dict[str, Any]) -> str:
+        pk = hashlib.blake2b(
+            f"v{CACHE_VERSION}|{_params_key(params)}".encode("utf-8"), digest_size=8,
+        ).hexdigest()
+        return f"{image_hash}-{pk}"
+
+    # ---------- storage ----------
+
+    def _disk_path(self, key: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[GapResult]:
+        with self._lock:
+            res = self._mem.get(key)
+            if res is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return res
+        fp = self._disk_path(key)
+        if fp is not None and fp.exists():
+            try:
+                res = GapResult.from_dict(json.loads(fp.read_text(encoding="utf-8")))
+            except Exception:
+                return None
+            with self._lock:
+                self.disk_hits += 1
+            self._remember(key, res)
+            return res
+        return None
+
+    def put(self, key: str, result: GapResult) -> None:
+        self._remember(key, result)
+        fp = self._disk_path(key)
+        if fp is not None:
+            fp.parent.mkdir(parents=True, exist_ok=True)
+            tmp = fp.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(result.to_dict(), separators=(",", ":")), encoding="utf-8")
+            os.replace(tmp, fp)  # atomic: concurrent writers never leave a torn file
+
+    def _remember(self, key: str, result: GapResult) -> None:
+        with self._lock:
+            self._mem[key] = result
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    # ---------- main entry ----------
+
+    def detect(self, image: ImageInput, **params: Any) -> GapResult:
+        """detect_shelf_gaps(image, **params), served from cache when possible."""
+        h, data = self._image_hash(image)
+        key = self._key(h, params)
+        res = self.get(key)
+        if res is not None:
+            return res
+        with self._lock:
+            self.misses += 1
+        res = detect_shelf_gaps(data if data is not None else image, **params)
+        # failures (unreadable file, etc.) are not cached
+        if not res.notes.startswith("Error processing image"):
+            self.put(key, res)
+        return res
+
+    def clear(self, *, disk: bool = False) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._paths.clear()
+        if disk and self.cache_dir is not None:
+            for fp in self.cache_dir.glob("*/*.json"):
+                fp.unlink(missing_ok=True)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / total, 3) if total else 0.0,
+            "entries": len(self._mem),
+        }
+
+
+_default: Optional[GapCache] = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> GapCache:
+    """Process-wide cache stored under data/cache/shelf_gaps (override with GAP_CACHE_DIR)."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            cache_dir = os.getenv("GAP_CACHE_DIR") or (project_root() / "data" / "cache" / "shelf_gaps")
+            _default = GapCache(cache_dir)
+        return _default
+
+
+def cached_detect_shelf_gaps(image: ImageInput, *, cache: Optional[GapCache] = None, **params: Any) -> GapResult:
+    """Drop-in for detect_shelf_gaps that goes through a GapCache (default_cache() if None)."""
+    return (cache or default_cache()).detect(image, **params)
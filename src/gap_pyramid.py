@@ -0,0 +1,283 @@
+# src/gap_pyramid.py
+"""
+Multi-resolution pyramid cache for shelf images.
+
+Full-size shelf photos (12 MP phone shots) cost far more to decode than to
+score. PyramidStore decodes each image once and keeps, keyed by content hash:
+
+- grayscale levels (default 1024, 512, 128 px longest side) as raw uint8 ``.npy``
+  arrays (one byte per pixel, memory-mapped on read), and
+- small color JPEG thumbnails for the UI.
+
+Each level is produced exactly as ``_load_gray`` would produce it at that
+``max_side``, so scoring from a level matches scoring the original. Other
+``max_side`` values are served only when a level holds the full-size
+grayscale (small originals); otherwise the original is decoded.
+
+``enable_pyramids()`` makes ``_load_gray`` read from the store whenever a
+pyramid exists; ``PyramidStore.build_async`` / ``python -m src.gap_pyramid``
+build them in the background.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from . import detect
+from .detect import ImageInput, _downscale, _open_image
+from .gap_cache import content_hash
+from .utils import logger, project_root
+
+__all__ = ["PyramidStore", "default_store", "enable_pyramids", "disable_pyramids"]
+
+PYRAMID_VERSION = 1
+
+
+class PyramidStore:
+    """
+    On-disk grayscale pyramids + color thumbnails keyed by image content hash.
+
+    Parameters
+    ----------
+    root : str | Path
+        Directory holding one sub-directory per image hash.
+    levels : sequence of int
+        Grayscale level sizes (longest side, px).
+    thumb_sides : sequence of int
+        Color JPEG thumbnail sizes for the UI.
+    max_path_entries : int
+        Capacity of the (path, mtime, size) -> content-hash memo.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        *,
+        levels: Sequence[int] = (1024, 512, 128),
+        thumb_sides: Sequence[int] = (128, 512),
+        max_path_entries: int = 16384,
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.levels = tuple(sorted(int(s) for s in levels))
+        self.thumb_sides = tuple(sorted(int(s) for s in thumb_sides))
+        self.max_path_entries = max_path_entries
+        self._paths: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._meta: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    # ---------- keys ----------
+
+    def image_hash(self, image: ImageInput) -> Optional[str]:
+        """Content hash for paths and bytes (paths memoized by mtime/size); None for streams."""
+        if isinstance(image, bytes):
+            return content_hash(image)
+        if not isinstance(image, (str, Path)):
+            return None
+        p = Path(image)
+        st = p.stat()
+        pkey = (str(p.resolve()), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            h = self._paths.get(pkey)
+            if h is not None:
+                self._paths.move_to_end(pkey)
+                return h
+        h = content_hash(p.read_bytes())
+        with self._lock:
+            self._paths[pkey] = h
+            while len(self._paths) > self.max_path_entries:
+                self._paths.popitem(last=False)
+        return h
+
+    def _dir(self, h: str) -> Path:
+        return self.root / h[:2] / h
+
+    def _read_meta(self, h: str) -> Optional[Dict[str, Any]]:
+        meta = self._meta.get(h)
+        if meta is None:
+            fp = self._dir(h) / "meta.json"
+            if not fp.exists():
+                return None
+            meta = json.loads(fp.read_text(encoding="utf-8"))
+            if meta.get("version") != PYRAMID_VERSION:
+                return None
+            self._meta[h] = meta
+        return meta
+
+    # ---------- build ----------
+
+    def build(self, image: ImageInput, *, force: bool = False) -> str:
+        """Decode once and write all levels and thumbnails; returns the content hash."""
+        if isinstance(image, (str, Path)):
+            data = Path(image).read_bytes()
+        elif isinstance(image, bytes):
+            data = image
+        else:
+            data = image.read()
+        h = content_hash(data)
+        if not force and self._read_meta(h) is not None:
+            return h
+
+        d = self._dir(h)
+        d.mkdir(parents=True, exist_ok=True)
+        color = ImageOps.exif_transpose(_open_image(data))
+        gray = color.convert("L")
+        sizes: Dict[str, List[int]] = {}
+        for side in self.levels:
+            lvl = _downscale(gray, side)          # exactly what _load_gray(max_side=side) returns
+            _atomic_save_npy(d / f"gray_{side}.npy", np.asarray(lvl))
+            sizes[str(side)] = list(lvl.size)
+        if color.mode not in ("RGB", "L"):
+            color = color.convert("RGB")
+        for side in self.thumb_sides:
+            thumb = color.copy()
+            thumb.thumbnail((side, side), Image.BILINEAR)
+            tmp = d / f".thumb_{side}.{os.getpid()}.{threading.get_ident()}.jpg"
+            thumb.save(tmp, format="JPEG", quality=85)
+            os.replace(tmp, d / f"thumb_{side}.jpg")
+        meta = {"version": PYRAMID_VERSION, "size": list(gray.size), "levels": sizes}
+        tmp = d / f".meta.{os.getpid()}.{threading.get_ident()}.json"
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, d / "meta.json")            # written last: marks the pyramid complete
+        with self._lock:
+            self._meta[h] = meta
+        return h
+
+    def _try_build(self, image: ImageInput) -> Optional[str]:
+        # one unreadable or undecodable image must not stop a batch
+        try:
+            return self.build(image)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            logger.warning("Pyramid build failed for %s: %s", image if isinstance(image, (str, Path)) else "<bytes>", e)
+            return None
+
+    def build_many(self, images: Iterable[ImageInput], *, workers: int = 2) -> List[Optional[str]]:
+        """Build pyramids in parallel; content hashes in input order (None where an image failed)."""
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pyramid") as pool:
+            return list(pool.map(self._try_build, images))
+
+    def build_async(self, images: Iterable[ImageInput]) -> "Future[List[Optional[str]]]":
+        """Build pyramids on a background thread; returns immediately (see build_many for the result)."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pyramid-bg")
+        items = list(images)
+        return self._pool.submit(lambda: [self._try_build(i) for i in items])
+
+    # ---------- read ----------
+
+    def load_gray(self, image: ImageInput, max_side: Optional[int]) -> Optional[Image.Image]:
+        """
+        Grayscale image at max_side, or None when the caller must decode the original.
+
+        Only two levels give exactly what ``_load_gray`` would: the level built
+        for this very max_side, and a level holding the full-size grayscale
+        (which is downscaled the same way the original would be). Resampling an
+        already-downscaled level gives slightly different pixels, so any other
+        max_side is a miss.
+        """
+        try:
+            h = self.image_hash(image)
+        except OSError:
+            return None
+        meta = self._read_meta(h) if h is not None else None
+        if meta is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        levels: Dict[str, List[int]] = meta["levels"]
+        key = str(int(max_side)) if max_side else None
+        if key not in levels:
+            key = next((k for k, size in levels.items() if size == meta["size"]), None)
+        if key is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        arr = np.load(self._dir(h) / f"gray_{key}.npy", mmap_mode="r")
+        with self._lock:
+            self.hits += 1
+        return _downscale(Image.fromarray(np.ascontiguousarray(arr)), max_side)
+
+    def thumbnail(self, image: ImageInput, side: int = 128, *, build: bool = True) -> Optional[Path]:
+        """Path of the color JPEG thumbnail closest to `side` (building the pyramid if asked)."""
+        h = self.image_hash(image)
+        if h is None:
+            return None
+        if self._read_meta(h) is None:
+            if not build:
+                return None
+            h = self.build(image)
+        best = min(self.thumb_sides, key=lambda s: (s < side, abs(s - side)))
+        return self._dir(h) / f"thumb_{best}.jpg"
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+def _atomic_save_npy(fp: Path, arr: np.ndarray) -> None:
+    tmp = fp.with_name(f".{fp.stem}.{os.getpid()}.{threading.get_ident()}.npy")
+    np.save(tmp, arr)
+    os.replace(tmp, fp)
+
+
+_default: Optional[PyramidStore] = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> PyramidStore:
+    """Process-wide store under data/cache/pyramids (override with PYRAMID_CACHE_DIR)."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            root = os.getenv("PYRAMID_CACHE_DIR") or (project_root() / "data" / "cache" / "pyramids")
+            _default = PyramidStore(root)
+        return _default
+
+
+def enable_pyramids(store: Optional[PyramidStore] = None) -> PyramidStore:
+    """Route _load_gray through `store` (default_store() if None) for images with a pyramid."""
+    store = store or default_store()
+    detect.set_gray_source(store.load_gray)
+    return store
+
+
+def disable_pyramids() -> None:
+    detect.set_gray_source(None)
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    from .gap_batch import IMAGE_EXTS
+
+    ap = argparse.ArgumentParser(description="Build image pyramids for shelf photos")
+    ap.add_argument("input_dir", type=Path, help="Folder of images (recurses).")
+    ap.add_argument("--cache-dir", type=Path, default=None, help="Pyramid store (default data/cache/pyramids).")
+    ap.add_argument("--workers", type=int, default=2)
+    args = ap.parse_args(argv)
+
+    store = PyramidStore(args.cache_dir) if args.cache_dir else default_store()
+    paths = [p for p in args.input_dir.rglob("*") if p.suffix.lower() in IMAGE_EXTS and p.is_file()]
+    built = store.build_many(paths, workers=args.workers)
+    failed = sum(h is None for h in built)
+    print(f"Built pyramids for {len(paths) - failed} images in {store.root}"
+          + (f" ({failed} could not be read)" if failed else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,163 @@
+# src/gap_shm.py
+"""
+Multi-process shelf-gap scoring over shared-memory image buffers.
+
+A ProcessPoolExecutor that receives decoded arrays pickles every image into the
+worker and spends much of its time copying. ShmGapPool instead allocates one
+``multiprocessing.shared_memory`` block split into fixed-size slots (a ring of
+``slots`` grayscale images of up to max_side x max_side bytes):
+
+1. decode threads in the parent run ``_load_gray`` (PIL releases the GIL),
+   then copy the decoded pixels into a free slot (one memcpy per image),
+2. only (slot, height, width) is sent to a worker process, which wraps the
+   slot in a NumPy view and runs the ``_score_array`` math in place,
+3. the slot goes back on the free list when the score comes back.
+
+Workers attach to the block once, at start-up.
+"""
+from __future__ import annotations
+
+import os
+import queue
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .detect import GapResult, ImageInput, _load_gray, _score_array
+
+__all__ = ["ShmGapPool"]
+
+# ---------- worker side ----------
+
+_worker_shm: Optional[shared_memory.SharedMemory] = None
+_worker_slot_bytes = 0
+
+
+def _attach(name: str, slot_bytes: int) -> None:
+    global _worker_shm, _worker_slot_bytes
+    # pool workers share the parent's resource tracker, which unlinks the block once on close()
+    _worker_shm = shared_memory.SharedMemory(name=name)
+    _worker_slot_bytes = slot_bytes
+
+
+def _score_slot(slot: int, shape: Tuple[int, int], params: Dict[str, Any]) -> GapResult:
+    arr = np.ndarray(shape, dtype=np.uint8, buffer=_worker_shm.buf, offset=slot * _worker_slot_bytes)
+    return _score_array(arr, **params)
+
+
+# ---------- parent side ----------
+
+class ShmGapPool:
+    """
+    Worker-process pool that scores images through shared-memory slots.
+
+    Parameters
+    ----------
+    processes : int | None
+        Scoring processes (default: CPU count).
+    slots : int | None
+        Ring size, i.e. images decoded or being scored at once (default: 2 * processes).
+    decode_threads : int | None
+        Parent-side decode threads (default: processes).
+    max_side : int
+        Same as detect_shelf_gaps; also fixes the slot size (max_side ** 2 bytes).
+    mode, variance_ref, tile, uniform_thresh, accumulate, band_delta, min_band_rows
+        Passed through to the scoring math, as in detect_shelf_gaps.
+    """
+
+    def __init__(
+        self,
+        *,
+        processes: Optional[int] = None,
+        slots: Optional[int] = None,
+        decode_threads: Optional[int] = None,
+        max_side: int = 1024,
+        **params: Any,
+    ):
+        if not max_side:
+            raise ValueError("ShmGapPool needs a finite max_side to size its slots")
+        self.processes = processes or os.cpu_count() or 1
+        self.slots = slots or 2 * self.processes
+        self.max_side = int(max_side)
+        self.params: Dict[str, Any] = {
+            "mode": "local", "variance_ref": 5000.0, "tile": 48, "uniform_thresh": 800.0, **params,
+        }
+        self.slot_bytes = self.max_side * self.max_side
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_bytes)
+        self._free: "queue.Queue[int]" = queue.Queue()
+        for i in range(self.slots):
+            self._free.put(i)
+        self._procs = ProcessPoolExecutor(
+            max_workers=self.processes, initializer=_attach, initargs=(self._shm.name, self.slot_bytes),
+        )
+        self._decoders = ThreadPoolExecutor(
+            max_workers=decode_threads or self.processes, thread_name_prefix="gap-decode",
+        )
+
+    def __enter__(self) -> "ShmGapPool":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._decoders.shutdown(wait=True)
+        self._procs.shutdown(wait=True)
+        self._shm.close()
+        self._shm.unlink()
+
+    # ---------- pipeline ----------
+
+    def _decode(self, image: ImageInput) -> Tuple[int, Tuple[int, int]]:
+        arr = np.asarray(_load_gray(image, max_side=self.max_side))
+        slot = self._free.get()  # blocks until a worker hands a slot back
+        view = np.ndarray(arr.shape, dtype=np.uint8, buffer=self._shm.buf, offset=slot * self.slot_bytes)
+        view[...] = arr
+        return slot, arr.shape
+
+    def submit(self, image: ImageInput) -> "Future[GapResult]":
+        """Queue one image; the future resolves to its GapResult."""
+        out: "Future[GapResult]" = Future()
+
+        def _scored(sf: Future, slot: int) -> None:
+            self._free.put(slot)
+            exc = sf.exception()
+            if exc is not None:
+                out.set_exception(exc)
+            else:
+                out.set_result(sf.result())
+
+        def _decoded(df: Future) -> None:
+            try:
+                slot, shape = df.result()
+            except Exception as e:
+                out.set_result(GapResult(
+                    gap_score=0.0, mode=self.params["mode"], notes=f"Error processing image: {e}",
+                ))
+                return
+            try:
+                sf = self._procs.submit(_score_slot, slot, shape, self.params)
+            except Exception as e:      # pool shut down or broken: the slot would otherwise leak
+                self._free.put(slot)
+                out.set_exception(e)
+                return
+            sf.add_done_callback(lambda f: _scored(f, slot))
+
+        self._decoders.submit(self._decode, image).add_done_callback(_decoded)
+        return out
+
+    def imap(self, images: Iterable[ImageInput]) -> Iterator[GapResult]:
+        """Score images in input order, keeping at most `slots` of them in flight."""
+        pending: "deque[Future[GapResult]]" = deque()
+        for image in images:
+            pending.append(self.submit(image))
+            if len(pending) >= self.slots:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def map(self, images: Iterable[ImageInput]) -> List[GapResult]:
+        return list(self.imap(images))
@@ -0,0 +1,251 @@
+# src/gap_stream.py
+"""
+Frame-stream shelf-gap scoring for fixed shelf cameras.
+
+Frames from a static camera are mostly identical, so instead of running
+``detect_shelf_gaps`` on every frame we:
+
+1. take a cheap thumbnail of each frame (strided subsample for arrays, JPEG
+   draft-mode decode for encoded frames),
+2. compare it with the thumbnail of the last *scored* frame, and
+3. only when enough of the thumbnail changed, run the full tile-variance
+   scoring and emit an update if the score actually moved.
+
+Per-tile variances can be smoothed across scored frames (``smoothing``) so a
+shopper walking past does not flip the shelf to "full" for one update.
+
+A frame that cannot be read or decoded yields an update whose ``error`` is
+set (and whose result carries the usual "Error processing image" note); the
+stream's reference frame and last emitted score are left untouched.
+"""
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Literal, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from .detect import (
+    Accumulate,
+    GapResult,
+    ImageInput,
+    _downscale,
+    _load_gray,
+    _local_result,
+    _score_array,
+    _tile_var,
+)
+
+Frame = Union[np.ndarray, ImageInput]
+
+__all__ = ["FrameUpdate", "GapStream", "stream_gap_scores"]
+
+
+@dataclass(frozen=True)
+class FrameUpdate:
+    index: int                # 0-based position of the frame in the stream
+    result: GapResult
+    changed_frac: float       # fraction of thumbnail pixels that changed vs the last scored frame
+    error: Optional[str] = None   # set when the frame could not be read or decoded
+
+
+def _frame_bytes(frame: ImageInput) -> bytes:
+    if isinstance(frame, bytes):
+        return frame
+    if isinstance(frame, (str, Path)):
+        return Path(frame).read_bytes()
+    return frame.read()
+
+
+def _thumbnail(frame: Union[np.ndarray, bytes], side: int) -> np.ndarray:
+    """Small int16 luma thumbnail; cheap enough to compute for every frame."""
+    if isinstance(frame, np.ndarray):
+        h, w = frame.shape[:2]
+        step = max(1, -(-max(h, w) // side))  # ceil division
+        t = frame[::step, ::step]
+        if t.ndim == 3:
+            t = t[..., :3].astype(np.int32)
+            t = (t[..., 0] * 299 + t[..., 1] * 587 + t[..., 2] * 114) // 1000
+        return t.astype(np.int16)
+    im = Image.open(io.BytesIO(frame))
+    im.draft("L", (side, side))  # JPEG: decode at 1/2..1/8 scale instead of full size
+    im = im.convert("L")
+    im.thumbnail((side, side))
+    return np.asarray(im, dtype=np.int16)
+
+
+def _gray_array(frame: Union[np.ndarray, bytes], max_side: Optional[int]) -> np.ndarray:
+    if isinstance(frame, np.ndarray):
+        im = Image.fromarray(frame)
+        if im.mode != "L":
+            im = im.convert("L")
+        return np.asarray(_downscale(im, max_side))
+    return np.asarray(_load_gray(frame, max_side=max_side))
+
+
+class GapStream:
+    """
+    Stateful scorer for a stream of frames from one camera.
+
+    push(frame) returns a FrameUpdate when the shelf score meaningfully changed
+    and None otherwise (frame skipped, or re-scored with no material change).
+
+    Parameters
+    ----------
+    mode, variance_ref, tile, uniform_thresh, max_side, accumulate, band_delta, min_band_rows
+        Same meaning as in detect_shelf_gaps.
+    thumb_side : int
+        Longest side of the change-detection thumbnail.
+    pixel_delta : int
+        Gray-level difference for a thumbnail pixel to count as changed.
+    min_changed_frac : float
+        Re-score only when at least this fraction of thumbnail pixels changed.
+    min_score_delta : float
+        Emit only when gap_score (or any band score) moved by at least this much.
+    smoothing : float
+        Local mode: EMA weight on the previous per-tile variance grid (0 disables).
+    refresh_every : int | None
+        Force a full re-score after this many consecutive skipped frames.
+    """
+
+    def __init__(
+        self,
+        *,
+        mode: Literal["global", "local"] = "local",
+        variance_ref: float = 5000.0,
+        tile: int = 48,
+        uniform_thresh: float = 800.0,
+        max_side: Optional[int] = 1024,
+        accumulate: Accumulate = "int",
+        band_delta: float = 0.34,
+        min_band_rows: int = 2,
+        thumb_side: int = 64,
+        pixel_delta: int = 24,
+        min_changed_frac: float = 0.005,
+        min_score_delta: float = 0.01,
+        smoothing: float = 0.0,
+        refresh_every: Optional[int] = None,
+    ):
+        if not 0.0 <= smoothing < 1.0:
+            raise ValueError("smoothing must be in [0, 1)")
+        self.mode = mode
+        self.variance_ref = variance_ref
+        self.tile = tile
+        self.uniform_thresh = uniform_thresh
+        self.max_side = max_side
+        self.accumulate = accumulate
+        self.band_delta = band_delta
+        self.min_band_rows = min_band_rows
+        self.thumb_side = thumb_side
+        self.pixel_delta = pixel_delta
+        self.min_changed_frac = min_changed_frac
+        self.min_score_delta = min_score_delta
+        self.smoothing = smoothing
+        self.refresh_every = refresh_every
+        self.reset()
+
+    def reset(self) -> None:
+        self._ref_thumb: Optional[np.ndarray] = None
+        self._tile_ema: Optional[np.ndarray] = None
+        self._since_scored = 0
+        self.index = -1
+        self.last_result: Optional[GapResult] = None   # last scored result
+        self.last_emitted: Optional[GapResult] = None
+        self.frames = self.scored = self.skipped = self.emitted = self.errors = 0
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "frames": self.frames,
+            "scored": self.scored,
+            "skipped": self.skipped,
+            "emitted": self.emitted,
+            "errors": self.errors,
+            "skip_ratio": round(self.skipped / self.frames, 3) if self.frames else 0.0,
+        }
+
+    # ---------- internals ----------
+
+    def _changed_frac(self, thumb: np.ndarray) -> float:
+        ref = self._ref_thumb
+        if ref is None or ref.shape != thumb.shape:
+            return 1.0
+        return float((np.abs(thumb - ref) > self.pixel_delta).mean())
+
+    def _score(self, frame: Union[np.ndarray, bytes]) -> GapResult:
+        arr = _gray_array(frame, self.max_side)
+        th = max(8, int(self.tile))
+        H, W = arr.shape
+        Hc, Wc = H - (H % th), W - (W % th)
+        if self.mode != "local" or Hc <= 0 or Wc <= 0:
+            return _score_array(
+                arr, mode=self.mode, variance_ref=self.variance_ref, tile=self.tile,
+                uniform_thresh=self.uniform_thresh, accumulate=self.accumulate,
+                band_delta=self.band_delta, min_band_rows=self.min_band_rows,
+            )
+        tvar = _tile_var(arr[:Hc, :Wc], th, self.accumulate)
+        if self.smoothing and self._tile_ema is not None and self._tile_ema.shape == tvar.shape:
+            tvar = self.smoothing * self._tile_ema + (1.0 - self.smoothing) * tvar
+        self._tile_ema = tvar
+        return _local_result(
+            tvar, th, H, uniform_thresh=self.uniform_thresh,
+            band_delta=self.band_delta, min_band_rows=self.min_band_rows,
+        )
+
+    def _is_material(self, res: GapResult) -> bool:
+        prev = self.last_emitted
+        if prev is None or len(prev.bands) != len(res.bands):
+            return True
+        if abs(res.gap_score - prev.gap_score) >= self.min_score_delta:
+            return True
+        return any(abs(a.gap_score - b.gap_score) >= self.min_score_delta for a, b in zip(res.bands, prev.bands))
+
+    # ---------- public API ----------
+
+    def push(self, frame: Frame) -> Optional[FrameUpdate]:
+        self.index += 1
+        self.frames += 1
+        try:
+            if not isinstance(frame, np.ndarray):
+                frame = _frame_bytes(frame)
+            thumb = _thumbnail(frame, self.thumb_side)
+            changed = self._changed_frac(thumb)
+            refresh_due = self.refresh_every is not None and self._since_scored >= self.refresh_every
+            if changed < self.min_changed_frac and not refresh_due:
+                self.skipped += 1
+                self._since_scored += 1
+                return None
+            res = self._score(frame)
+        except Exception as e:
+            # corrupt / truncated / unreadable frame: report it, keep the stream's state
+            self.errors += 1
+            return FrameUpdate(
+                index=self.index,
+                result=GapResult(gap_score=0.0, mode=self.mode, notes=f"Error processing image: {e}"),
+                changed_frac=0.0,
+                error=str(e),
+            )
+
+        self._ref_thumb = thumb
+        self._since_scored = 0
+        self.scored += 1
+        self.last_result = res
+        if not self._is_material(res):
+            return None
+        self.last_emitted = res
+        self.emitted += 1
+        return FrameUpdate(index=self.index, result=res, changed_frac=round(changed, 4))
+
+    def run(self, frames: Iterable[Frame]) -> Iterator[FrameUpdate]:
+        for frame in frames:
+            update = self.push(frame)
+            if update is not None:
+                yield update
+
+
+def stream_gap_scores(frames: Iterable[Frame], **kwargs: Any) -> Iterator[FrameUpdate]:
+    """Score an iterable of frames, yielding only meaningful updates (see GapStream)."""
+    return GapStream(**kwargs).run(frames)
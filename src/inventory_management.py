@@ -8,15 +8,20 @@ expected revenue, and holding costs.
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional, Union, Any
 import warnings
 
 from db.database_manager import DatabaseManager
+from src.safety_stock import default_sigma_cache, safety_stock_units
 
 warnings.filterwarnings('ignore')
 
+# Single-item lookups: fixed statements fetched as one row (no DataFrame per call)
+_ITEM_INVENTORY_SQL = "SELECT unit FROM inv WHERE item_id = ? LIMIT 1"
+_ITEM_DETAILS_SQL = "SELECT description, price, lead_time, holding_cost FROM item_dim WHERE item_id = ? LIMIT 1"
+_DETAIL_COLUMNS = ['description', 'price', 'lead_time', 'holding_cost']
+
 
 class InventoryManager:
     """
@@ -29,8 +34,15 @@ class InventoryManager:
     - Provide inventory optimization recommendations
     """
     
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, service_level: Optional[float] = None):
+        """
+        Args:
+            db_manager: Database manager instance
+            service_level: If set (e.g. 0.95), safety stock is z * sigma_demand * sqrt(lead_time)
+                with sigma from the fleet-wide sales aggregate instead of the fixed safety factor
+        """
         self.db_manager = db_manager
+        self.service_level = service_level
         
     def get_item_inventory(self, item_id: str) -> Optional[int]:
         """
@@ -42,12 +54,33 @@ class InventoryManager:
         Returns:
             Current inventory units, or None if not found
         """
-        query = "SELECT unit FROM inv WHERE item_id = ?"
-        result = self.db_manager.execute_query(query, (item_id,))
+        try:
+            row = self.db_manager.fetch_row(_ITEM_INVENTORY_SQL, (item_id,))
+        except Exception:
+            return None
+        return int(row["unit"]) if row is not None and row["unit"] is not None else None
+    
+    def get_items_inventory(self, item_ids: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        Get current inventory levels for many items in one query.
         
-        if result.get("success", False) and not result["data"].empty:
-            return int(result["data"]["unit"].iloc[0])
-        return None
+        Args:
+            item_ids: Item IDs (None = every item in inv)
+            
+        Returns:
+            Dict of item_id -> units (items without inventory are absent)
+        """
+        if item_ids is None:
+            query, params = "SELECT item_id, unit FROM inv ORDER BY item_id", None
+        else:
+            query = "SELECT item_id, unit FROM inv WHERE item_id IN (SELECT unnest(?::VARCHAR[]))"
+            params = ([str(i) for i in item_ids],)
+        result = self.db_manager.execute_query(query, params)
+        
+        if not result.get("success", False) or result["data"].empty:
+            return {}
+        data = result["data"].dropna(subset=["unit"]).drop_duplicates("item_id")
+        return dict(zip(data["item_id"], data["unit"].astype("int64").tolist()))
     
     def get_item_details(self, item_id: str) -> Dict[str, Union[str, float]]:
         """
@@ -57,24 +90,45 @@ class InventoryManager:
             item_id: Item ID
             
         Returns:
-            Dict with item details
+            Dict with item details (NULL price / holding_cost are NaN, a NULL lead_time is None)
         """
-        query = """
-        SELECT description, price, lead_time, holding_cost 
-        FROM item_dim 
-        WHERE item_id = ?
+        try:
+            row = self.db_manager.fetch_row(_ITEM_DETAILS_SQL, (item_id,))
+        except Exception:
+            return {}
+        if row is None:
+            return {}
+        return {
+            'description': row['description'],
+            'price': np.nan if row['price'] is None else float(row['price']),
+            'lead_time': None if row['lead_time'] is None else int(row['lead_time']),
+            'holding_cost': np.nan if row['holding_cost'] is None else float(row['holding_cost'])
+        }
+    
+    def get_items_details(self, item_ids: Optional[List[str]] = None) -> pd.DataFrame:
         """
-        result = self.db_manager.execute_query(query, (item_id,))
+        Get item details for many items in one query.
         
-        if result.get("success", False) and not result["data"].empty:
-            row = result["data"].iloc[0]
-            return {
-                'description': row['description'],
-                'price': float(row['price']),
-                'lead_time': int(row['lead_time']),
-                'holding_cost': float(row['holding_cost'])
-            }
-        return {}
+        Args:
+            item_ids: Item IDs (None = every item in item_dim)
+            
+        Returns:
+            DataFrame indexed by item_id with description, price, lead_time, holding_cost
+            (unknown items are absent; lead_time is nullable Int64, so a NULL lead time
+            is <NA> rather than failing the whole lookup)
+        """
+        if item_ids is None:
+            query, params = f"SELECT item_id, {', '.join(_DETAIL_COLUMNS)} FROM item_dim", None
+        else:
+            query = (f"SELECT item_id, {', '.join(_DETAIL_COLUMNS)} FROM item_dim "
+                     "WHERE item_id IN (SELECT unnest(?::VARCHAR[]))")
+            params = ([str(i) for i in item_ids],)
+        result = self.db_manager.execute_query(query, params)
+        
+        if not result.get("success", False):
+            return pd.DataFrame(columns=_DETAIL_COLUMNS, index=pd.Index([], name='item_id'))
+        data = result["data"].drop_duplicates("item_id").set_index("item_id")
+        return data.astype({'price': float, 'lead_time': 'Int64', 'holding_cost': float})
     
     def calculate_coverage_days(self, forecast_df: pd.DataFrame, current_inventory: int) -> Dict[str, Union[str, int]]:
         """
@@ -121,7 +175,9 @@ class InventoryManager:
                 'message': f"Inventory will be exhausted in {coverage_days} days ({cover_until.strftime('%Y-%m-%d')})"
             }
     
-    def calculate_reorder_point(self, forecast_df: pd.DataFrame, lead_time: int, safety_factor: float = 1.25) -> Dict[str, Union[float, int]]:
+    def calculate_reorder_point(self, forecast_df: pd.DataFrame, lead_time: int, safety_factor: float = 1.25,
+                                demand_sigma: Optional[float] = None,
+                                service_level: Optional[float] = None) -> Dict[str, Union[float, int]]:
         """
         Calculate reorder point (ROP) based on lead time and forecast demand.
         
@@ -129,6 +185,9 @@ class InventoryManager:
             forecast_df: Forecast DataFrame with 'ds', 'yhat' columns
             lead_time: Lead time in days
             safety_factor: Safety stock multiplier (default 1.25 = 25% safety stock)
+            demand_sigma: Standard deviation of daily demand (units)
+            service_level: Target cycle service level; with demand_sigma, safety stock is
+                z * demand_sigma * sqrt(lead_time) and safety_factor is ignored
             
         Returns:
             Dict with ROP information
@@ -140,14 +199,20 @@ class InventoryManager:
             lead_time_demand = forecast_df['yhat'].iloc[:lead_time].sum()
         
         # Calculate safety stock
-        safety_stock = lead_time_demand * (safety_factor - 1)
-        reorder_point = lead_time_demand * safety_factor
+        if service_level is not None and demand_sigma is not None:
+            safety_stock = float(safety_stock_units(demand_sigma, lead_time, service_level))
+            reorder_point = lead_time_demand + safety_stock
+            method = {'service_level': service_level, 'demand_sigma': round(float(demand_sigma), 2)}
+        else:
+            safety_stock = lead_time_demand * (safety_factor - 1)
+            reorder_point = lead_time_demand * safety_factor
+            method = {'safety_factor': safety_factor}
         
         return {
             'reorder_point': round(reorder_point),
             'lead_time_demand': round(lead_time_demand),
             'safety_stock': round(safety_stock),
-            'safety_factor': safety_factor,
+            **method,
             'message': f"Reorder when inventory reaches {round(reorder_point)} units"
         }
     
@@ -194,21 +259,27 @@ class InventoryManager:
             'profit_margin': round((gross_profit / expected_revenue * 100) if expected_revenue > 0 else 0, 1)
         }
     
-    def generate_inventory_insights(self, item_id: str, forecast_df: pd.DataFrame) -> Dict[str, Any]:
+    def generate_inventory_insights(self, item_id: str, forecast_df: pd.DataFrame,
+                                    current_inventory: Optional[int] = None,
+                                    item_details: Optional[Dict[str, Union[str, float]]] = None) -> Dict[str, Any]:
         """
         Generate comprehensive inventory insights for an item.
         
         Args:
             item_id: Item ID
             forecast_df: Forecast DataFrame from Prophet
+            current_inventory: Units on hand, if already fetched (see get_items_inventory)
+            item_details: Item details, if already fetched (see get_items_details)
             
         Returns:
             Dict with all inventory insights
         """
         try:
-            # Get current inventory and item details
-            current_inventory = self.get_item_inventory(item_id)
-            item_details = self.get_item_details(item_id)
+            # Get current inventory and item details unless the caller prefetched them in bulk
+            if current_inventory is None:
+                current_inventory = self.get_item_inventory(item_id)
+            if item_details is None:
+                item_details = self.get_item_details(item_id)
             
             if current_inventory is None:
                 return {
@@ -224,9 +295,24 @@ class InventoryManager:
                     'item_id': item_id
                 }
             
+            if pd.isna(item_details.get('lead_time')):
+                return {
+                    'success': False,
+                    'error': f"No lead time recorded for item {item_id}",
+                    'item_id': item_id
+                }
+            item_details = {**item_details, 'lead_time': int(item_details['lead_time'])}
+            
             # Calculate insights
             coverage_info = self.calculate_coverage_days(forecast_df, current_inventory)
-            rop_info = self.calculate_reorder_point(forecast_df, item_details['lead_time'])
+            sigma = None
+            if self.service_level is not None:
+                # one grouped aggregate for all SKUs, cached until new sales arrive
+                sigma = default_sigma_cache().sigma(self.db_manager, item_id)
+            rop_info = self.calculate_reorder_point(
+                forecast_df, item_details['lead_time'],
+                demand_sigma=sigma, service_level=self.service_level if sigma is not None else None,
+            )
             financial_info = self.calculate_financial_metrics(
                 forecast_df, current_inventory, 
                 item_details['price'], item_details['holding_cost']
@@ -292,6 +378,8 @@ class InventoryManager:
         fcst['inventory'] = current_inventory - fcst['cum_demand']
         fcst['inventory'] = fcst['inventory'].clip(lower=0)
         
+        import matplotlib.pyplot as plt
+
         # Create figure with subplots
         fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
         
@@ -451,17 +539,18 @@ INVENTORY INSIGHTS - {insights['item_description']}
             }
 
 
-def create_inventory_manager(db_manager: DatabaseManager) -> InventoryManager:
+def create_inventory_manager(db_manager: DatabaseManager, service_level: Optional[float] = None) -> InventoryManager:
     """
     Factory function to create an inventory manager.
     
     Args:
         db_manager: Database manager instance
+        service_level: Optional target service level for sigma-based safety stock
         
     Returns:
         InventoryManager instance
     """
-    return InventoryManager(db_manager)
+    return InventoryManager(db_manager, service_level=service_level)
 
 
 # Example usage and testing
@@ -0,0 +1,168 @@
+# src/inventory_snapshot.py
+"""
+Process-wide in-memory snapshot of the processed inventory for the agent tools.
+
+Tool calls used to re-read ``inventory_clean.csv`` on every invocation and scan
+the whole ``sku`` column per lookup. A snapshot is loaded once per source
+version (file path + mtime + size, plus a version counter bumped when the
+DuckDB copy is replaced) and holds:
+
+- the DataFrame (read from ``inventory_clean.parquet`` when it is at least as
+  new as the CSV, since Parquet loads several times faster),
+- a hash index from lower-cased SKU to row position for exact lookups,
+- the summary KPIs ``tool_load_inventory`` reports,
+- on first search, an n-gram index over sku / product_name (src/search_index.py).
+
+After the first load, a tool call costs one ``stat`` plus a dict lookup.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .search_index import NgramIndex, shared_index
+
+__all__ = ["InventorySnapshot", "SnapshotCache", "default_snapshot_cache"]
+
+_ROW_FIELDS = ("on_hand", "backroom_units", "shelf_units", "lead_time_days", "avg_daily_sales")
+
+
+@dataclass
+class InventorySnapshot:
+    df: pd.DataFrame
+    source: Tuple[Any, ...]                 # (path, mtime_ns, size, version)
+    kpis: Dict[str, Any] = field(default_factory=dict)
+    _index: Dict[str, int] = field(default_factory=dict, repr=False)
+    _skus: np.ndarray = field(default=None, repr=False)
+    _cols: Dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, source: Tuple[Any, ...]) -> "InventorySnapshot":
+        snap = cls(df=df, source=source)
+        if "sku" not in df.columns:
+            return snap
+        skus = df["sku"].astype(str).to_numpy()
+        snap._skus = skus
+        # first occurrence wins, like the previous .loc[...].iloc[0]
+        snap._index = {}
+        for i, s in enumerate(skus):
+            snap._index.setdefault(s.lower(), i)
+        snap._cols = {
+            c: pd.to_numeric(df[c], errors="coerce").fillna(0).to_numpy(dtype=float)
+            for c in _ROW_FIELDS if c in df.columns
+        }
+        on_hand = df.get("on_hand", pd.Series(dtype=float))
+        ads = df.get("avg_daily_sales", pd.Series(dtype=float))
+        snap.kpis = {
+            "unique_sku": int(df["sku"].nunique()),
+            "total_on_hand": int(on_hand.sum()),
+            "avg_daily_sales_mean": float(round(ads.mean() or 0.0, 3)),
+        }
+        return snap
+
+    @property
+    def has_sku(self) -> bool:
+        return self._skus is not None
+
+    @property
+    def search_index(self) -> NgramIndex:
+        """N-gram index over sku/product_name, built on first use and shared per snapshot version."""
+        return shared_index(self.source, self.df)
+
+    def search(self, query: str, *, limit: int = 20, **kw) -> List[Tuple[int, float]]:
+        """Ranked [(row, score)] for a substring / typo-tolerant query (see NgramIndex.search)."""
+        return self.search_index.search(query, limit=limit, **kw)
+
+    def find(self, sku: str) -> Optional[int]:
+        """Row position for `sku`: exact (case-insensitive) hash hit, else best substring match."""
+        q = str(sku).lower()
+        pos = self._index.get(q)
+        if pos is not None:
+            return pos
+        hits = self.search(q, limit=1, fuzzy=False)
+        return hits[0][0] if hits else None
+
+    def row(self, pos: int) -> Dict[str, Any]:
+        """sku plus the numeric fields at `pos` (0 for missing columns)."""
+        out: Dict[str, Any] = {"sku": self._skus[pos]}
+        for c in _ROW_FIELDS:
+            col = self._cols.get(c)
+            out[c] = float(col[pos]) if col is not None else 0.0
+        return out
+
+
+def _source_file(data_processed: Path) -> Optional[Path]:
+    csv = data_processed / "inventory_clean.csv"
+    parq = data_processed / "inventory_clean.parquet"
+    if parq.exists() and (not csv.exists() or parq.stat().st_mtime_ns >= csv.stat().st_mtime_ns):
+        return parq
+    return csv if csv.exists() else None
+
+
+def _read(fp: Path) -> Optional[pd.DataFrame]:
+    try:
+        return pd.read_parquet(fp) if fp.suffix == ".parquet" else pd.read_csv(fp)
+    except Exception:
+        return None
+
+
+class SnapshotCache:
+    """One InventorySnapshot per processed-data directory, reloaded when its source changes."""
+
+    def __init__(self):
+        self._snaps: Dict[str, InventorySnapshot] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        self.loads = 0
+        self.hits = 0
+
+    def invalidate(self) -> None:
+        """Force a reload on next get() (call after replacing the inventory in DuckDB)."""
+        with self._lock:
+            self.version += 1
+
+    def get(self, data_processed: Path) -> Optional[InventorySnapshot]:
+        fp = _source_file(Path(data_processed))
+        if fp is None:
+            return None
+        try:
+            st = fp.stat()
+        except OSError:
+            return None
+        source = (str(fp), st.st_mtime_ns, st.st_size, self.version)
+        key = str(data_processed)
+        with self._lock:
+            snap = self._snaps.get(key)
+            if snap is not None and snap.source == source:
+                self.hits += 1
+                return snap
+        df = _read(fp)
+        if df is None:
+            return None
+        snap = InventorySnapshot.build(df, source)
+        with self._lock:
+            self._snaps[key] = snap
+            self.loads += 1
+        return snap
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {"snapshots": len(self._snaps), "loads": self.loads, "hits": self.hits, "version": self.version}
+
+
+_default: Optional[SnapshotCache] = None
+_default_lock = threading.Lock()
+
+
+def default_snapshot_cache() -> SnapshotCache:
+    """Process-wide cache shared by the agent tools and the app."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = SnapshotCache()
+        return _default
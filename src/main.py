@@ -1,4 +1,5 @@
 # main.py
+import asyncio
 import os
 import sys
 import json
@@ -11,12 +12,17 @@ from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 # --- Your existing data/logic imports ---
 # (These must be available in your environment)
 from .retail_query_graph import RetailDataQueryGraph
+from .gap_batcher import MicroBatcher
+from .gap_cache import default_cache
+from db.database_manager import DatabaseManager
+from db.async_database import AsyncDatabase
 
 # Optional/conditional imports used by inventory handler
 # (kept inside method to avoid import errors if modules are absent)
 
 # --- FastAPI bits ---
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, File, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware  # <-- ADDED: CORS
 from pydantic import BaseModel
 from routes.express_to_fastapi import router as items_router
@@ -264,6 +270,54 @@ def get_engine() -> MemoryEnabledMain:
         raise HTTPException(status_code=500, detail=_engine_init_error)
     return _engine
 
+# Shelf-gap scoring: concurrent /detect requests are micro-batched into one
+# vectorized scoring call (window and size tunable via env).
+_gap_batcher = MicroBatcher(
+    max_batch=int(os.getenv("DETECT_MAX_BATCH", "32")),
+    max_wait_ms=float(os.getenv("DETECT_MAX_WAIT_MS", "5")),
+    workers=int(os.getenv("DETECT_WORKERS", "2")),
+    cache=default_cache(),
+)
+
+@app.on_event("shutdown")
+async def _close_gap_batcher():
+    await _gap_batcher.close()
+
+# Data endpoints query DuckDB off the event loop: at most DB_MAX_CONCURRENT
+# queries run at once, each interrupted after DB_QUERY_TIMEOUT_S or when the
+# client disconnects.
+_db_max_concurrent = int(os.getenv("DB_MAX_CONCURRENT", "4"))
+_db = AsyncDatabase(
+    DatabaseManager(read_only=True, pool_size=_db_max_concurrent),
+    max_concurrent=_db_max_concurrent,
+    timeout=float(os.getenv("DB_QUERY_TIMEOUT_S", "30")),
+)
+
+@app.on_event("shutdown")
+async def _close_db():
+    await _db.close()
+
+async def _until_disconnect(request: Request, aw):
+    """Await `aw`, cancelling it (and the query behind it) if the client goes away first."""
+    task = asyncio.ensure_future(aw)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=0.25)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            raise HTTPException(status_code=499, detail="Client disconnected")
+
+async def _query(request: Request, query: str, params=None, **kwargs):
+    try:
+        result = await _until_disconnect(request, _db.execute_query(query, params, **kwargs))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Query timed out")
+    if not result.get("success"):
+        raise HTTPException(status_code=500, detail=result.get("error", "Query failed"))
+    return result["data"]
+
 # --------- API Schemas ---------
 class ChatRequest(BaseModel):
     message: str
@@ -288,11 +342,12 @@ def test():
     return {"ok": True, "timestamp": datetime.utcnow().isoformat() + "Z"}
 
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
+async def chat(req: ChatRequest, request: Request):
     engine = get_engine()
     if not os.getenv("OPENAI_API_KEY"):
         raise HTTPException(status_code=400, detail="OPENAI_API_KEY is not set.")
-    result = engine.process_query_with_context(req.message)
+    # the LLM + graph pipeline is synchronous; run it in the worker pool and stop waiting on disconnect
+    result = await _until_disconnect(request, run_in_threadpool(engine.process_query_with_context, req.message))
     # Auto-save every 2 exchanges (same heuristic)
     if len(engine.messages) % 4 == 0:
         engine.save_conversation_history()
@@ -315,6 +370,64 @@ def context():
     engine = get_engine()
     return {"context": engine.get_context_summary()}
 
+@app.get("/inventory/{item_id}")
+async def inventory_item(item_id: str, request: Request):
+    """Current units on hand plus item attributes."""
+    data = await _query(request, """
+        SELECT i.item_id, i.unit, d.description, d.price, d.lead_time
+        FROM inv i LEFT JOIN item_dim d USING (item_id)
+        WHERE i.item_id = ?
+    """, (item_id,), use_cache=True)
+    if data.empty:
+        raise HTTPException(status_code=404, detail=f"Unknown item {item_id}")
+    return json.loads(data.iloc[:1].to_json(orient="records"))[0]
+
+@app.get("/sales/{item_id}")
+async def item_sales(item_id: str, request: Request, days: int = Query(90, ge=1, le=3660)):
+    """Daily unit sales for the item's most recent `days` days of history."""
+    data = await _query(request, """
+        SELECT CAST(date AS DATE) AS date, SUM(sale) AS sales
+        FROM sales
+        WHERE item_id = ?
+          AND date > (SELECT max(date) FROM sales WHERE item_id = ?) - to_days(?)
+        GROUP BY 1
+        ORDER BY 1
+    """, (item_id, item_id, days), use_cache=True, max_rows=days)
+    return {"item_id": item_id, "days": [{"date": d.strftime("%Y-%m-%d"), "sales": int(v)} for d, v in zip(data["date"], data["sales"])]}
+
+@app.get("/db/metrics")
+def db_metrics():
+    """Async query facade counters (running / waiting / cancelled / timeouts)."""
+    return _db.stats
+
+@app.post("/detect")
+async def detect(
+    file: Optional[UploadFile] = File(None),
+    files: Optional[List[UploadFile]] = File(None),
+    mode: str = Query("local", pattern="^(local|global)$"),
+    tile: int = Query(48, ge=8),
+    uniform_thresh: float = Query(800.0, gt=0),
+):
+    """
+    Score shelf images for gaps.
+
+    Send one image as multipart field `file` to get a single GapResult, or several
+    as repeated `files` fields to get {"results": [GapResult, ...]} in upload order.
+    """
+    if file is None and not files:
+        raise HTTPException(status_code=400, detail="Upload an image as 'file' or one or more as 'files'.")
+    params = {"mode": mode, "tile": tile, "uniform_thresh": uniform_thresh}
+    if file is not None:
+        res = await _gap_batcher.score(await file.read(), **params)
+        return res.to_dict()
+    results = await _gap_batcher.score_many([await f.read() for f in files], **params)
+    return {"results": [r.to_dict() for r in results]}
+
+@app.get("/detect/metrics")
+def detect_metrics():
+    """Micro-batching metrics: batch sizes, queue latency and scoring time (ms)."""
+    return _gap_batcher.stats
+
 # =========================
 # CLI Mode (optional)
 # =========================
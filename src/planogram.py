@@ -0,0 +1,84 @@
+# src/planogram.py
+"""
+Per-camera planogram regions for shelf-gap scoring.
+
+A planogram maps rectangles of a fixed camera's view to the SKUs stocked there.
+With one, ``detect_shelf_gaps(..., planogram=...)`` only computes tile variance
+inside those rectangles (floor, ceiling and signage are never touched) and
+returns a gap score per SKU, which joins directly onto the inventory table.
+
+Definitions live in a JSON file keyed by camera id; boxes are fractions of the
+image width/height::
+
+    {
+      "aisle3_cam1": [
+        {"sku": "FOODS_3_090", "box": [0.00, 0.10, 0.50, 0.45]},
+        {"sku": "FOODS_3_120", "box": [0.50, 0.10, 1.00, 0.45]}
+      ]
+    }
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Tuple
+
+__all__ = ["PlanogramRegion", "Planogram", "RegionMask", "region_masks", "load_planograms"]
+
+
+@dataclass(frozen=True)
+class PlanogramRegion:
+    sku: str
+    x0: float                 # 0..1, fraction of image width
+    y0: float                 # 0..1, fraction of image height
+    x1: float
+    y1: float
+
+    def __post_init__(self):
+        if not (0.0 <= self.x0 < self.x1 <= 1.0 and 0.0 <= self.y0 < self.y1 <= 1.0):
+            raise ValueError(f"Region for {self.sku!r} must satisfy 0 <= x0 < x1 <= 1 and 0 <= y0 < y1 <= 1")
+
+
+@dataclass(frozen=True)
+class Planogram:
+    camera_id: str
+    regions: Tuple[PlanogramRegion, ...]
+
+    @classmethod
+    def from_list(cls, camera_id: str, items) -> "Planogram":
+        return cls(camera_id, tuple(PlanogramRegion(str(r["sku"]), *map(float, r["box"])) for r in items))
+
+
+@dataclass(frozen=True)
+class RegionMask:
+    """A region snapped to the tile grid of one image size, as pixel slices."""
+    sku: str
+    rows: slice
+    cols: slice
+
+
+@lru_cache(maxsize=256)
+def region_masks(planogram: Planogram, height: int, width: int, th: int) -> Tuple[RegionMask, ...]:
+    """
+    Tile-aligned pixel rectangles for each region of `planogram` on a height x width
+    image with th-pixel tiles. Computed once per (planogram, size, tile) and cached,
+    since a fixed camera always produces the same frame size.
+    Regions smaller than a tile still cover the one tile nearest to them.
+    """
+    Ty, Tx = height // th, width // th
+    out = []
+    for r in planogram.regions:
+        ty0 = min(int(round(r.y0 * height / th)), Ty - 1)
+        ty1 = max(int(round(r.y1 * height / th)), ty0 + 1)
+        tx0 = min(int(round(r.x0 * width / th)), Tx - 1)
+        tx1 = max(int(round(r.x1 * width / th)), tx0 + 1)
+        out.append(RegionMask(r.sku, slice(ty0 * th, min(ty1, Ty) * th), slice(tx0 * th, min(tx1, Tx) * th)))
+    return tuple(out)
+
+
+def load_planograms(path: str | Path) -> Dict[str, Planogram]:
+    """Read {camera_id: [{"sku": ..., "box": [x0, y0, x1, y1]}, ...]} from a JSON file."""
+    raw = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {cam: Planogram.from_list(cam, items) for cam, items in raw.items()}
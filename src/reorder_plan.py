@@ -0,0 +1,215 @@
+# src/reorder_plan.py
+"""
+Incrementally maintained reorder plan.
+
+compute_reorder_plan is a pure function of each SKU's own row, so after the
+first build only SKUs whose inventory changed need recomputing. ReorderPlanTable
+keeps one plan row per SKU plus a list ordered by (-reorder_qty, sku); a delta
+of k SKUs costs k row recomputes and k sorted-list updates, and top_n(n) reads
+the first n entries without touching the rest of the catalog.
+
+Deltas arrive either as SKU-keyed upserts (``upsert``/``remove``) or as a full
+inventory snapshot (``sync``), which is diffed against the previous one so only
+changed rows are recomputed.
+"""
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left, insort
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .forecast import compute_reorder_plan
+
+__all__ = ["ReorderPlanTable", "PLAN_COLUMNS", "shared_plan_table"]
+
+PLAN_COLUMNS = [
+    "sku", "product_name", "on_hand", "backroom_units", "shelf_units", "avg_daily_sales",
+    "lead_time_days", "safety_stock", "days_of_cover", "reorder_qty", "reorder_flag",
+]
+# Columns compute_reorder_plan reads (days_of_cover/safety_stock are optional)
+_INPUT_COLUMNS = [
+    "product_name", "on_hand", "backroom_units", "shelf_units", "avg_daily_sales",
+    "lead_time_days", "safety_stock", "days_of_cover",
+]
+_REQUIRED = ["product_name", "on_hand", "backroom_units", "shelf_units", "avg_daily_sales", "lead_time_days"]
+
+
+def _days_of_cover(on_hand: pd.Series, ads: pd.Series) -> np.ndarray:
+    """Same derivation as clean_inventory_df (0 when avg_daily_sales == 0)."""
+    a, o = ads.to_numpy(dtype=float), on_hand.to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.maximum(np.where(a > 0, o / a, 0.0), 0)
+
+
+class ReorderPlanTable:
+    """
+    Reorder plan kept up to date from inventory deltas.
+
+    Parameters
+    ----------
+    inventory : DataFrame | None
+        Initial inventory (same columns compute_reorder_plan takes).
+    """
+
+    def __init__(self, inventory: Optional[pd.DataFrame] = None):
+        self._inputs: Dict[str, Dict[str, Any]] = {}
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._order: List[Tuple[int, str]] = []       # (-reorder_qty, sku), ascending
+        self._snapshot: Optional[pd.DataFrame] = None  # last sync() input, for diffing
+        # whether days_of_cover comes with the data (cleaned inventory) or is left to compute_reorder_plan
+        self._has_doc = False
+        self._lock = threading.RLock()
+        self.version = 0
+        self.rows_recomputed = 0
+        if inventory is not None:
+            self.sync(inventory)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # ---------- deltas ----------
+
+    def upsert(self, delta: pd.DataFrame) -> int:
+        """
+        Insert or update SKUs. `delta` needs a `sku` column plus any subset of the
+        inventory columns for existing SKUs (all required columns for new ones).
+        Returns the number of rows recomputed.
+        """
+        if delta is None or delta.empty:
+            return 0
+        delta = delta.assign(sku=delta["sku"].astype(str)).drop_duplicates("sku", keep="last")
+        cols = [c for c in _INPUT_COLUMNS if c in delta.columns]
+        with self._lock:
+            if not self._rows:
+                self._has_doc = "days_of_cover" in delta.columns
+            missing = [c for c in _REQUIRED if c not in cols]
+            if not self._inputs and not missing:
+                frame = delta[["sku", *cols]].reset_index(drop=True)   # first build: nothing to merge
+            else:
+                merged = []
+                for rec in delta[["sku", *cols]].to_dict("records"):
+                    base = self._inputs.get(rec["sku"])
+                    if base is None:
+                        if missing:
+                            raise ValueError(f"New SKU {rec['sku']!r} is missing columns: {missing}")
+                        base = {}
+                    merged.append({**base, **rec})
+                frame = pd.DataFrame(merged)
+            if self._has_doc:
+                if "days_of_cover" not in delta.columns or "days_of_cover" not in frame.columns:
+                    frame["days_of_cover"] = _days_of_cover(frame["on_hand"], frame["avg_daily_sales"])
+            else:
+                frame = frame.drop(columns=["days_of_cover"], errors="ignore")
+
+            plan = compute_reorder_plan(frame)
+            keep = [c for c in _INPUT_COLUMNS if c in frame.columns]
+            skus = frame["sku"].tolist()
+            # large deltas (first build, bulk reloads): one sort beats per-row sorted inserts
+            bulk = len(skus) > max(1024, len(self._order) // 8)
+            if not bulk:
+                for sku in skus:
+                    old = self._rows.get(sku)
+                    if old is not None:
+                        self._discard_order(old["reorder_qty"], sku)
+            self._inputs.update(zip(skus, frame[keep].to_dict("records")))
+            self._rows.update(zip(skus, plan.to_dict("records")))
+            if bulk:
+                self._order = sorted((-int(r["reorder_qty"]), sku) for sku, r in self._rows.items())
+            else:
+                for sku, q in zip(skus, plan["reorder_qty"].tolist()):
+                    insort(self._order, (-int(q), sku))
+            self.version += 1
+            self.rows_recomputed += len(plan)
+            return len(plan)
+
+    def remove(self, skus: Iterable[str]) -> int:
+        """Drop SKUs from the plan; returns how many were present."""
+        n = 0
+        with self._lock:
+            for sku in map(str, skus):
+                row = self._rows.pop(sku, None)
+                if row is None:
+                    continue
+                self._inputs.pop(sku, None)
+                self._discard_order(row["reorder_qty"], sku)
+                n += 1
+            if n:
+                self.version += 1
+        return n
+
+    def sync(self, inventory: pd.DataFrame) -> int:
+        """
+        Bring the plan in line with a full inventory snapshot: only added or changed
+        SKUs are recomputed and missing ones removed. Returns rows recomputed.
+        """
+        new = inventory.assign(sku=inventory["sku"].astype(str)).drop_duplicates("sku", keep="last")
+        new = new.set_index("sku")[[c for c in _INPUT_COLUMNS if c in inventory.columns]]
+        with self._lock:
+            old = self._snapshot
+            if old is None or list(old.columns) != list(new.columns):
+                self.remove(list(self._rows))
+                changed = new
+            else:
+                common = new.index.intersection(old.index)
+                a, b = new.loc[common], old.loc[common]
+                diff = ~((a == b) | (a.isna() & b.isna())).all(axis=1)
+                changed = pd.concat([a[diff], new.loc[new.index.difference(old.index)]])
+                self.remove(old.index.difference(new.index))
+            self._snapshot = new
+            return self.upsert(changed.reset_index())
+
+    def _discard_order(self, qty: int, sku: str) -> None:
+        key = (-int(qty), sku)
+        i = bisect_left(self._order, key)
+        if i < len(self._order) and self._order[i] == key:
+            del self._order[i]
+
+    # ---------- reads ----------
+
+    def top_n(self, n: int, *, flagged_only: bool = False) -> pd.DataFrame:
+        """First n plan rows by reorder_qty (descending, ties by sku); no recompute or sort."""
+        with self._lock:
+            head = self._order[:max(0, int(n))]
+            rows = [self._rows[sku] for q, sku in head if not flagged_only or q < 0]
+        return pd.DataFrame(rows, columns=PLAN_COLUMNS)
+
+    def get(self, sku: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._rows.get(str(sku))
+            return dict(row) if row is not None else None
+
+    def to_frame(self) -> pd.DataFrame:
+        """Whole plan in top_n order (O(catalog); prefer top_n for display)."""
+        with self._lock:
+            return pd.DataFrame([self._rows[sku] for _, sku in self._order], columns=PLAN_COLUMNS)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "skus": len(self._rows),
+            "flagged": bisect_left(self._order, (0, "")),
+            "version": self.version,
+            "rows_recomputed": self.rows_recomputed,
+        }
+
+
+_tables: Dict[Hashable, ReorderPlanTable] = {}
+_tables_lock = threading.Lock()
+
+
+def shared_plan_table(key: Hashable = "inventory") -> ReorderPlanTable:
+    """
+    Process-wide table per key, shared by the app and the agent tools.
+
+    Key tables by the data they are synced from (e.g. ("file", path) or
+    ("duckdb", db_path)): a table synced from two sources would serve whichever
+    synced last to readers of the other.
+    """
+    with _tables_lock:
+        t = _tables.get(key)
+        if t is None:
+            t = _tables[key] = ReorderPlanTable()
+        return t
@@ -25,17 +25,17 @@ def find_items_to_reorder():
     forecasting_agent = ForecastingAgent(db_manager)
     inventory_manager = InventoryManager(db_manager)
     
-    # Get all items with inventory
+    # Get all items with inventory, and their details, in one query each
     results_string += "📊 Getting all items with inventory...\n"
-    inventory_query = "SELECT item_id FROM inv ORDER BY item_id"
-    inventory_result = db_manager.execute_query(inventory_query)
+    inventory_levels = inventory_manager.get_items_inventory()
     
-    if not inventory_result.get("success", False):
-        error_msg = f"❌ Error getting inventory data: {inventory_result.get('error')}\n"
+    if not inventory_levels:
+        error_msg = "❌ Error getting inventory data: no items found in inv\n"
         print(error_msg)
         return error_msg
     
-    all_items = inventory_result["data"]["item_id"].tolist()
+    all_items = list(inventory_levels)
+    details_by_item = inventory_manager.get_items_details(all_items)
     results_string += f"📦 Found {len(all_items)} items with inventory data\n\n"
     
     # Analyze each item
@@ -45,11 +45,21 @@ def find_items_to_reorder():
         print(f"🔍 Analyzing {item_id} ({i}/{len(all_items)})...")
         
         try:
+            # Prefetched details; items without them (or without a lead time) are skipped before forecasting
+            details = details_by_item.loc[item_id].to_dict() if item_id in details_by_item.index else {}
+            if not details or pd.isna(details['lead_time']):
+                print(f"   ❌ Skipping {item_id}: no item details or lead time")
+                continue
+            
             # Generate forecast for this item
             forecast_df, model = forecasting_agent.generate_forecast(item_id, 30)
             
-            # Get inventory insights
-            inventory_insights = inventory_manager.generate_inventory_insights(item_id, forecast_df)
+            # Get inventory insights from the prefetched inventory / details
+            inventory_insights = inventory_manager.generate_inventory_insights(
+                item_id, forecast_df,
+                current_inventory=inventory_levels[item_id],
+                item_details=details,
+            )
             
             if inventory_insights['success']:
                 item_details = inventory_insights['item_details']
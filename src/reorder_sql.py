@@ -0,0 +1,148 @@
+# src/reorder_sql.py
+"""
+Reorder plan as a DuckDB view.
+
+``create_reorder_plan_view`` defines ``reorder_plan`` over the ``inventory``
+table with the same semantics as ``compute_reorder_plan`` (safety_stock
+defaults to 2 days and days_of_cover is derived when the columns are absent).
+Sorting, paging, filtering and CSV/Parquet export then run inside DuckDB, so
+only the visible page of rows reaches Python.
+
+The view's SQL depends on which optional columns the source table has, so
+re-create it whenever the table is replaced (``CREATE OR REPLACE TABLE``).
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .reorder_plan import PLAN_COLUMNS
+
+__all__ = [
+    "create_reorder_plan_view",
+    "reorder_plan_sql",
+    "query_reorder_plan",
+    "count_reorder_plan",
+    "export_reorder_plan",
+]
+
+
+def _ident(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _columns(con, table: str) -> List[str]:
+    rows = con.execute(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+        [table],
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def reorder_plan_sql(columns) -> str:
+    """SELECT list reproducing compute_reorder_plan for a source with `columns`."""
+    cols = set(columns)
+    ss = "CAST(safety_stock AS DOUBLE)" if "safety_stock" in cols else "2.0"
+    if "days_of_cover" in cols:
+        doc = "CAST(days_of_cover AS DOUBLE)"
+    else:
+        # compute_reorder_plan: on_hand.replace(0, 0.0001) / avg_daily_sales.replace(0, 0.0001)
+        doc = ("(CASE WHEN on_hand = 0 THEN 0.0001 ELSE on_hand END) / "
+               "(CASE WHEN avg_daily_sales = 0 THEN 0.0001 ELSE avg_daily_sales END)")
+    return f"""
+    WITH base AS (
+        SELECT sku, product_name, on_hand, backroom_units, shelf_units, avg_daily_sales, lead_time_days,
+               {ss} AS safety_stock,
+               {doc} AS days_of_cover
+        FROM {{source}}
+    )
+    SELECT *,
+           CAST(ceil(greatest(lead_time_days + safety_stock - days_of_cover, 0) * avg_daily_sales) AS BIGINT)
+               AS reorder_qty
+    FROM base
+    """
+
+
+def create_reorder_plan_view(con, *, source: str = "inventory", view: str = "reorder_plan") -> bool:
+    """(Re)define `view` over `source`; returns False when `source` does not exist."""
+    cols = _columns(con, source)
+    if not cols:
+        return False
+    missing = [c for c in PLAN_COLUMNS[:7] if c not in cols]
+    if missing:
+        raise ValueError(f"{source} is missing columns: {missing}")
+    body = reorder_plan_sql(cols).format(source=_ident(source))
+    con.execute(f"""
+        CREATE OR REPLACE VIEW {_ident(view)} AS
+        SELECT {", ".join(PLAN_COLUMNS[:10])}, reorder_qty > 0 AS reorder_flag
+        FROM ({body})
+    """)
+    return True
+
+
+def _where(flagged_only: bool, search: Optional[str]) -> Tuple[str, List[Any]]:
+    clauses, params = [], []
+    if flagged_only:
+        clauses.append("reorder_flag")
+    if search:
+        clauses.append("(sku ILIKE ? OR product_name ILIKE ?)")
+        params += [f"%{search}%"] * 2
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _select(view: str, flagged_only: bool, search: Optional[str], order_by: str, descending: bool):
+    if order_by not in PLAN_COLUMNS:
+        raise ValueError(f"Cannot order by {order_by!r}; expected one of {PLAN_COLUMNS}")
+    where, params = _where(flagged_only, search)
+    direction = "DESC" if descending else "ASC"
+    sql = f"SELECT * FROM {_ident(view)}{where} ORDER BY {_ident(order_by)} {direction}, sku ASC"
+    return sql, params
+
+
+def query_reorder_plan(
+    con,
+    *,
+    limit: int = 50,
+    offset: int = 0,
+    flagged_only: bool = False,
+    search: Optional[str] = None,
+    order_by: str = "reorder_qty",
+    descending: bool = True,
+    view: str = "reorder_plan",
+) -> pd.DataFrame:
+    """One page of the plan, sorted and filtered in DuckDB (top-N uses a heap, not a full sort)."""
+    sql, params = _select(view, flagged_only, search, order_by, descending)
+    return con.execute(f"{sql} LIMIT ? OFFSET ?", [*params, int(limit), int(offset)]).fetch_df()
+
+
+def count_reorder_plan(con, *, search: Optional[str] = None, view: str = "reorder_plan") -> Dict[str, int]:
+    """{"skus": rows matching `search`, "flagged": how many of them need reordering}."""
+    where, params = _where(False, search)
+    skus, flagged = con.execute(
+        f"SELECT count(*), count(*) FILTER (WHERE reorder_flag) FROM {_ident(view)}{where}", params
+    ).fetchone()
+    return {"skus": int(skus), "flagged": int(flagged or 0)}
+
+
+def export_reorder_plan(
+    con,
+    path: str | Path,
+    *,
+    flagged_only: bool = False,
+    search: Optional[str] = None,
+    order_by: str = "reorder_qty",
+    descending: bool = True,
+    view: str = "reorder_plan",
+) -> Path:
+    """COPY the (filtered, sorted) plan to CSV or Parquet, chosen by the file suffix."""
+    path = Path(path)
+    fmt = {".csv": "CSV, HEADER", ".parquet": "PARQUET"}.get(path.suffix.lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported export format {path.suffix!r}; use .csv or .parquet")
+    sql, params = _select(view, flagged_only, search, order_by, descending)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    target = str(path).replace("'", "''")
+    con.execute(f"COPY ({sql}) TO '{target}' (FORMAT {fmt})", params)
+    return path
@@ -4,9 +4,11 @@ from langgraph.graph import StateGraph, END, START
 from langgraph.graph.message import add_messages
 import pandas as pd
 import operator
+import os
 
 # Import necessary existing modules and agents
 from db.database_manager import DatabaseManager
+from db.query_guard import QueryGuard
 from agents.query_agents import QueryGeneratorAgent, ResponseFormatterAgent
 from agents.visualization_agent import VisualizationAgent
 from agents.forecasting_agent import ForecastingAgent
@@ -24,12 +26,35 @@ class GraphState(TypedDict):
     final_response: str
     error: str
 
+# Generated SQL may lack a LIMIT: results are streamed and materialized only up to these bounds
+QUERY_MAX_ROWS = 10_000
+QUERY_MAX_BYTES = 64 * 1024 * 1024
+
+# Guardrails for generated SQL (db/query_guard.py); memory / threads cap the whole DuckDB instance
+QUERY_MAX_ESTIMATED_ROWS = float(os.getenv("QUERY_MAX_ESTIMATED_ROWS", "1e9"))
+QUERY_TIMEOUT_S = float(os.getenv("QUERY_TIMEOUT_S", "30"))
+QUERY_MEMORY_LIMIT = os.getenv("QUERY_MEMORY_LIMIT") or None
+QUERY_THREADS = int(os.getenv("QUERY_THREADS")) if os.getenv("QUERY_THREADS") else None
+
 class RetailDataQueryGraph:
     """LangGraph implementation for querying retail data based on user questions."""
     
     def __init__(self, db_path: str = None):
         # Initialize database manager first
         self.db_manager = DatabaseManager(db_path)
+        # Generated SQL runs through a read-only manager (same pooled database instance);
+        # repeated questions are answered from the shared result cache
+        self.query_db = DatabaseManager(db_path, read_only=True, result_cache=True)
+        # ... after a cost check (EXPLAIN), with an injected LIMIT and a wall-clock timeout
+        self.query_guard = QueryGuard(
+            self.query_db,
+            max_estimated_rows=QUERY_MAX_ESTIMATED_ROWS,
+            row_limit=QUERY_MAX_ROWS,
+            max_bytes=QUERY_MAX_BYTES,
+            timeout=QUERY_TIMEOUT_S,
+            memory_limit=QUERY_MEMORY_LIMIT,
+            threads=QUERY_THREADS,
+        )
         
         # Initialize other agents
         self.query_generator = QueryGeneratorAgent()
@@ -104,6 +129,7 @@ class RetailDataQueryGraph:
             self._should_continue_after_execution,
             {
                 "create_visualization": "create_visualization",
+                "too_expensive": "format_response",
                 "error": "handle_error"
             }
         )
@@ -174,7 +200,7 @@ class RetailDataQueryGraph:
                 }
             
             query = state["generated_query"]["query"]
-            result = self.db_manager.execute_query(query)
+            result = self.query_guard.execute(query)
             
             return {
                 **state,
@@ -250,6 +276,14 @@ class RetailDataQueryGraph:
                 response = forecast.get("response_text", "Forecast completed successfully.")
                 return {**state, "final_response": response}
             
+            # Generated SQL rejected or interrupted by the query guard
+            if query_result.get("too_expensive"):
+                response = (
+                    f"⏱️ That question needs a query too large to run here ({query_result.get('error', '')}). "
+                    "Try narrowing it, e.g. to specific items, stores or a date range."
+                )
+                return {**state, "final_response": response}
+            
             # Handle regular query responses
             if query_result.get("success", False):
                 data = query_result.get("data")
@@ -314,7 +348,12 @@ class RetailDataQueryGraph:
     
     def _should_continue_after_execution(self, state: GraphState) -> str:
         """Decide whether to continue after query execution."""
-        if state.get("error") or not state.get("query_result", {}).get("success", False):
+        if state.get("error"):
+            return "error"
+        query_result = state.get("query_result", {})
+        if query_result.get("too_expensive"):
+            return "too_expensive"
+        if not query_result.get("success", False):
             return "error"
         return "create_visualization"
     
@@ -0,0 +1,211 @@
+# src/safety_stock.py
+"""
+Service-level safety stock from demand variability.
+
+The flat defaults (compute_reorder_plan's 2 days, InventoryManager's 1.25
+factor) ignore how erratic each SKU's demand is. Here safety stock is
+
+    safety_stock_units = z(service_level) * sigma_daily * sqrt(lead_time_days)
+
+where sigma_daily is the standard deviation of daily demand. sigma for every
+SKU comes from one grouped aggregate over the ``sales`` table in DuckDB
+(sum and sum of squares per item over a common day window, so days without a
+sales row count as zero demand), never from per-item queries.
+
+Results are cached per database and data watermark (row count + latest sale
+date). The watermark is re-checked at most every ``check_interval`` seconds,
+so per-item lookups in a loop cost a dict lookup, not a query each.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from statistics import NormalDist
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+__all__ = [
+    "service_level_z",
+    "demand_sigma",
+    "sales_watermark",
+    "DemandSigmaCache",
+    "default_sigma_cache",
+    "safety_stock_units",
+    "with_service_level_safety_stock",
+]
+
+
+def service_level_z(service_level: float) -> float:
+    """One-sided z-score for a cycle service level in (0, 1), e.g. 0.95 -> 1.645."""
+    if not 0.0 < float(service_level) < 1.0:
+        raise ValueError(f"service_level must be in (0, 1), got {service_level!r}")
+    return NormalDist().inv_cdf(float(service_level))
+
+
+def safety_stock_units(sigma_daily, lead_time_days, service_level: float):
+    """z * sigma * sqrt(lead time); works on scalars and arrays."""
+    return service_level_z(service_level) * np.asarray(sigma_daily, dtype=float) * np.sqrt(
+        np.maximum(np.asarray(lead_time_days, dtype=float), 0.0)
+    )
+
+
+def _window_clause(window_days: Optional[int]) -> str:
+    if window_days is None:
+        return "SELECT min(CAST(date AS DATE)) AS lo, max(CAST(date AS DATE)) AS hi FROM sales"
+    return (
+        f"SELECT max(CAST(date AS DATE)) - {int(window_days) - 1} AS lo, "
+        "max(CAST(date AS DATE)) AS hi FROM sales"
+    )
+
+
+def demand_sigma(db_manager, *, window_days: Optional[int] = None) -> pd.DataFrame:
+    """
+    Mean and standard deviation of daily demand for every item in ``sales``.
+
+    One grouped aggregate over (item_id, date, sale). Rows are first summed per
+    item and calendar day (sales may hold one row per store), all items share
+    the same window (the whole table, or the last `window_days` days), and
+    missing days count as zero sales.
+
+    Returns a DataFrame [item_id, mean_daily, sigma_daily, sales_days, window_days].
+    """
+    if window_days is not None and int(window_days) < 2:
+        raise ValueError("window_days must be >= 2")
+    query = f"""
+    WITH w AS ({_window_clause(window_days)}),
+    n AS (SELECT lo, hi, CAST(date_diff('day', lo, hi) + 1 AS DOUBLE) AS days FROM w),
+    daily AS (
+        SELECT s.item_id, CAST(s.date AS DATE) AS day, sum(CAST(s.sale AS DOUBLE)) AS units
+        FROM sales s, n
+        WHERE CAST(s.date AS DATE) BETWEEN n.lo AND n.hi
+        GROUP BY s.item_id, CAST(s.date AS DATE)
+    ),
+    agg AS (
+        SELECT item_id,
+               count(DISTINCT day) AS sales_days,
+               sum(units) AS s1,
+               sum(units * units) AS s2
+        FROM daily
+        GROUP BY item_id
+    )
+    SELECT agg.item_id,
+           agg.s1 / n.days AS mean_daily,
+           CASE WHEN n.days > 1
+                THEN sqrt(greatest(agg.s2 - agg.s1 * agg.s1 / n.days, 0) / (n.days - 1))
+                ELSE 0 END AS sigma_daily,
+           agg.sales_days,
+           CAST(n.days AS BIGINT) AS window_days
+    FROM agg, n
+    ORDER BY agg.item_id
+    """
+    result = db_manager.execute_query(query)
+    if not result.get("success", False):
+        raise RuntimeError(f"Demand sigma query failed: {result.get('error')}")
+    return result["data"]
+
+
+def sales_watermark(db_manager) -> Tuple[Any, ...]:
+    """(row count, latest sale date) of ``sales``; changes whenever sales are appended."""
+    result = db_manager.execute_query("SELECT count(*) AS n, max(date) AS hi FROM sales")
+    if not result.get("success", False):
+        raise RuntimeError(f"Sales watermark query failed: {result.get('error')}")
+    row = result["data"].iloc[0]
+    return int(row["n"]), str(row["hi"])
+
+
+class DemandSigmaCache:
+    """
+    demand_sigma() results keyed by (database path, window) and validated against
+    the sales watermark, checked at most once per `check_interval` seconds
+    (0 = on every get()).
+    """
+
+    def __init__(self, check_interval: float = 10.0):
+        self.check_interval = float(check_interval)
+        # key -> (watermark, checked_at, frame, {item_id: sigma_daily})
+        self._entries: Dict[Tuple[str, Optional[int]], Tuple[Tuple[Any, ...], float, pd.DataFrame, Dict[str, float]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.checks = 0
+
+    def _entry(self, db_manager, window_days: Optional[int]):
+        key = (str(getattr(db_manager, "db_path", id(db_manager))), window_days)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.check_interval:
+                self.hits += 1
+                return entry
+        mark = sales_watermark(db_manager)
+        with self._lock:
+            self.checks += 1
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == mark:
+                entry = self._entries[key] = (mark, now, entry[2], entry[3])
+                self.hits += 1
+                return entry
+        frame = demand_sigma(db_manager, window_days=window_days)
+        lookup = dict(zip(frame["item_id"].astype(str), frame["sigma_daily"].astype(float)))
+        with self._lock:
+            entry = self._entries[key] = (mark, now, frame, lookup)
+            self.misses += 1
+        return entry
+
+    def get(self, db_manager, *, window_days: Optional[int] = None) -> pd.DataFrame:
+        return self._entry(db_manager, window_days)[2]
+
+    def sigma(self, db_manager, item_id: str, *, window_days: Optional[int] = None) -> Optional[float]:
+        """sigma_daily for one item (from the fleet-wide frame), or None if it never sold."""
+        return self._entry(db_manager, window_days)[3].get(str(item_id))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "checks": self.checks}
+
+
+_default: Optional[DemandSigmaCache] = None
+_default_lock = threading.Lock()
+
+
+def default_sigma_cache() -> DemandSigmaCache:
+    """Process-wide cache shared by the reorder plan and InventoryManager."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = DemandSigmaCache()
+        return _default
+
+
+def with_service_level_safety_stock(
+    df: pd.DataFrame,
+    sigma: pd.DataFrame,
+    *,
+    service_level: float = 0.95,
+) -> pd.DataFrame:
+    """
+    Copy of an inventory frame (sku, avg_daily_sales, lead_time_days, ...) with
+    `safety_stock` replaced by the service-level value, converted to days of
+    cover (units / avg_daily_sales) since that is what compute_reorder_plan uses.
+
+    SKUs without sales history or with avg_daily_sales == 0 keep their existing
+    safety_stock (2 days when the column is absent).
+    """
+    out = df.copy()
+    if "safety_stock" not in out.columns:
+        out["safety_stock"] = 2.0
+    lookup = pd.Series(sigma["sigma_daily"].to_numpy(dtype=float), index=sigma["item_id"].astype(str))
+    sig = out["sku"].astype(str).map(lookup).to_numpy(dtype=float)
+    ads = out["avg_daily_sales"].to_numpy(dtype=float)
+    units = safety_stock_units(sig, out["lead_time_days"].to_numpy(dtype=float), service_level)
+    ok = ~np.isnan(units) & (ads > 0)
+    days = out["safety_stock"].to_numpy(dtype=float).copy()
+    days[ok] = units[ok] / ads[ok]
+    out["safety_stock"] = days
+    return out
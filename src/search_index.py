@@ -0,0 +1,291 @@
+# src/search_index.py
+"""
+N-gram / prefix index for SKU and product-name search.
+
+``str.contains`` over the catalog is a full scan per keystroke. NgramIndex is
+built once per inventory version and answers a query in milliseconds:
+
+- exact and prefix matches from sorted arrays of normalized values (binary search),
+- substring matches by intersecting byte-trigram posting lists (rarest first)
+  and verifying only the surviving candidates (queries shorter than a
+  trigram fall back to a vectorized scan of the values),
+- typo-tolerant matches, when fewer than `limit` rows matched so far, by
+  ranking rows on how many of the query's trigrams they contain.
+
+Results come back ranked in that order (exact > prefix > substring > fuzzy).
+Postings are stored CSR-style (sorted trigram codes + offsets + row ids) in
+NumPy arrays, built with vectorized operations in row chunks.
+
+``shared_index(key, df)`` keeps the most recent indexes process-wide, so the
+app pages and the agent tools reuse the same one for the same inventory version.
+"""
+from __future__ import annotations
+
+import itertools
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+__all__ = ["NgramIndex", "shared_index"]
+
+_MAX_BYTES = 128          # longer values are indexed on their first 128 bytes (verification uses the stored text)
+_MAX_CHARS = 512          # stored (and matched) prefix of each value; bounds memory for a few very long names
+_CHUNK_ROWS = 65536
+
+_VERIFY_DIRECTLY = 2048      # stop intersecting postings once this few candidates remain
+_FUZZY_CANDIDATES = 16384    # bound on rows scored for typo-tolerant matches
+
+# rank scores
+EXACT, PREFIX, SUBSTRING = 1.0, 0.9, 0.8
+
+
+def _norm(s: Any) -> str:
+    if s is None or (isinstance(s, float) and np.isnan(s)):
+        return ""
+    # NUL separates values in the scan buffer, so it cannot be part of one
+    return str(s).strip().lower().replace("\0", "")[:_MAX_CHARS]
+
+
+def _trigram_codes(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """(code, row) for every distinct byte trigram of each value, codes = b0<<16 | b1<<8 | b2."""
+    codes, rows = [], []
+    for start in range(0, len(values), _CHUNK_ROWS):
+        chunk = [v.encode("utf-8")[:_MAX_BYTES] for v in values[start:start + _CHUNK_ROWS]]
+        width = max((len(b) for b in chunk), default=0)
+        if width < 3:
+            continue
+        mat = np.frombuffer(b"".join(b.ljust(width, b"\0") for b in chunk), dtype=np.uint8)
+        mat = mat.reshape(len(chunk), width).astype(np.int32)
+        tri = (mat[:, :-2] << 16) | (mat[:, 1:-1] << 8) | mat[:, 2:]
+        lengths = np.fromiter((len(b) for b in chunk), dtype=np.int64, count=len(chunk))
+        valid = np.arange(width - 2)[None, :] < (lengths - 2)[:, None]
+        r, _ = np.nonzero(valid)
+        codes.append(tri[valid])
+        rows.append((r + start).astype(np.int32))
+    if not codes:
+        return np.empty(0, np.int32), np.empty(0, np.int32)
+    return np.concatenate(codes), np.concatenate(rows)
+
+
+def _sorted_unique(a: np.ndarray) -> np.ndarray:
+    """Distinct values of an already sorted array (np.unique re-sorts and is far slower on large int64 inputs)."""
+    if len(a) == 0:
+        return a
+    keep = np.empty(len(a), dtype=bool)
+    keep[0] = True
+    np.not_equal(a[1:], a[:-1], out=keep[1:])
+    return a[keep]
+
+
+def _query_codes(q: str) -> np.ndarray:
+    b = np.frombuffer(q.encode("utf-8")[:_MAX_BYTES], dtype=np.uint8).astype(np.int32)
+    if len(b) < 3:
+        return np.empty(0, np.int32)
+    return np.unique((b[:-2] << 16) | (b[1:-1] << 8) | b[2:])
+
+
+class NgramIndex:
+    """
+    Search index over one or more parallel text fields (e.g. sku, product_name).
+
+    Parameters
+    ----------
+    *fields : sequence of str
+        Equal-length sequences; row i matches if any field's value at i matches.
+    """
+
+    def __init__(self, *fields: Sequence[Any]):
+        if not fields:
+            raise ValueError("NgramIndex needs at least one field")
+        n = len(fields[0])
+        if any(len(f) != n for f in fields):
+            raise ValueError("All fields must have the same length")
+        self.n = n
+        self._fields: List[List[str]] = [[_norm(v) for v in f] for f in fields]
+
+        # exact / prefix: sorted values per field + their rows. Object arrays hold references to
+        # the stored strings (a fixed-width str array would pad every row to the longest value)
+        self._sorted: List[Tuple[np.ndarray, np.ndarray]] = []
+        for vals in self._fields:
+            arr = np.empty(n, dtype=object)
+            arr[:] = vals
+            order = np.argsort(arr, kind="stable")
+            self._sorted.append((arr[order], order.astype(np.int32)))
+
+        # short-query scan: each field's values joined with NUL, plus each value's start offset
+        self._joined: List[Tuple[str, np.ndarray]] = []
+        for vals in self._fields:
+            starts = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum([len(v) + 1 for v in vals], out=starts[1:])
+            self._joined.append(("\0".join(vals), starts))
+
+        # trigram postings (CSR), one row id per (trigram, row) across all fields
+        codes, rows = [], []
+        for vals in self._fields:
+            c, r = _trigram_codes(vals)
+            codes.append(c)
+            rows.append(r)
+        key = (np.concatenate(codes).astype(np.int64) << 32) | np.concatenate(rows).astype(np.int64)
+        key.sort()
+        key = _sorted_unique(key)
+        code = (key >> 32).astype(np.int32)
+        starts = np.flatnonzero(np.r_[True, code[1:] != code[:-1]]) if len(code) else np.empty(0, np.int64)
+        self._codes = code[starts]
+        self._offsets = np.append(starts, len(key)).astype(np.int64)
+        self._rows = (key & 0xFFFFFFFF).astype(np.int32)
+
+    # ---------- lookups ----------
+
+    def _postings(self, code: int) -> np.ndarray:
+        i = np.searchsorted(self._codes, code)
+        if i >= len(self._codes) or self._codes[i] != code:
+            return self._rows[:0]
+        return self._rows[self._offsets[i]:self._offsets[i + 1]]
+
+    def _range_rows(self, q: str, limit: int, *, prefix: bool) -> List[int]:
+        out: List[int] = []
+        # prefix range ends before q with its last character bumped
+        hi_key = q[:-1] + chr(min(ord(q[-1]) + 1, 0x10FFFF)) if prefix else q
+        for arr, rows in self._sorted:
+            lo = int(np.searchsorted(arr, q, side="left"))
+            hi = int(np.searchsorted(arr, hi_key, side="left" if prefix else "right"))
+            out.extend(rows[lo:min(hi, lo + limit)].tolist())
+        return sorted(set(out))
+
+    def _scan_rows(self, q: str, limit: int) -> List[int]:
+        """
+        First `limit` rows (by row id) containing q in any field, found by searching
+        each field's joined values (for queries with no trigram).
+        """
+        pattern = re.compile(re.escape(q))
+        out: List[np.ndarray] = []
+        for joined, starts in self._joined:
+            hits = pattern.finditer(joined)
+            rows = np.empty(0, np.int64)
+            while len(rows) < limit:
+                pos = np.fromiter((m.start() for m in itertools.islice(hits, max(limit, 1024))), dtype=np.int64)
+                if not len(pos):
+                    break
+                # matches come in text order, so rows stay sorted across batches
+                rows = np.union1d(rows, np.searchsorted(starts, pos, side="right") - 1)
+            out.append(rows[:limit])
+        return np.union1d(*out)[:limit].tolist() if len(out) > 1 else out[0].tolist()
+
+    def _matches(self, row: int, q: str) -> bool:
+        return any(q in vals[row] for vals in self._fields)
+
+    def search(
+        self,
+        query: str,
+        *,
+        limit: int = 20,
+        fuzzy: bool = True,
+        min_similarity: float = 0.4,
+    ) -> List[Tuple[int, float]]:
+        """
+        Ranked [(row, score)] for `query` (case-insensitive), best first.
+
+        score is 1.0 for exact, 0.9 prefix, 0.8 substring; fuzzy matches score
+        0.8 * (fraction of the query's trigrams the row contains) and must reach
+        `min_similarity` of them.
+        """
+        q = _norm(query)
+        if not q or limit <= 0:
+            return []
+        seen: Dict[int, float] = {}
+
+        def _add(rows, score):
+            for r in rows:
+                if len(seen) >= limit:
+                    return
+                if r not in seen:
+                    seen[int(r)] = score
+
+        _add(self._range_rows(q, limit, prefix=False), EXACT)
+        _add(self._range_rows(q, limit, prefix=True), PREFIX)
+        qcodes = _query_codes(q)
+        if len(seen) >= limit:
+            return list(seen.items())
+        if len(qcodes) == 0:
+            # under 3 bytes there is nothing to intersect (and too little to rank typos on)
+            _add(self._scan_rows(q, limit + len(seen)), SUBSTRING)
+            return list(seen.items())
+
+        postings = sorted((self._postings(c) for c in qcodes), key=len)
+        if len(postings[0]):
+            cand = postings[0]
+            for p in postings[1:]:
+                if len(cand) <= _VERIFY_DIRECTLY:
+                    break       # cheaper to check the remaining candidates' text than to intersect
+                # postings are sorted by row: membership by binary search, O(|cand| log |p|)
+                pos = np.minimum(np.searchsorted(p, cand), len(p) - 1)
+                cand = cand[p[pos] == cand]
+            for r in cand.tolist():
+                if len(seen) >= limit:
+                    break
+                if r not in seen and self._matches(r, q):
+                    seen[r] = SUBSTRING
+
+        if fuzzy and len(seen) < limit:
+            m = len(postings)
+            need = max(1, int(np.ceil(min_similarity * m)))
+            # a row sharing >= need of the m trigrams contains one of the (m - need + 1) rarest
+            # (when those are huge, only their first rows are scored, keeping the query bounded)
+            cand = np.concatenate([p[:_FUZZY_CANDIDATES] for p in postings[: m - need + 1]])
+            cand.sort()
+            cand = _sorted_unique(cand)[:_FUZZY_CANDIDATES]
+            if len(cand):
+                counts = np.zeros(len(cand), dtype=np.int32)
+                for p in postings:
+                    if len(p):
+                        pos = np.minimum(np.searchsorted(p, cand), len(p) - 1)
+                        counts += p[pos] == cand
+                keep = np.flatnonzero(counts >= need)
+                order = keep[np.lexsort((cand[keep], -counts[keep]))][: limit + len(seen)]
+                for i in order.tolist():
+                    r = int(cand[i])
+                    if r not in seen:
+                        seen[r] = round(SUBSTRING * int(counts[i]) / m, 4)
+                    if len(seen) >= limit:
+                        break
+        return sorted(seen.items(), key=lambda kv: (-kv[1], kv[0]))
+
+    def search_frame(self, df: pd.DataFrame, query: str, *, limit: int = 20, **kw) -> pd.DataFrame:
+        """Rows of `df` (aligned with the indexed fields) for `query`, plus a match_score column."""
+        hits = self.search(query, limit=limit, **kw)
+        out = df.iloc[[r for r, _ in hits]].copy()
+        out["match_score"] = [s for _, s in hits]
+        return out
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {"rows": self.n, "trigrams": int(len(self._codes)), "postings": int(len(self._rows))}
+
+
+_indexes: "OrderedDict[Hashable, NgramIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+_MAX_SHARED = 4
+
+
+def shared_index(key: Hashable, df: pd.DataFrame, fields: Sequence[str] = ("sku", "product_name")) -> NgramIndex:
+    """
+    Process-wide index for `df`, reused for as long as `key` (an inventory
+    version such as a file's (path, mtime, size)) stays the same.
+    """
+    full_key = (key, tuple(fields))
+    with _indexes_lock:
+        idx = _indexes.get(full_key)
+        if idx is not None:
+            _indexes.move_to_end(full_key)
+            return idx
+    cols = [df[f].tolist() if f in df.columns else [""] * len(df) for f in fields]
+    idx = NgramIndex(*cols)
+    with _indexes_lock:
+        _indexes[full_key] = idx
+        while len(_indexes) > _MAX_SHARED:
+            _indexes.popitem(last=False)
+    return idx
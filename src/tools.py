@@ -3,10 +3,10 @@ from __future__ import annotations
 
 from pathlib import Path
 from typing import Optional
-import pandas as pd
 
-from .forecast import compute_reorder_plan
-from .detect import detect_shelf_gaps  # <-- needed for tool_detect_gap
+from .gap_cache import cached_detect_shelf_gaps  # <-- needed for tool_detect_gap
+from .inventory_snapshot import default_snapshot_cache
+from .reorder_plan import shared_plan_table
 
 __all__ = [
     "tool_load_inventory",
@@ -15,68 +15,50 @@ __all__ = [
     "tool_detect_gap",
 ]
 
-# ---------- internal helpers ----------
-
-def _csv_path(data_processed: Path) -> Path:
-    return data_processed / "inventory_clean.csv"
-
-def _load_df(data_processed: Path) -> Optional[pd.DataFrame]:
-    fp = _csv_path(data_processed)
-    if not fp.exists():
-        return None
-    try:
-        return pd.read_csv(fp)
-    except Exception:
-        return None
-
 # ---------- tools ----------
 
 def tool_load_inventory(data_processed: Path) -> str:
     """
     Summarize the current processed inventory dataset.
     """
-    df = _load_df(data_processed)
-    if df is None:
+    snap = default_snapshot_cache().get(data_processed)
+    if snap is None:
         return "No processed inventory found. Please upload/clean data first."
 
     # Column safety
-    if "sku" not in df.columns:
+    if not snap.has_sku:
         return "Inventory summary unavailable: missing 'sku' column."
-    on_hand_series = df.get("on_hand", pd.Series(dtype=float))
-    ads_series = df.get("avg_daily_sales", pd.Series(dtype=float))
-
-    summary = {
-        "unique_sku": int(df["sku"].nunique()),
-        "total_on_hand": int(on_hand_series.sum()),
-        "avg_daily_sales_mean": float(round(ads_series.mean() or 0.0, 3)),
-    }
-    return f"Inventory summary: {summary}"
+    # KPIs are computed once per snapshot
+    return f"Inventory summary: {snap.kpis}"
 
 def tool_lookup_sku(sku: str, data_processed: Path) -> str:
     """
     Return a terse availability line for a given SKU from processed data.
     """
-    df = _load_df(data_processed)
-    if df is None:
+    snap = default_snapshot_cache().get(data_processed)
+    if snap is None:
         return "No processed inventory found. Please upload/clean data first."
 
-    if "sku" not in df.columns:
+    if not snap.has_sku:
         return "SKU lookup unavailable: missing 'sku' column."
 
-    # Exact match first
-    row = df.loc[df["sku"].astype(str).str.lower() == str(sku).lower()]
-    if row.empty:
-        # Fallback: contains match
-        row = df[df["sku"].astype(str).str.contains(str(sku), case=False, na=False)].head(1)
-    if row.empty:
-        return f"SKU {sku}: not found in processed inventory."
-
-    r = row.iloc[0]
-    on_hand = int(r.get("on_hand", 0))
-    backroom = int(r.get("backroom_units", 0))
-    shelf = int(r.get("shelf_units", 0))
-    lead = float(r.get("lead_time_days", 0))
-    ads = float(r.get("avg_daily_sales", 0))
+    # Exact match via the snapshot's hash index, then ranked substring match
+    pos = snap.find(sku)
+    prefix = ""
+    if pos is None:
+        # typo-tolerant fallback from the shared n-gram index
+        hits = snap.search(sku, limit=1, min_similarity=0.6)
+        if not hits:
+            return f"SKU {sku}: not found in processed inventory."
+        pos = hits[0][0]
+        prefix = f"SKU {sku}: not found; closest match → "
+
+    r = snap.row(pos)
+    on_hand = int(r["on_hand"])
+    backroom = int(r["backroom_units"])
+    shelf = int(r["shelf_units"])
+    lead = float(r["lead_time_days"])
+    ads = float(r["avg_daily_sales"])
     days_cover = round(on_hand / ads, 2) if ads > 0 else None
 
     parts = [f"SKU {r['sku']}: on_hand={on_hand}", f"shelf={shelf}", f"backroom={backroom}"]
@@ -84,25 +66,34 @@ def tool_lookup_sku(sku: str, data_processed: Path) -> str:
         parts.append(f"days_cover≈{days_cover}")
     if lead:
         parts.append(f"lead_time_days={lead}")
-    return ", ".join(parts)
+    return prefix + ", ".join(parts)
+
+# source key of the inventory snapshot last synced into the shared plan table
+_plan_source: Optional[tuple] = None
 
 def tool_reorder_plan(top_n: int, data_processed: Path) -> str:
     """
-    Compute reorder plan and return top N rows as CSV snippet.
+    Return the top N rows of the reorder plan (by reorder_qty) as CSV snippet.
+
+    The plan is maintained incrementally (src/reorder_plan.py): it is only synced
+    when the inventory snapshot changed, and then only changed SKUs are recomputed.
     """
-    df = _load_df(data_processed)
-    if df is None:
+    global _plan_source
+    snap = default_snapshot_cache().get(data_processed)
+    if snap is None:
         return "No processed inventory found. Please upload/clean data first."
+    # flat-default safety stock over the snapshot's file; the app shares this table only
+    # when it plans from the same file (DuckDB-sourced and service-level plans have their own)
+    table = shared_plan_table(("file", snap.source[0]))
 
-    try:
-        plan = compute_reorder_plan(df)
-    except Exception as e:
-        return f"Failed to compute reorder plan: {e}"
+    if snap.source != _plan_source:
+        try:
+            table.sync(snap.df)
+        except Exception as e:
+            return f"Failed to compute reorder plan: {e}"
+        _plan_source = snap.source
 
-    if "reorder_qty" not in plan.columns:
-        return "Reorder plan missing 'reorder_qty' column."
-    plan = plan.sort_values("reorder_qty", ascending=False).head(top_n)
-    return plan.to_csv(index=False)
+    return table.top_n(top_n).to_csv(index=False)
 
 def tool_detect_gap(image_path: str) -> str:
     """
@@ -112,10 +103,16 @@ def tool_detect_gap(image_path: str) -> str:
     if not p.exists():
         return f"Image not found: {image_path}"
     try:
-        res = detect_shelf_gaps(p)
+        res = cached_detect_shelf_gaps(p)
     except Exception as e:
         return f"Gap detection failed: {e}"
-    return f"gap_score={res.get('gap_score')}, notes={res.get('notes')}"
+    line = f"gap_score={res.gap_score}, notes={res.notes}"
+    if res.bands:
+        shelves = "; ".join(
+            f"{b.top:.0%}-{b.bottom:.0%}: {b.gap_score}" for b in res.bands
+        )
+        line += f", shelf_bands(top-bottom: gap_score)=[{shelves}]"
+    return line
 
 
 # ---------- end of file ----------
@@ -26,4 +26,6 @@ def write_duckdb(csv_path: str, db_path: str, table_name: str):
     conn = duckdb.connect(database=db_path)
     conn.execute(f"CREATE OR REPLACE TABLE {table_name} AS SELECT * FROM read_csv_auto('{csv_path}')")
     conn.close()
+    from db.query_cache import bump_table_version   # cached query results over this table are stale
+    bump_table_version(db_path, table_name)
     logger.info(f"Wrote DuckDB database → {db_path} with table '{table_name}'")
\ No newline at end of file
@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import duckdb
+import pytest
+
+from db.async_database import AsyncDatabase
+from db.database_manager import DatabaseManager, close_pools
+
+# runs for many seconds unless interrupted
+_SLOW = "SELECT count(*) AS n FROM range(100000000000) a(i) WHERE i % 7 = 3"
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "retail.duckdb")
+    with duckdb.connect(path) as con:
+        con.execute("CREATE TABLE inv AS SELECT 'I' || i AS item_id, i AS unit FROM range(100) t(i)")
+    yield DatabaseManager(path, pool_size=4)
+    close_pools()
+
+
+def test_concurrent_queries_bounded(db):
+    async def run():
+        adb = AsyncDatabase(db, max_concurrent=2)
+        try:
+            results = await asyncio.gather(*(
+                adb.execute_query("SELECT unit FROM inv WHERE item_id = ?", (f"I{i}",)) for i in range(20)
+            ))
+            return results, adb.stats
+        finally:
+            await adb.close()
+
+    results, stats = asyncio.run(run())
+    assert [int(r["data"]["unit"].iloc[0]) for r in results] == list(range(20))
+    assert stats["queries"] == 20 and stats["running"] == 0 and stats["waiting"] == 0
+    assert db.pool.stats["open"] <= 2
+
+
+def test_timeout_interrupts_running_query(db):
+    async def run():
+        adb = AsyncDatabase(db, max_concurrent=1)
+        try:
+            t = time.perf_counter()
+            with pytest.raises(asyncio.TimeoutError):
+                await adb.execute_query(_SLOW, timeout=0.2)
+            elapsed = time.perf_counter() - t
+            # the slot and the cursor are free again right away
+            ok = await adb.execute_query("SELECT count(*) AS n FROM inv", timeout=5)
+            return elapsed, ok, adb.stats
+        finally:
+            await adb.close()
+
+    elapsed, ok, stats = asyncio.run(run())
+    assert elapsed < 5
+    assert int(ok["data"]["n"].iloc[0]) == 100
+    assert stats["timeouts"] == 1
+    assert db.pool.stats["borrowed"] == 0
+
+
+def test_cancelling_the_caller_interrupts(db):
+    async def run():
+        adb = AsyncDatabase(db, max_concurrent=1)
+        try:
+            task = asyncio.create_task(adb.execute_query(_SLOW))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            t = time.perf_counter()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return time.perf_counter() - t, adb.stats
+        finally:
+            await adb.close()
+
+    elapsed, stats = asyncio.run(run())
+    assert elapsed < 5
+    assert stats["cancelled"] == 1 and stats["running"] == 0
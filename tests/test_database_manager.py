@@ -0,0 +1,227 @@
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from db.database_manager import (
+    DatabaseManager,
+    close_pools,
+    get_pool,
+    invalidate_schema_cache,
+    schema_cache_stats,
+)
+from src.inventory_management import InventoryManager
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "retail.duckdb")
+    with duckdb.connect(path) as con:
+        con.execute("CREATE TABLE inv AS SELECT 'I' || i AS item_id, i AS unit FROM range(100) t(i)")
+    yield path
+    close_pools()
+
+
+def test_queries_reuse_pooled_cursors(db_path):
+    db = DatabaseManager(db_path, pool_size=2)
+    for i in range(20):
+        res = db.execute_query("SELECT unit FROM inv WHERE item_id = ?", (f"I{i}",))
+        assert res["success"] and int(res["data"]["unit"].iloc[0]) == i
+    assert db.get_all_tables() == ["inv"]
+    stats = db.pool.stats
+    assert stats["open"] == 1 and stats["acquired"] == 21 and stats["borrowed"] == 0
+    # managers for the same file share one database instance
+    assert DatabaseManager(db_path).pool is db.pool
+
+
+def test_threads_bounded_by_pool_size(db_path):
+    db = DatabaseManager(db_path, pool_size=3)
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        results = list(ex.map(lambda i: db.execute_query("SELECT count(*) AS n FROM inv WHERE unit < ?", (i,)), range(64)))
+    assert [int(r["data"]["n"].iloc[0]) for r in results] == list(range(64))
+    assert db.pool.stats["open"] <= 3
+
+
+def test_read_only_rejects_writes(db_path):
+    ro = DatabaseManager(db_path, read_only=True)
+    assert ro.execute_query("SELECT count(*) AS n FROM inv")["success"]
+    res = ro.execute_query("INSERT INTO inv VALUES ('x', 1)")
+    assert not res["success"] and "not allowed" in res["error"]
+    assert not ro.execute_query("SELECT 1; DROP TABLE inv")["success"]
+
+    # read-only and read-write managers share one read-only instance; writes open the file
+    # read-write only while they run
+    rw = DatabaseManager(db_path)
+    assert rw.pool is ro.pool and ro.pool.read_only
+    assert rw.execute_query("INSERT INTO inv VALUES ('x', 1)")["success"]
+    assert int(ro.execute_query("SELECT count(*) AS n FROM inv")["data"]["n"].iloc[0]) == 101
+    assert ro.pool.stats["writes"] == 1
+    with pytest.raises(PermissionError):
+        with ro.get_connection(write=True):
+            pass
+
+
+def test_write_waits_for_borrowed_cursors(db_path):
+    db = DatabaseManager(db_path)
+    pool = db.pool
+    pool.lock_timeout = 0.1
+    with db.get_connection():
+        res = db.execute_query("INSERT INTO inv VALUES ('x', 1)")
+    assert not res["success"] and "borrowed" in res["error"]
+    # the failed write leaves the pool usable
+    assert db.execute_query("INSERT INTO inv VALUES ('x', 1)")["success"]
+    assert int(db.execute_query("SELECT count(*) AS n FROM inv")["data"]["n"].iloc[0]) == 101
+
+
+_OTHER_PROCESS = """
+import sys, time
+from db.database_manager import DatabaseManager
+db = DatabaseManager(sys.argv[1], read_only=sys.argv[2] == "ro")
+assert db.execute_query(sys.argv[3])["success"]
+print(int(db.execute_query("SELECT count(*) AS n FROM inv")["data"]["n"].iloc[0]), flush=True)
+time.sleep(float(sys.argv[4]))
+"""
+
+
+def _other_process(db_path, mode, query, hold=0.0):
+    return subprocess.Popen([sys.executable, "-c", _OTHER_PROCESS, db_path, mode, query, str(hold)],
+                            stdout=subprocess.PIPE, text=True, cwd=str(Path(__file__).resolve().parents[1]))
+
+
+def test_two_processes_share_the_file(db_path):
+    reader = DatabaseManager(db_path, read_only=True)
+    writer = DatabaseManager(db_path)
+    reader.pool.idle_timeout = 0.05
+
+    # another process reads while this one has the file open
+    with reader.get_connection() as con:
+        other = _other_process(db_path, "ro", "SELECT 1", hold=0.3)
+        assert other.stdout.readline().strip() == "100"
+        assert con.execute("SELECT count(*) FROM inv").fetchone()[0] == 100
+    # ... and keeps it open while this process writes: the write waits for it
+    assert writer.execute_query("INSERT INTO inv VALUES ('x', 1)")["success"]
+    assert other.wait(10) == 0
+
+    # a write from the other process waits for this process's pool to go idle
+    assert reader.execute_query("SELECT 1")["success"]
+    other = _other_process(db_path, "rw", "INSERT INTO inv VALUES ('y', 2)")
+    assert other.stdout.readline().strip() == "102"
+    assert other.wait(10) == 0
+    assert int(reader.execute_query("SELECT count(*) AS n FROM inv")["data"]["n"].iloc[0]) == 102
+
+
+def test_pool_errors_returned_as_results(tmp_path):
+    db = DatabaseManager(str(tmp_path / "missing" / "retail.duckdb"))
+    res = db.execute_query("SELECT 1")
+    assert not res["success"] and res["data"] is None and res["error"]
+    close_pools()
+
+
+def test_acquire_timeout(db_path):
+    pool = get_pool(db_path, size=1)
+    cur = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    pool.release(cur)
+    pool.release(pool.acquire(timeout=0.05))
+
+
+def test_schema_summary_cached_until_catalog_changes(db_path):
+    invalidate_schema_cache()
+    db = DatabaseManager(db_path)
+    first = db.get_database_schema()
+    assert list(first["tables"]) == ["inv"]
+    before = schema_cache_stats()
+    assert db.get_database_summary()["tables"].keys() == first["tables"].keys()
+    assert schema_cache_stats()["hits"] == before["hits"] + 1
+
+    # DDL through the manager invalidates explicitly ...
+    assert db.execute_query("CREATE TABLE sales (item_id VARCHAR, sale BIGINT)")["success"]
+    assert set(db.get_database_summary()["tables"]) == {"inv", "sales"}
+
+    # ... and out-of-band DDL is caught by the catalog fingerprint
+    fp = db.catalog_fingerprint()
+    with db.get_connection(write=True) as con:
+        con.execute("ALTER TABLE sales ADD COLUMN price DOUBLE")
+    assert db.catalog_fingerprint() != fp
+    cols = [c[0] for c in db.get_database_summary()["tables"]["sales"]["columns"]]
+    assert cols == ["item_id", "sale", "price"]
+
+
+def test_capped_and_streaming_results(db_path):
+    db = DatabaseManager(db_path)
+    big = "SELECT i, i::VARCHAR AS s FROM range(300000) t(i)"
+    res = db.execute_query(big, max_rows=70000)
+    assert res["truncated"] and res["row_count"] == 70000
+    assert res["data"]["i"].tolist() == list(range(70000))
+    # exactly at the cap is not truncated; byte caps stop early too
+    assert not db.execute_query("SELECT * FROM inv", max_rows=100)["truncated"]
+    small = db.execute_query(big, max_bytes=1_000_000)
+    assert small["truncated"] and 0 < small["data"].memory_usage(deep=True).sum() <= 1_000_000
+    empty = db.execute_query("SELECT * FROM inv WHERE unit < 0", max_rows=10)
+    assert empty["row_count"] == 0 and list(empty["data"].columns) == ["item_id", "unit"]
+
+    pytest.importorskip("pyarrow")
+    assert db.fetch_arrow("SELECT * FROM inv").num_rows == 100
+    assert db.fetch_arrow(big, max_rows=5).column("i").to_pylist() == [0, 1, 2, 3, 4]
+    sizes = [b.num_rows for b in db.iter_batches(big, batch_rows=100000)]
+    assert sum(sizes) == 300000 and max(sizes) <= 100000
+    assert db.pool.stats["borrowed"] == 0
+
+
+def test_fetch_row(db_path):
+    db = DatabaseManager(db_path)
+    assert db.fetch_row("SELECT item_id, unit FROM inv WHERE item_id = ?", ("I7",)) == {"item_id": "I7", "unit": 7}
+    assert db.fetch_row("SELECT unit FROM inv WHERE item_id = ?", ("nope",)) is None
+    with pytest.raises(duckdb.Error):
+        db.fetch_row("SELECT missing FROM inv")
+    assert db.pool.stats["borrowed"] == 0
+
+
+def test_inventory_manager_bulk_lookups(db_path):
+    db = DatabaseManager(db_path)
+    db.execute_query("""
+        CREATE TABLE item_dim AS
+        SELECT 'I' || i AS item_id, 'item ' || i AS description, i * 1.5 AS price,
+               (i % 5)::BIGINT AS lead_time, 0.1 AS holding_cost
+        FROM range(100) t(i)
+    """)
+    im = InventoryManager(db)
+    levels = im.get_items_inventory()
+    assert len(levels) == 100 and levels["I42"] == 42
+    assert im.get_items_inventory(["I1", "I2", "nope"]) == {"I1": 1, "I2": 2}
+    details = im.get_items_details(["I4", "I9", "nope"])
+    assert sorted(details.index) == ["I4", "I9"]
+    for item_id in ("I4", "I9"):
+        assert details.loc[item_id].to_dict() == im.get_item_details(item_id)
+        assert levels[item_id] == im.get_item_inventory(item_id)
+
+
+def test_inventory_manager_null_details(db_path):
+    db = DatabaseManager(db_path)
+    db.execute_query("""
+        CREATE TABLE item_dim AS
+        SELECT * FROM (VALUES ('I1', 'ok', 2.0, 3, 0.1),
+                              ('I2', 'no price', NULL, 3, 0.1),
+                              ('I3', 'no lead time', 2.0, NULL, 0.1))
+            t(item_id, description, price, lead_time, holding_cost)
+    """)
+    im = InventoryManager(db)
+    details = im.get_items_details()
+    assert details["lead_time"].dtype == "Int64"
+    assert details.loc["I1", "lead_time"] == 3 and pd.isna(details.loc["I3", "lead_time"])
+    assert np.isnan(im.get_item_details("I2")["price"])
+    assert im.get_item_details("I3")["lead_time"] is None
+
+    forecast = pd.DataFrame({"ds": pd.date_range("2024-01-01", periods=10), "yhat": 1.0})
+    for item_details in (details.loc["I3"].to_dict(), None):
+        res = im.generate_inventory_insights("I3", forecast, current_inventory=5, item_details=item_details)
+        assert not res["success"] and "lead time" in res["error"]
+    ok = im.generate_inventory_insights("I1", forecast, current_inventory=5, item_details=details.loc["I1"].to_dict())
+    assert ok["success"] and ok["item_details"]["lead_time"] == 3
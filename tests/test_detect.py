@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from src.detect import _score_array, _tile_var_u8, _global_var_u8, detect_shelf_gaps, detect_shelf_gaps_batch
+
+
+def _shelf_array(h=240, w=320, seed=0):
+    base = np.full((h, w), 220, np.uint8)
+    rng = np.random.default_rng(seed)
+    base[:, 100:140] = rng.integers(150, 255, size=(h, 40), dtype=np.uint8)
+    return base
+
+
+def test_integer_variance_matches_float64_reference():
+    rng = np.random.default_rng(1)
+    arr = rng.integers(0, 256, size=(481, 641), dtype=np.uint8)
+
+    assert _global_var_u8(arr) == pytest.approx(arr.astype(np.float64).var(), rel=1e-12)
+
+    th = 48
+    ref = (
+        arr[:480, :624].astype(np.float64)
+        .reshape(10, th, 13, th).swapaxes(1, 2).reshape(10, 13, -1).var(axis=-1)
+    )
+    np.testing.assert_allclose(_tile_var_u8(arr, th), ref, rtol=1e-12)
+
+
+def test_int_and_float_paths_agree_on_scores():
+    arr = _shelf_array()
+    kw = dict(variance_ref=5000.0, tile=40, uniform_thresh=800.0)
+    for mode in ("local", "global"):
+        a = _score_array(arr, mode=mode, accumulate="int", **kw)
+        b = _score_array(arr, mode=mode, accumulate="float", **kw)
+        assert a.gap_score == b.gap_score
+        assert a.mode == b.mode
+
+
+def test_int_path_is_exact_on_constant_image():
+    arr = np.full((96, 96), 137, np.uint8)
+    res = _score_array(arr, mode="local", variance_ref=5000.0, tile=48, uniform_thresh=1e-9)
+    # exact integer math gives variance 0.0, strictly below any positive threshold
+    assert res.gap_score == 1.0
+
+
+def test_detect_shelf_gaps_accepts_accumulate(tmp_path):
+    from PIL import Image
+    p = tmp_path / "shelf.png"
+    Image.fromarray(_shelf_array()).save(p)
+    res = detect_shelf_gaps(p, tile=40, accumulate="int", max_side=None)
+    assert 0.0 <= res.gap_score <= 1.0
+    assert "tiles" in res.notes
+
+
+def test_local_mode_returns_shelf_bands():
+    # Two "shelves": top half fully stocked (noisy), bottom half empty (flat)
+    rng = np.random.default_rng(2)
+    arr = np.full((192, 256), 200, np.uint8)
+    arr[:96] = rng.integers(0, 256, size=(96, 256), dtype=np.uint8)
+    res = _score_array(arr, mode="local", variance_ref=5000.0, tile=32, uniform_thresh=800.0)
+
+    assert res.gap_score == 0.5
+    assert [(b.top, b.bottom, b.gap_score) for b in res.bands] == [(0.0, 0.5, 0.0), (0.5, 1.0, 1.0)]
+    assert sum(b.tiles for b in res.bands) == 6 * 8
+
+
+@pytest.mark.parametrize("tile", [32, 48])
+def test_shelf_lips_do_not_split_bands(tile):
+    from scripts.bench_shelf_gaps import encode_jpeg, make_shelf_image
+    for seed in range(3):
+        jpeg = encode_jpeg(make_shelf_image(1600, 1200, seed=seed))
+        # four shelves, each band starting at its lip
+        assert [b.top for b in detect_shelf_gaps(jpeg, tile=tile).bands] == [0.0, 0.25, 0.5, 0.75]
+        # one-row lip bands come back when explicitly allowed
+        assert len(detect_shelf_gaps(jpeg, tile=tile, min_band_rows=1).bands) == 8
+
+
+def test_bands_json_round_trip():
+    from src.detect import bands_from_json
+    arr = _shelf_array()
+    res = _score_array(arr, mode="local", variance_ref=5000.0, tile=40, uniform_thresh=800.0)
+    back = bands_from_json(res.bands_json())
+    assert [(b.top, b.bottom, b.gap_score) for b in back] == [(b.top, b.bottom, b.gap_score) for b in res.bands]
+    assert _score_array(arr, mode="global", variance_ref=5000.0, tile=40, uniform_thresh=800.0).bands == ()
+
+
+def test_batch_matches_per_image_results(tmp_path):
+    from PIL import Image
+
+    paths = []
+    for i, (h, w) in enumerate([(240, 320), (240, 320), (200, 300), (30, 160)]):
+        fp = tmp_path / f"s{i}.png"
+        Image.fromarray(_shelf_array(h, w, seed=i)).save(fp)
+        paths.append(fp)
+    paths.append(tmp_path / "missing.png")
+
+    for accumulate in ("int", "float"):
+        got = detect_shelf_gaps_batch(paths, tile=40, accumulate=accumulate)
+        assert got == [detect_shelf_gaps(p, tile=40, accumulate=accumulate) for p in paths]
+    assert got[-1].notes.startswith("Error processing image")
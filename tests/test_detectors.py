@@ -0,0 +1,92 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.detectors import HeuristicBackend, gaps_from_boxes, letterbox_batch, make_backend, nms
+
+
+def _png(arr):
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _random_yolo_onnx(path, size=64, stride=16, seed=0):
+    """Tiny randomly initialized 'detector': Conv(stride) -> sigmoid -> scale -> [B, 5, A] (YOLOv8 layout)."""
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(seed)
+    w = numpy_helper.from_array(rng.normal(0, 0.1, size=(5, 3, stride, stride)).astype(np.float32), "w")
+    scale = numpy_helper.from_array(
+        np.array([size, size, size / 4, size / 4, 1.0], np.float32).reshape(1, 5, 1, 1), "scale")
+    shape = numpy_helper.from_array(np.array([0, 5, -1], np.int64), "shape")
+    nodes = [
+        helper.make_node("Conv", ["images", "w"], ["c"], strides=[stride, stride]),
+        helper.make_node("Sigmoid", ["c"], ["s"]),
+        helper.make_node("Mul", ["s", "scale"], ["m"]),
+        helper.make_node("Reshape", ["m", "shape"], ["output0"]),
+    ]
+    graph = helper.make_graph(
+        nodes, "tiny_yolo",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["N", 3, size, size])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, ["N", 5, "A"])],
+        initializer=[w, scale, shape],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return path
+
+
+def test_nms_suppresses_overlaps():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30]], np.float32)
+    scores = np.array([0.9, 0.8, 0.7], np.float32)
+    assert nms(boxes, scores, iou_thresh=0.5).tolist() == [0, 2]
+
+
+def test_letterbox_batch_layout():
+    ims = [Image.new("RGB", (200, 100), (255, 0, 0)), Image.new("RGB", (50, 100), (0, 0, 255))]
+    batch, meta = letterbox_batch(ims, 64)
+    assert batch.shape == (2, 3, 64, 64) and batch.dtype == np.float32
+    assert meta[0].pad_y == 16 and meta[0].pad_x == 0
+    assert batch[0, 0, 32, 32] == pytest.approx(1.0)         # red inside
+    assert batch[0, 0, 0, 32] == pytest.approx(114 / 255)     # padding
+
+
+def test_gaps_from_boxes_finds_missing_facing():
+    # one shelf row, facings at 0-20, 20-40, (gap 40-60), 60-80, 80-100
+    boxes = np.array([[0, 10, 20, 40], [20, 10, 40, 40], [60, 10, 80, 40], [80, 10, 100, 40]], np.float32)
+    res = gaps_from_boxes(boxes, 100, 50)
+    assert res.mode == "detector"
+    assert res.gap_score == pytest.approx(0.2)
+    assert res.regions == ((0.4, 0.2, 0.6, 0.8),)
+    assert len(res.bands) == 1 and res.bands[0].tiles == 4
+
+
+def test_onnx_backend_with_random_model(tmp_path):
+    pytest.importorskip("onnxruntime")
+    model = _random_yolo_onnx(tmp_path / "tiny.onnx")
+    backend = make_backend("onnx", model_path=model, input_size=64, conf_thresh=0.5,
+                           intra_op_threads=1, inter_op_threads=1, batch_size=3)
+    rng = np.random.default_rng(0)
+    images = [_png(rng.integers(0, 256, size=(48, 80, 3), dtype=np.uint8)) for _ in range(4)] + [b"not an image"]
+
+    dets = backend.detect_batch(images)
+    assert dets[-1] is None
+    for d in dets[:-1]:
+        assert d.boxes.shape[1] == 4
+        assert (d.boxes[:, 2] <= 80).all() and (d.boxes[:, 3] <= 48).all()
+
+    results = backend.score_batch(images)
+    assert len(results) == 5
+    assert all(0.0 <= r.gap_score <= 1.0 for r in results)
+    assert results[-1].notes.startswith("Error")
+
+
+def test_heuristic_backend_matches_detect():
+    from src.detect import detect_shelf_gaps
+    img = _png(np.full((96, 96), 200, np.uint8))
+    assert HeuristicBackend(tile=32).score_batch([img]) == [detect_shelf_gaps(img, tile=32)]
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.forecast import compute_reorder_plan, sweep_reorder_scenarios
+
+
+def _inventory(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "sku": [f"S{i:04d}" for i in range(n)],
+        "product_name": "x",
+        "on_hand": rng.integers(0, 200, n).astype(float),
+        "backroom_units": 0.0,
+        "shelf_units": 0.0,
+        "avg_daily_sales": rng.gamma(2.0, 3.0, n),
+        "lead_time_days": rng.integers(1, 14, n).astype(float),
+    })
+
+
+def test_each_scenario_matches_compute_reorder_plan():
+    df = _inventory()
+    scenarios = pd.DataFrame({
+        "scenario": ["base", "ss7", "late", "surge"],
+        "safety_stock": [np.nan, 7.0, np.nan, 3.0],
+        "lead_time_add": [0.0, 0.0, 5.0, 0.0],
+        "demand_scale": [1.0, 1.0, 1.0, 1.5],
+    })
+    results, totals = sweep_reorder_scenarios(df, scenarios, flagged_only=False, max_cells=700)
+
+    def expected(**kw):
+        d = df.assign(**kw)
+        if "avg_daily_sales" in kw:
+            d["days_of_cover"] = df["on_hand"].replace(0, 0.0001) / kw["avg_daily_sales"]
+        return compute_reorder_plan(d)["reorder_qty"].to_numpy()
+
+    for label, exp in [
+        ("base", expected()),
+        ("ss7", expected(safety_stock=7.0)),
+        ("late", expected(lead_time_days=df["lead_time_days"] + 5.0)),
+    ]:
+        got = results.loc[results["scenario"] == label, "reorder_qty"].to_numpy()
+        np.testing.assert_array_equal(got, exp)
+
+    surge = results.loc[results["scenario"] == "surge", "reorder_qty"].to_numpy()
+    np.testing.assert_allclose(surge, expected(safety_stock=3.0, avg_daily_sales=df["avg_daily_sales"] * 1.5), atol=1)
+
+    assert totals.set_index("scenario").loc["ss7", "total_units"] == expected(safety_stock=7.0).sum()
+
+
+def test_flagged_only_is_compact_and_consistent():
+    df = _inventory()
+    full, totals = sweep_reorder_scenarios(df, {"safety_stock": np.arange(1, 15)}, flagged_only=False)
+    compact, totals2 = sweep_reorder_scenarios(df, {"safety_stock": np.arange(1, 15)})
+
+    assert (compact["reorder_qty"] > 0).all()
+    assert len(compact) == int(full["reorder_flag"].sum()) == int(totals["skus_flagged"].sum())
+    pd.testing.assert_frame_equal(totals, totals2)
+    assert isinstance(compact["sku"].dtype, pd.CategoricalDtype)
+
+
+def test_unknown_scenario_parameter_rejected():
+    with pytest.raises(ValueError):
+        sweep_reorder_scenarios(_inventory(10), {"lead_time": [1.0]})
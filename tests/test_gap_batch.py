@@ -0,0 +1,67 @@
+import io
+import threading
+
+import numpy as np
+from PIL import Image
+
+import src.gap_batch as gap_batch
+from src.detect import detect_shelf_gaps
+from src.gap_batch import iter_gap_scores
+from src.gap_cache import GapCache
+
+
+def _png(seed, stocked_cols):
+    rng = np.random.default_rng(seed)
+    img = np.full((120, 160), 200, np.uint8)
+    c0, c1 = stocked_cols
+    img[:, c0:c1] = rng.integers(0, 256, size=(120, c1 - c0), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_iter_gap_scores_matches_sequential():
+    items = [(f"img{i}", _png(i, (0, 16 * i))) for i in range(1, 10)]
+    got = dict(iter_gap_scores(items, max_workers=3, tile=40))
+    assert set(got) == {k for k, _ in items}
+    for key, data in items:
+        assert got[key] == detect_shelf_gaps(data, tile=40)
+
+
+def test_iter_gap_scores_bounds_in_flight(monkeypatch):
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0}
+    real = gap_batch.detect_shelf_gaps
+
+    def tracked(image, **params):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        try:
+            return real(image, **params)
+        finally:
+            with lock:
+                state["active"] -= 1
+
+    monkeypatch.setattr(gap_batch, "detect_shelf_gaps", tracked)
+    consumed = []
+
+    def lazy():
+        for i in range(12):
+            consumed.append(i)
+            yield i, _png(i, (0, 80))
+
+    out = iter_gap_scores(lazy(), max_workers=2)
+    next(out)
+    # the producer is only pulled as far as the 2 * max_workers window
+    assert len(consumed) <= 5
+    assert len(list(out)) == 11
+    assert state["peak"] <= 2
+
+
+def test_iter_gap_scores_uses_cache():
+    cache = GapCache()
+    data = _png(0, (0, 80))
+    list(iter_gap_scores([("a", data), ("b", data)], max_workers=1, cache=cache))
+    assert cache.stats["misses"] == 1
+    assert cache.stats["hits"] == 1
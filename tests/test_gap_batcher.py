@@ -0,0 +1,70 @@
+import asyncio
+import io
+
+import numpy as np
+from PIL import Image
+
+from src.detect import detect_shelf_gaps
+from src.gap_batcher import MicroBatcher
+from src.gap_cache import GapCache
+
+
+def _png(seed):
+    rng = np.random.default_rng(seed)
+    img = np.full((120, 160), 200, np.uint8)
+    img[:, : 16 * (seed % 10)] = rng.integers(0, 256, size=(120, 16 * (seed % 10)), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_concurrent_requests_share_batches():
+    images = [_png(i) for i in range(12)]
+
+    async def run():
+        batcher = MicroBatcher(max_batch=8, max_wait_ms=50, workers=1)
+        try:
+            results = await asyncio.gather(*(batcher.score(d, tile=40) for d in images))
+            return results, batcher.stats
+        finally:
+            await batcher.close()
+
+    results, stats = asyncio.run(run())
+    assert results == [detect_shelf_gaps(d, tile=40) for d in images]
+    assert stats["requests"] == 12
+    assert stats["batches"] < 12
+    assert stats["batch_size_max"] <= 8
+    assert stats["queue_ms_p95"] >= 0.0
+
+
+def test_different_params_are_not_mixed():
+    data = _png(3)
+
+    async def run():
+        batcher = MicroBatcher(max_wait_ms=20)
+        try:
+            return await asyncio.gather(batcher.score(data, tile=40), batcher.score(data, mode="global"))
+        finally:
+            await batcher.close()
+
+    local, glob = asyncio.run(run())
+    assert local == detect_shelf_gaps(data, tile=40)
+    assert glob == detect_shelf_gaps(data, mode="global")
+
+
+def test_cache_hits_skip_the_queue():
+    cache = GapCache()
+    data = _png(5)
+
+    async def run():
+        batcher = MicroBatcher(max_wait_ms=1, cache=cache)
+        try:
+            await batcher.score(data)
+            await batcher.score(data)
+            return batcher.stats
+        finally:
+            await batcher.close()
+
+    stats = asyncio.run(run())
+    assert stats["batches"] == 1
+    assert stats["cache_hits"] == 1
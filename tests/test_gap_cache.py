@@ -0,0 +1,68 @@
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from src.detect import detect_shelf_gaps
+from src.gap_cache import GapCache
+
+
+def _png(seed=0):
+    rng = np.random.default_rng(seed)
+    arr = np.full((96, 128), 200, np.uint8)
+    arr[:, :64] = rng.integers(0, 256, size=(96, 64), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def test_hits_and_misses_by_content_and_params(tmp_path):
+    cache = GapCache(tmp_path)
+    data = _png()
+
+    first = cache.detect(data, tile=32)
+    assert first == detect_shelf_gaps(data, tile=32)
+    assert cache.detect(data, tile=32) == first
+    # explicit default == implicit default
+    assert cache.detect(data, tile=32, mode="local") == first
+    assert cache.stats["hits"] == 2 and cache.stats["misses"] == 1
+
+    cache.detect(data, tile=48)      # different params
+    cache.detect(_png(1), tile=32)   # different content
+    assert cache.stats["misses"] == 3
+
+
+def test_same_bytes_under_another_path_hit(tmp_path):
+    cache = GapCache(tmp_path / "c")
+    data = _png()
+    a, b = tmp_path / "a.png", tmp_path / "b.png"
+    a.write_bytes(data)
+    b.write_bytes(data)
+    cache.detect(a)
+    cache.detect(b)
+    assert cache.stats == {**cache.stats, "hits": 1, "misses": 1}
+
+
+def test_disk_store_survives_new_instance_and_lru_evicts(tmp_path):
+    data = _png()
+    GapCache(tmp_path).detect(data)
+
+    fresh = GapCache(tmp_path, max_entries=1)
+    fresh.detect(data)
+    assert fresh.stats["disk_hits"] == 1 and fresh.stats["misses"] == 0
+
+    fresh.detect(_png(1))
+    assert fresh.stats["entries"] == 1
+
+    t0 = time.perf_counter()
+    fresh.detect(_png(1))
+    assert time.perf_counter() - t0 < 0.01  # memory hit: hash + dict lookup
+
+
+def test_errors_are_not_cached(tmp_path):
+    cache = GapCache(tmp_path)
+    res = cache.detect(b"not an image")
+    assert res.notes.startswith("Error")
+    cache.detect(b"not an image")
+    assert cache.stats["misses"] == 2
@@ -0,0 +1,73 @@
+import csv
+
+import numpy as np
+from PIL import Image
+
+from src.gap_batch import batch_gap_scores
+from src.gap_dedup import PHashIndex, dhash
+from src.planogram import Planogram, PlanogramRegion
+
+
+def _shelf(seed, stocked=(0, 160), noise_seed=None):
+    rng = np.random.default_rng(seed)
+    img = np.full((240, 320), 200, np.uint8)
+    c0, c1 = stocked
+    img[:, c0:c1] = rng.integers(0, 256, size=(240, c1 - c0), dtype=np.uint8)
+    if noise_seed is not None:
+        jitter = np.random.default_rng(noise_seed).integers(-2, 3, size=img.shape)
+        img = np.clip(img.astype(np.int16) + jitter, 0, 255).astype(np.uint8)
+    return Image.fromarray(img)
+
+
+def test_dhash_is_stable_under_sensor_noise():
+    a = dhash(_shelf(0, noise_seed=1))
+    b = dhash(_shelf(0, noise_seed=2))
+    c = dhash(_shelf(0, stocked=(160, 320)))
+    assert bin(a ^ b).count("1") <= 4
+    assert bin(a ^ c).count("1") > 16
+
+
+def test_batch_skips_near_duplicates(tmp_path):
+    for i in range(5):
+        _shelf(0, noise_seed=i).save(tmp_path / f"A{i}.png")
+    _shelf(0, stocked=(160, 320)).save(tmp_path / "B0.png")
+    out = tmp_path / "out.csv"
+
+    index = PHashIndex(threshold=6)
+    processed, written = batch_gap_scores(tmp_path, out, tile=40, dedup=index, show_progress=False)
+
+    assert (processed, written) == (6, 6)
+    assert index.stats["skipped"] == 4
+    assert index.stats["scored"] == 2
+    rows = list(csv.DictReader(out.open(encoding="utf-8")))
+    dups = [r for r in rows if "near-duplicate of" in r["notes"]]
+    assert len(dups) == 4
+    assert len({r["gap_score"] for r in rows if r["sku"].startswith("A")}) == 1
+
+
+def test_threshold_zero_only_matches_identical_hashes():
+    index = PHashIndex(threshold=0)
+    index.add(0b1011, "a", None)
+    assert index.lookup(0b1010) is None
+    assert index.lookup(0b1011) == ("a", None)
+
+
+def test_results_only_shared_within_a_scope(tmp_path):
+    for cam in ("cam1", "cam2"):
+        (tmp_path / cam).mkdir()
+        _shelf(0).save(tmp_path / cam / "A0.png")
+    planogram = Planogram("cam1", (PlanogramRegion("LEFT", 0.0, 0.0, 0.5, 1.0),))
+    out = tmp_path / "out.csv"
+
+    index = PHashIndex(threshold=6)
+    batch_gap_scores(tmp_path, out, tile=40, dedup=index, planograms={"cam1": planogram}, show_progress=False)
+
+    # the same frame under a planogram and without one is scored both ways
+    assert index.stats["skipped"] == 0 and index.stats["scopes"] == 2
+    rows = list(csv.DictReader(out.open(encoding="utf-8")))
+    assert sorted(r["sku"] for r in rows) == ["A0", "LEFT"]
+    assert not any("near-duplicate" in r["notes"] for r in rows)
+
+    index.add(0b1011, "a", None, scope="x")
+    assert index.lookup(0b1011, scope="y") is None
+    assert index.lookup(0b1011, scope="x") == ("a", None)
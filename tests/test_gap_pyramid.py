@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.detect import _load_gray, detect_shelf_gaps
+from src.gap_pyramid import PyramidStore, disable_pyramids, enable_pyramids
+
+
+@pytest.fixture
+def shelf_jpg(tmp_path):
+    rng = np.random.default_rng(0)
+    img = np.full((1500, 2000, 3), 200, np.uint8)
+    img[:, :900] = rng.integers(0, 256, size=(1500, 900, 3), dtype=np.uint8)
+    fp = tmp_path / "shelf.jpg"
+    Image.fromarray(img).save(fp, quality=90)
+    return fp
+
+
+def test_levels_reproduce_load_gray_scores(tmp_path, shelf_jpg):
+    store = PyramidStore(tmp_path / "pyr")
+    expected = {ms: detect_shelf_gaps(shelf_jpg, max_side=ms) for ms in (1024, 512)}
+    store.build(shelf_jpg)
+    enable_pyramids(store)
+    try:
+        for ms, res in expected.items():
+            assert detect_shelf_gaps(shelf_jpg, max_side=ms) == res
+        # larger than every level: falls back to decoding the original
+        assert store.load_gray(shelf_jpg, None) is None
+    finally:
+        disable_pyramids()
+    assert store.stats["hits"] == 2
+
+
+def test_only_exact_levels_are_served(tmp_path, shelf_jpg):
+    store = PyramidStore(tmp_path / "pyr")
+    assert store.load_gray(shelf_jpg, 512) is None        # not built yet
+    store.build_async([shelf_jpg]).result()
+
+    assert max(store.load_gray(shelf_jpg, 512).size) == 512
+    # resampling the 512 level would not match decoding the original
+    assert store.load_gray(shelf_jpg, 256) is None
+
+    # an original no larger than a level is stored at full size, so any max_side is exact
+    small = tmp_path / "small.png"
+    Image.fromarray(np.random.default_rng(1).integers(0, 256, (600, 800), dtype=np.uint8)).save(small)
+    store.build(small)
+    for ms in (None, 300, 800, 2000):
+        assert np.array_equal(np.asarray(store.load_gray(small, ms)), np.asarray(_load_gray(small, ms)))
+    thumb = store.thumbnail(shelf_jpg, 128)
+    with Image.open(thumb) as t:
+        assert max(t.size) == 128 and t.mode == "RGB"
+
+
+def test_failed_images_do_not_stop_a_batch(tmp_path, shelf_jpg):
+    store = PyramidStore(tmp_path / "pyr")
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+    hashes = store.build_async([broken, tmp_path / "missing.jpg", shelf_jpg]).result()
+    assert hashes[:2] == [None, None] and hashes[2] == store.image_hash(shelf_jpg)
+    assert store.build_many([shelf_jpg, b"\xff\xd8 truncated"]) == [hashes[2], None]
+    assert store.stats["errors"] == 3
+    assert max(store.load_gray(shelf_jpg, 512).size) == 512
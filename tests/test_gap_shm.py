@@ -0,0 +1,40 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.detect import detect_shelf_gaps
+from src.gap_shm import ShmGapPool
+
+
+def _jpeg(seed, w=320, h=240):
+    rng = np.random.default_rng(seed)
+    img = np.full((h, w), 200, np.uint8)
+    c1 = 32 * (seed % 10)
+    img[:, :c1] = rng.integers(0, 256, size=(h, c1), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def test_shm_pool_matches_detect_shelf_gaps():
+    images = [_jpeg(i) for i in range(10)] + [b"not an image", _jpeg(3, w=1600, h=900)]
+    with ShmGapPool(processes=2, slots=3, max_side=512, tile=40) as pool:
+        got = pool.map(images)
+    assert got[:10] == [detect_shelf_gaps(d, tile=40, max_side=512) for d in images[:10]]
+    assert got[10].notes.startswith("Error processing image")
+    # larger than max_side: downscaled into the slot like detect_shelf_gaps would
+    assert got[11] == detect_shelf_gaps(images[11], tile=40, max_side=512)
+
+
+def test_failed_submit_releases_slot():
+    pool = ShmGapPool(processes=1, slots=2, max_side=256, tile=40)
+    try:
+        pool._procs.shutdown(wait=True)
+        fut = pool.submit(_jpeg(1))
+        with pytest.raises(RuntimeError):
+            fut.result(timeout=10)
+        assert pool._free.qsize() == 2
+    finally:
+        pool.close()
@@ -0,0 +1,72 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from src.detect import detect_shelf_gaps
+from src.gap_stream import GapStream, stream_gap_scores
+
+
+def _shelf(h=240, w=320, stocked_cols=(0, 320), seed=0):
+    rng = np.random.default_rng(seed)
+    img = np.full((h, w), 200, np.uint8)
+    c0, c1 = stocked_cols
+    img[:, c0:c1] = rng.integers(0, 256, size=(h, c1 - c0), dtype=np.uint8)
+    return img
+
+
+def _jitter(img, seed):
+    # sensor noise: +-2 gray levels
+    rng = np.random.default_rng(seed)
+    return np.clip(img.astype(np.int16) + rng.integers(-2, 3, size=img.shape), 0, 255).astype(np.uint8)
+
+
+def test_static_frames_are_skipped_and_changes_emitted():
+    full = _shelf()
+    half = _shelf(stocked_cols=(0, 160))
+    frames = [_jitter(full, i) for i in range(20)] + [_jitter(half, 100 + i) for i in range(20)]
+
+    stream = GapStream(tile=40)
+    updates = list(stream.run(frames))
+
+    assert [u.index for u in updates] == [0, 20]
+    assert updates[0].result.gap_score < updates[1].result.gap_score
+    assert stream.stats["scored"] == 2
+    assert stream.stats["skipped"] == 38
+
+
+def test_stream_scores_match_detect_shelf_gaps():
+    img = _shelf(stocked_cols=(40, 200))
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, format="PNG")
+    data = buf.getvalue()
+
+    (update,) = list(stream_gap_scores([img, data], tile=40))
+    assert update.result == detect_shelf_gaps(data, tile=40)
+
+
+def test_refresh_every_forces_rescore():
+    img = _shelf()
+    stream = GapStream(tile=40, refresh_every=4)
+    for _ in range(10):
+        stream.push(img)
+    # frame 0 scored, then every 5th frame (4 skips in between)
+    assert stream.scored == 2
+    assert stream.emitted == 1
+
+
+def test_corrupt_frames_reported_without_breaking_the_stream():
+    buf = io.BytesIO()
+    Image.fromarray(_shelf()).save(buf, format="JPEG", quality=90)
+    good = buf.getvalue()
+    frames = [good, b"not an image", good[: len(good) // 3], good]
+
+    stream = GapStream(tile=40)
+    updates = list(stream.run(frames))
+
+    assert [u.index for u in updates] == [0, 1, 2]
+    assert updates[0].error is None
+    assert all(u.error and u.result.notes.startswith("Error processing image") for u in updates[1:])
+    # the last good frame matches the reference kept from frame 0, so it is skipped
+    assert stream.stats["errors"] == 2 and stream.stats["scored"] == 1 and stream.stats["skipped"] == 1
+    assert stream.last_emitted == updates[0].result
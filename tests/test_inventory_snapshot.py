@@ -0,0 +1,86 @@
+import io
+import os
+import time
+
+import pandas as pd
+
+from src.inventory_snapshot import SnapshotCache
+from src.reorder_plan import shared_plan_table
+from src.tools import tool_load_inventory, tool_lookup_sku, tool_reorder_plan
+
+
+def _write(dirpath, n=50, on_hand=10.0, parquet=False):
+    df = pd.DataFrame({
+        "sku": [f"FOODS_{i:03d}" for i in range(n)],
+        "product_name": [f"P{i}" for i in range(n)],
+        "on_hand": on_hand,
+        "backroom_units": 4.0,
+        "shelf_units": on_hand - 4.0,
+        "avg_daily_sales": 2.0,
+        "lead_time_days": 3.0,
+    })
+    fp = dirpath / ("inventory_clean.parquet" if parquet else "inventory_clean.csv")
+    if parquet:
+        df.to_parquet(fp, index=False)
+    else:
+        df.to_csv(fp, index=False)
+    return fp
+
+
+def test_snapshot_reused_until_file_changes(tmp_path):
+    cache = SnapshotCache()
+    fp = _write(tmp_path)
+    a = cache.get(tmp_path)
+    assert cache.get(tmp_path) is a
+    assert a.kpis == {"unique_sku": 50, "total_on_hand": 500, "avg_daily_sales_mean": 2.0}
+
+    _write(tmp_path, on_hand=20.0)
+    os.utime(fp, ns=(time.time_ns(), time.time_ns() + 10**9))
+    b = cache.get(tmp_path)
+    assert b is not a and b.kpis["total_on_hand"] == 1000
+
+    cache.invalidate()
+    assert cache.get(tmp_path) is not b
+    assert cache.stats["loads"] == 3
+
+
+def test_prefers_newer_parquet(tmp_path):
+    cache = SnapshotCache()
+    _write(tmp_path, on_hand=10.0)
+    pq = _write(tmp_path, on_hand=30.0, parquet=True)
+    os.utime(pq, ns=(time.time_ns(), time.time_ns() + 10**9))
+    snap = cache.get(tmp_path)
+    assert snap.source[0].endswith(".parquet")
+    assert snap.kpis["total_on_hand"] == 1500
+
+
+def test_find_exact_then_contains(tmp_path):
+    _write(tmp_path)
+    snap = SnapshotCache().get(tmp_path)
+    assert snap.find("foods_007") == 7
+    assert snap.find("_04") == 40
+    assert snap.find("nope") is None
+    assert snap.row(7)["sku"] == "FOODS_007"
+
+
+def test_tools_read_through_snapshot(tmp_path):
+    _write(tmp_path)
+    assert "'unique_sku': 50" in tool_load_inventory(tmp_path)
+    line = tool_lookup_sku("foods_012", tmp_path)
+    assert line.startswith("SKU FOODS_012: on_hand=10") and "days_cover≈5.0" in line
+    assert "not found" in tool_lookup_sku("XYZ", tmp_path)
+    plan = tool_reorder_plan(5, tmp_path)
+    assert plan.splitlines()[0].startswith("sku,")
+    assert len(plan.strip().splitlines()) == 6
+    assert "No processed inventory" in tool_load_inventory(tmp_path / "missing")
+
+
+def test_reorder_plan_tool_ignores_plans_synced_from_other_data(tmp_path):
+    fp = _write(tmp_path, n=20)
+    # the app planning from DuckDB (different rows) uses its own table
+    shared_plan_table(("duckdb", str(tmp_path / "retail.duckdb"))).sync(
+        pd.read_csv(fp).assign(sku=lambda d: "OTHER_" + d["sku"], on_hand=0.0))
+    plan = pd.read_csv(io.StringIO(tool_reorder_plan(50, tmp_path)))
+    assert len(plan) == 20 and plan["sku"].str.startswith("FOODS_").all()
+    # the app planning from the same file shares the tool's table
+    assert shared_plan_table(("file", str(fp))).top_n(50)["sku"].tolist() == plan["sku"].tolist()
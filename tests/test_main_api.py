@@ -0,0 +1,63 @@
+import io
+import json
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.detect import detect_shelf_gaps
+from src.gap_cache import GapCache
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")            # TestClient transport
+pytest.importorskip("multipart")        # python-multipart, for UploadFile fields
+
+
+def _jpeg(seed, w=320, h=240):
+    rng = np.random.default_rng(seed)
+    img = np.full((h, w), 200, np.uint8)
+    c1 = 32 * (seed % 10)
+    img[:, :c1] = rng.integers(0, 256, size=(h, c1), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def _expected(data, **params):
+    return json.loads(json.dumps(detect_shelf_gaps(data, **params).to_dict()))
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    from fastapi.testclient import TestClient
+
+    main = pytest.importorskip("src.main")       # also needs the chat stack (langchain, OpenAI client)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main._gap_batcher, "cache", GapCache(tmp_path_factory.mktemp("gap_cache")))
+        with TestClient(main.app) as c:
+            yield c
+
+
+def test_detect_single_file(client):
+    data = _jpeg(3)
+    r = client.post("/detect", params={"tile": 40}, files={"file": ("shelf.jpg", data, "image/jpeg")})
+    assert r.status_code == 200
+    assert r.json() == _expected(data, tile=40)
+
+
+def test_detect_many_files_in_upload_order(client):
+    images = [_jpeg(i) for i in range(4)]
+    r = client.post(
+        "/detect", params={"mode": "global"},
+        files=[("files", (f"{i}.jpg", d, "image/jpeg")) for i, d in enumerate(images)],
+    )
+    assert r.status_code == 200
+    assert r.json()["results"] == [_expected(d, mode="global") for d in images]
+
+
+def test_detect_rejects_bad_requests(client):
+    assert client.post("/detect").status_code == 400
+    bad_mode = client.post("/detect", params={"mode": "fancy"}, files={"file": ("a.jpg", _jpeg(1), "image/jpeg")})
+    assert bad_mode.status_code == 422
+    broken = client.post("/detect", files={"file": ("a.jpg", b"not an image", "image/jpeg")})
+    assert broken.status_code == 200 and broken.json()["notes"].startswith("Error processing image")
@@ -0,0 +1,77 @@
+import csv
+import json
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.detect import GapResult, detect_shelf_gaps
+from src.gap_batch import batch_gap_scores
+from src.gap_cache import GapCache
+from src.planogram import Planogram, PlanogramRegion, load_planograms, region_masks
+
+
+def _shelf():
+    # top shelf fully stocked; bottom shelf: left half stocked, right half empty; plain ceiling/floor
+    rng = np.random.default_rng(0)
+    img = np.full((480, 640), 210, np.uint8)
+    img[80:240, :] = rng.integers(0, 256, size=(160, 640), dtype=np.uint8)
+    img[280:440, :320] = rng.integers(0, 256, size=(160, 320), dtype=np.uint8)
+    return img
+
+
+PLANO = Planogram("cam1", (
+    PlanogramRegion("TOP", 0.0, 1 / 6, 1.0, 0.5),
+    PlanogramRegion("LOW_L", 0.0, 7 / 12, 0.5, 11 / 12),
+    PlanogramRegion("LOW_R", 0.5, 7 / 12, 1.0, 11 / 12),
+))
+
+
+def test_per_sku_scores_and_masks(tmp_path):
+    fp = tmp_path / "s.png"
+    Image.fromarray(_shelf()).save(fp)
+    res = detect_shelf_gaps(fp, tile=40, planogram=PLANO)
+
+    scores = {k.sku: k.gap_score for k in res.skus}
+    assert scores == {"TOP": 0.0, "LOW_L": 0.0, "LOW_R": 1.0}
+    # the uniform ceiling/floor no longer count towards the image score
+    assert res.gap_score < detect_shelf_gaps(fp, tile=40).gap_score
+    assert GapResult.from_dict(res.to_dict()) == res
+
+    masks = region_masks(PLANO, 480, 640, 40)
+    assert masks is region_masks(PLANO, 480, 640, 40)   # precomputed once per frame size
+    assert (masks[0].rows, masks[0].cols) == (slice(80, 240), slice(0, 640))
+
+
+def test_cache_keys_distinguish_planograms(tmp_path):
+    fp = tmp_path / "s.png"
+    Image.fromarray(_shelf()).save(fp)
+    cache = GapCache()
+    a = cache.detect(fp, tile=40, planogram=PLANO)
+    b = cache.detect(fp, tile=40)
+    assert a.skus and not b.skus
+    assert cache.detect(fp, tile=40, planogram=PLANO) == a
+    assert cache.stats["hits"] == 1
+
+
+def test_batch_writes_one_row_per_sku(tmp_path):
+    cam = tmp_path / "shelves" / "cam1"
+    cam.mkdir(parents=True)
+    Image.fromarray(_shelf()).save(cam / "frame_0001.png")
+    spec = tmp_path / "planograms.json"
+    spec.write_text(json.dumps({"cam1": [
+        {"sku": r.sku, "box": [r.x0, r.y0, r.x1, r.y1]} for r in PLANO.regions
+    ]}))
+
+    out = tmp_path / "out.csv"
+    processed, written = batch_gap_scores(
+        tmp_path / "shelves", out, tile=40, planograms=load_planograms(spec), show_progress=False,
+    )
+    assert (processed, written) == (1, 3)
+    rows = list(csv.DictReader(out.open(encoding="utf-8")))
+    assert {r["sku"]: float(r["gap_score"]) for r in rows} == {"TOP": 0.0, "LOW_L": 0.0, "LOW_R": 1.0}
+
+
+def test_invalid_region_rejected():
+    with pytest.raises(ValueError):
+        PlanogramRegion("X", 0.5, 0.0, 0.4, 1.0)
@@ -0,0 +1,113 @@
+import os
+import time
+
+import duckdb
+import pandas as pd
+import pytest
+
+from db.database_manager import DatabaseManager, close_pools
+from db.query_cache import QueryResultCache, bump_table_version, default_result_cache, normalize_sql, write_target
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "retail.duckdb")
+    with duckdb.connect(path) as con:
+        con.execute("CREATE TABLE inv AS SELECT 'I' || i AS item_id, i AS unit FROM range(100) t(i)")
+        con.execute("CREATE TABLE sales AS SELECT 'I' || (i % 10) AS item_id, 1 AS qty FROM range(50) t(i)")
+    yield path
+    close_pools()
+
+
+def test_write_target_and_normalize():
+    assert normalize_sql("SELECT  *\n FROM inv ;") == "SELECT * FROM inv"
+    assert write_target("INSERT INTO main.Inv VALUES (1)") == "inv"
+    assert write_target('create or replace table "sales" as select 1') == "sales"
+    assert write_target("DELETE FROM inv WHERE 1") == "inv"
+    assert write_target("CHECKPOINT") is None
+
+
+def test_repeat_query_served_from_cache(db_path):
+    cache = QueryResultCache()
+    db = DatabaseManager(db_path, result_cache=cache)
+    q = "SELECT count(*) AS n FROM inv WHERE unit < ?"
+    first = db.execute_query(q, (10,))
+    assert "cached" not in first
+    again = db.execute_query("SELECT count(*) AS n\n  FROM inv WHERE unit < ?;", (10,))
+    assert again["cached"] and int(again["data"]["n"].iloc[0]) == 10
+    # callers get their own copy
+    again["data"].loc[0, "n"] = -1
+    assert int(db.execute_query(q, (10,))["data"]["n"].iloc[0]) == 10
+    # different parameters are a different entry; per-call opt-out bypasses the cache
+    assert "cached" not in db.execute_query(q, (20,))
+    assert "cached" not in db.execute_query(q, (10,), use_cache=False)
+    assert cache.stats["hits"] == 2 and cache.stats["entries"] == 2
+
+
+def test_writes_invalidate_only_affected_tables(db_path):
+    cache = QueryResultCache()
+    db = DatabaseManager(db_path, result_cache=cache)
+    inv_q, sales_q = "SELECT count(*) AS n FROM inv", "SELECT sum(qty) AS n FROM sales"
+    db.execute_query(inv_q)
+    db.execute_query(sales_q)
+
+    assert db.execute_query("INSERT INTO inv VALUES ('x', 1)")["success"]
+    assert int(db.execute_query(inv_q)["data"]["n"].iloc[0]) == 101     # recomputed
+    assert db.execute_query(sales_q)["cached"]                            # untouched table
+
+    # out-of-band ingest through the process-wide cache
+    shared = DatabaseManager(db_path, result_cache=True)
+    shared.execute_query(sales_q)
+    assert shared.execute_query(sales_q)["cached"]
+    bump_table_version(db_path, "sales")
+    assert "cached" not in shared.execute_query(sales_q)
+    assert default_result_cache().stats["invalidations"] >= 1
+
+
+def test_ttl_and_byte_budget():
+    cache = QueryResultCache(max_bytes=4000, ttl=0.05)
+    df = pd.DataFrame({"x": range(100)})          # ~928 bytes
+    for i in range(5):
+        cache.put(cache.key("db", f"SELECT {i}", None), df)
+    assert cache.stats["bytes"] <= 4000 and cache.stats["evictions"] >= 1
+    assert cache.get(cache.key("db", "SELECT 0", None)) is None      # least recently used went first
+    assert cache.get(cache.key("db", "SELECT 4", None)) is not None
+    time.sleep(0.06)
+    assert cache.get(cache.key("db", "SELECT 4", None)) is None      # expired
+    big = cache.key("db", "SELECT big", None)
+    cache.put(big, pd.DataFrame({"x": range(1000)}))
+    assert cache.get(big) is None                                     # over a quarter of the budget
+
+
+def test_result_computed_before_a_write_is_not_cached():
+    cache = QueryResultCache()
+    key = cache.key("db", "SELECT count(*) FROM inv", None)
+    before = cache.versions(key)
+    cache.bump("db", "inv")                      # a write lands while the query runs
+    cache.put(key, pd.DataFrame({"n": [100]}), versions=before)
+    assert cache.get(key) is None and cache.stats["stale_puts"] == 1
+    # writes to tables the query does not read do not matter
+    before = cache.versions(key)
+    cache.bump("db", "sales")
+    cache.put(key, pd.DataFrame({"n": [101]}), versions=before)
+    assert cache.get(key)[0]["n"].iloc[0] == 101
+
+
+def test_views_invalidated_by_writes_to_their_tables(db_path):
+    cache = QueryResultCache()
+    db = DatabaseManager(db_path, result_cache=cache)
+    assert db.execute_query("CREATE VIEW v AS SELECT sum(unit) AS s FROM inv")["success"]
+    assert db.execute_query("CREATE VIEW vv AS SELECT s * 2 AS s2 FROM v")["success"]
+    assert int(db.execute_query("SELECT s FROM v")["data"]["s"].iloc[0]) == 4950
+    assert db.execute_query("SELECT s2 FROM vv")["success"]
+    assert db.execute_query("SELECT s FROM v")["cached"]
+
+    assert db.execute_query("INSERT INTO inv VALUES ('x', 50)")["success"]
+    res = db.execute_query("SELECT s FROM v")
+    assert "cached" not in res and int(res["data"]["s"].iloc[0]) == 5000
+    res = db.execute_query("SELECT s2 FROM vv")                     # a view over a view
+    assert "cached" not in res and int(res["data"]["s2"].iloc[0]) == 10000
+    # and out-of-band ingest into the base table
+    db.execute_query("SELECT s FROM v")
+    cache.bump(os.path.abspath(db_path), "inv")
+    assert "cached" not in db.execute_query("SELECT s FROM v")
@@ -0,0 +1,81 @@
+import time
+
+import duckdb
+import pytest
+
+from db.database_manager import DatabaseManager, close_pools
+from db.query_guard import QueryGuard, add_limit
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "retail.duckdb")
+    with duckdb.connect(path) as con:
+        con.execute("CREATE TABLE sales AS SELECT 'I' || (i % 1000) AS item_id, i % 7 AS sale FROM range(200000) t(i)")
+        con.execute("CREATE TABLE inv AS SELECT 'I' || i AS item_id, i AS unit FROM range(1000) t(i)")
+    yield DatabaseManager(path, read_only=True)
+    close_pools()
+
+
+def test_add_limit():
+    assert add_limit("SELECT * FROM inv ORDER BY unit LIMIT 5;", 100) == ("SELECT * FROM inv ORDER BY unit LIMIT 5", False)
+    sql, injected = add_limit("SELECT * FROM inv LIMIT 500", 100)
+    assert injected and sql == "SELECT * FROM (\nSELECT * FROM inv LIMIT 500\n) AS _guarded LIMIT 100"
+    assert add_limit("SELECT * FROM inv WHERE unit IN (SELECT 1 LIMIT 1)", 100)[1]
+    # comments and literals are left as written
+    assert add_limit("SELECT * FROM inv LIMIT 5 -- top five\n;", 100) == ("SELECT * FROM inv LIMIT 5 -- top five", False)
+    assert add_limit("SELECT ';' AS s; -- done", 100)[0] == "SELECT * FROM (\nSELECT ';' AS s\n) AS _guarded LIMIT 100"
+
+
+def test_queries_with_comments(db):
+    guard = QueryGuard(db, row_limit=10)
+    res = guard.execute("-- items with stock\nSELECT item_id, unit\nFROM inv -- every row\nWHERE unit < 50 /* ; */\nORDER BY unit")
+    assert res["success"] and res["row_count"] == 10 and res["truncated"]
+    assert res["data"]["unit"].tolist() == list(range(10))
+    res = guard.execute("SELECT count(*) AS n FROM inv; -- total")
+    assert res["success"] and res["data"]["n"].iloc[0] == 1000
+    # statements are counted by the parser, not by looking for ";"
+    assert guard.execute("SELECT ';' AS s")["data"]["s"].iloc[0] == ";"
+    assert not guard.execute("SELECT 1; DELETE FROM inv")["success"]
+    assert not guard.execute("SELEC 1")["success"]
+
+
+def test_limit_injected_and_truncation_reported(db):
+    guard = QueryGuard(db, row_limit=1000)
+    res = guard.execute("SELECT * FROM sales ORDER BY sale DESC, item_id")
+    assert res["success"] and res["row_count"] == 1000 and res["truncated"]
+    assert res["guard"]["limit_injected"] and res["data"]["sale"].iloc[0] == 6
+    small = guard.execute("SELECT item_id, sum(sale) AS s FROM sales GROUP BY 1 ORDER BY s DESC LIMIT 5")
+    assert small["row_count"] == 5 and not small["truncated"] and not small["guard"]["limit_injected"]
+
+
+def test_expensive_plans_rejected_before_running(db):
+    guard = QueryGuard(db, max_estimated_rows=10_000_000)
+    t = time.perf_counter()
+    res = guard.execute("SELECT count(*) FROM sales a, sales b")
+    assert time.perf_counter() - t < 1
+    assert not res["success"] and res["too_expensive"] and res["reason"] == "cross_product"
+    assert res["estimated_rows"] >= 200000 ** 2
+    res = guard.execute("SELECT count(*) FROM range(100000000000) t(i)")
+    assert res["too_expensive"] and res["reason"] == "estimated_rows"
+    # an equi-join of the same tables is fine
+    assert guard.execute("SELECT count(*) AS n FROM sales JOIN inv USING (item_id)")["success"]
+    assert not guard.execute("DELETE FROM inv")["success"]
+    assert guard.stats["rejected"] == 2
+
+
+def test_timeout_interrupts(db):
+    with db.get_connection() as con:
+        default_memory = con.execute("SELECT current_setting('memory_limit')").fetchone()[0]
+    guard = QueryGuard(db, max_estimated_rows=float("inf"), timeout=0.2, memory_limit="512MB", threads=1)
+    t = time.perf_counter()
+    res = guard.execute("SELECT count(*) FROM range(100000000000) t(i) WHERE i % 7 = 3")
+    assert time.perf_counter() - t < 5
+    assert res["too_expensive"] and res["reason"] == "timeout"
+    # the cursor is usable again; the instance caps hold only while guarded queries run
+    assert guard.execute("SELECT count(*) AS n FROM inv")["data"]["n"].iloc[0] == 1000
+    capped = guard.execute("SELECT current_setting('memory_limit') AS m")["data"]["m"].iloc[0]
+    assert capped != default_memory and capped.endswith("MiB")
+    with db.get_connection() as con:
+        assert con.execute("SELECT current_setting('memory_limit')").fetchone()[0] == default_memory
+    assert guard.stats["timeouts"] == 1
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cleaning import clean_inventory_df
+from src.forecast import compute_reorder_plan
+from src.reorder_plan import ReorderPlanTable
+
+
+def _inventory(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "sku": [f"S{i:04d}" for i in range(n)],
+        "product_name": [f"P{i}" for i in range(n)],
+        "on_hand": rng.integers(0, 200, n).astype(float),
+        "backroom_units": 0.0,
+        "shelf_units": 0.0,
+        "avg_daily_sales": rng.gamma(2.0, 3.0, n),
+        "lead_time_days": rng.integers(1, 14, n).astype(float),
+    })
+
+
+def _expected_top(df, n):
+    plan = compute_reorder_plan(df)
+    return plan.sort_values(["reorder_qty", "sku"], ascending=[False, True]).head(n).reset_index(drop=True)
+
+
+def test_top_n_matches_full_recompute():
+    df = _inventory()
+    table = ReorderPlanTable(df)
+    got = table.top_n(25)
+    exp = _expected_top(df, 25)
+    assert got["sku"].tolist() == exp["sku"].tolist()
+    assert got["reorder_qty"].tolist() == exp["reorder_qty"].tolist()
+
+
+def test_upsert_recomputes_only_changed_rows():
+    df = _inventory()
+    table = ReorderPlanTable(df)
+    before = table.rows_recomputed
+
+    delta = pd.DataFrame({"sku": ["S0003", "S0100"], "on_hand": [0.0, 5000.0]})
+    assert table.upsert(delta) == 2
+    assert table.rows_recomputed - before == 2
+
+    df2 = df.set_index("sku")
+    df2.loc[["S0003", "S0100"], "on_hand"] = [0.0, 5000.0]
+    df2 = df2.reset_index()
+    assert table.top_n(len(df))["reorder_qty"].tolist() == _expected_top(df2, len(df))["reorder_qty"].tolist()
+    assert table.get("S0100")["reorder_qty"] == 0
+
+
+def test_sync_diffs_snapshots():
+    df = clean_inventory_df(_inventory())
+    table = ReorderPlanTable(df)
+
+    df2 = df.copy()
+    df2.loc[df2["sku"] == "S0007", "on_hand"] = 1.0
+    df2 = df2[df2["sku"] != "S0008"]
+    df2 = pd.concat([df2, df2.iloc[:1].assign(sku="NEW1")], ignore_index=True)
+    df2 = clean_inventory_df(df2)
+
+    assert table.sync(df2) == 2          # S0007 changed + NEW1 added
+    assert table.get("S0008") is None
+    assert table.stats["skus"] == len(df2)
+    assert table.top_n(len(df2))["reorder_qty"].tolist() == _expected_top(df2, len(df2))["reorder_qty"].tolist()
+
+
+def test_partial_upsert_rederives_days_of_cover():
+    df = clean_inventory_df(_inventory())
+    table = ReorderPlanTable(df)
+    table.upsert(pd.DataFrame({"sku": ["S0007"], "on_hand": [1.0]}))
+    ads = float(df.loc[df["sku"] == "S0007", "avg_daily_sales"].iloc[0])
+    assert table.get("S0007")["days_of_cover"] == pytest.approx(1.0 / ads)
+
+
+def test_new_sku_needs_required_columns():
+    table = ReorderPlanTable(_inventory(5))
+    with pytest.raises(ValueError):
+        table.upsert(pd.DataFrame({"sku": ["NEW"], "on_hand": [1.0]}))
@@ -0,0 +1,89 @@
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cleaning import clean_inventory_df
+from src.forecast import compute_reorder_plan
+from src.reorder_sql import (
+    count_reorder_plan,
+    create_reorder_plan_view,
+    export_reorder_plan,
+    query_reorder_plan,
+)
+
+
+def _inventory(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    on_hand = rng.integers(0, 200, n).astype(float)
+    return pd.DataFrame({
+        "sku": [f"S{i:04d}" for i in range(n)],
+        "product_name": [f"Product {i}" for i in range(n)],
+        "on_hand": on_hand,
+        "backroom_units": 0.0,
+        "shelf_units": on_hand,
+        "avg_daily_sales": np.where(rng.random(n) < 0.05, 0.0, rng.gamma(2.0, 3.0, n)),
+        "lead_time_days": rng.integers(1, 14, n).astype(float),
+    })
+
+
+def _con(df):
+    con = duckdb.connect()
+    con.register("df_inv", df)
+    con.execute("CREATE TABLE inventory AS SELECT * FROM df_inv")
+    con.unregister("df_inv")
+    assert create_reorder_plan_view(con)
+    return con
+
+
+def _expected(df):
+    plan = compute_reorder_plan(df)
+    return plan.sort_values(["reorder_qty", "sku"], ascending=[False, True]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("cleaned", [False, True])
+def test_view_matches_compute_reorder_plan(cleaned):
+    df = _inventory()
+    if cleaned:
+        df = clean_inventory_df(df)     # adds days_of_cover and safety_stock
+    con = _con(df)
+    got = query_reorder_plan(con, limit=len(df))
+    exp = _expected(df)
+    assert got["sku"].tolist() == exp["sku"].tolist()
+    assert got["reorder_qty"].tolist() == exp["reorder_qty"].tolist()
+    assert got["reorder_flag"].tolist() == exp["reorder_flag"].tolist()
+    np.testing.assert_allclose(got["days_of_cover"], exp["days_of_cover"])
+
+
+def test_paging_filter_and_counts():
+    df = _inventory()
+    con = _con(df)
+    exp = _expected(df)
+    page = query_reorder_plan(con, limit=20, offset=40)
+    assert page["sku"].tolist() == exp["sku"].iloc[40:60].tolist()
+
+    flagged = query_reorder_plan(con, limit=10_000, flagged_only=True)
+    assert len(flagged) == int(exp["reorder_flag"].sum())
+
+    hits = query_reorder_plan(con, search="product 12", limit=100)
+    assert set(hits["sku"]) == {s for s, p in zip(df["sku"], df["product_name"]) if "product 12" in p.lower()}
+    assert count_reorder_plan(con) == {"skus": len(df), "flagged": int(exp["reorder_flag"].sum())}
+
+    with pytest.raises(ValueError):
+        query_reorder_plan(con, order_by="sku; DROP TABLE inventory")
+
+
+def test_export_csv_and_parquet(tmp_path):
+    df = _inventory(100)
+    con = _con(df)
+    exp = _expected(df)
+    csv = pd.read_csv(export_reorder_plan(con, tmp_path / "plan.csv"))
+    parq = pd.read_parquet(export_reorder_plan(con, tmp_path / "plan.parquet", flagged_only=True))
+    assert csv["sku"].tolist() == exp["sku"].tolist()
+    assert parq["sku"].tolist() == exp.loc[exp["reorder_flag"], "sku"].tolist()
+    with pytest.raises(ValueError):
+        export_reorder_plan(con, tmp_path / "plan.xlsx")
+
+
+def test_missing_source_table():
+    assert create_reorder_plan_view(duckdb.connect()) is False
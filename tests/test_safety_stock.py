@@ -0,0 +1,105 @@
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+
+from db.database_manager import DatabaseManager
+from src.forecast import compute_reorder_plan
+from src.safety_stock import (
+    DemandSigmaCache,
+    safety_stock_units,
+    service_level_z,
+    with_service_level_safety_stock,
+)
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "retail.duckdb")
+    with duckdb.connect(path) as con:
+        con.execute("CREATE TABLE sales (item_id VARCHAR, date TIMESTAMP, sale BIGINT)")
+        # A: sells 10/day for 10 days; B: sells 20 on day 0 and day 9 only (gap days count as 0)
+        con.execute("""
+            INSERT INTO sales
+            SELECT 'A', TIMESTAMP '2025-01-01' + INTERVAL (i) DAY, 10 FROM range(10) t(i)
+            UNION ALL SELECT 'B', TIMESTAMP '2025-01-01', 20
+            UNION ALL SELECT 'B', TIMESTAMP '2025-01-10', 20
+        """)
+    return DatabaseManager(db_path=path)
+
+
+def test_service_level_z():
+    assert service_level_z(0.5) == pytest.approx(0.0)
+    assert service_level_z(0.95) == pytest.approx(1.6449, abs=1e-4)
+    with pytest.raises(ValueError):
+        service_level_z(1.0)
+
+
+def test_sigma_matches_pandas_with_zero_filled_days(db):
+    sigma = DemandSigmaCache().get(db).set_index("item_id")
+    b = np.zeros(10)
+    b[[0, 9]] = 20
+    assert sigma.loc["A", "sigma_daily"] == pytest.approx(0.0)
+    assert sigma.loc["A", "mean_daily"] == pytest.approx(10.0)
+    assert sigma.loc["B", "sigma_daily"] == pytest.approx(b.std(ddof=1))
+    assert sigma.loc["B", "mean_daily"] == pytest.approx(4.0)
+    assert int(sigma.loc["B", "sales_days"]) == 2
+
+
+def test_cache_invalidates_on_new_sales(db):
+    cache = DemandSigmaCache(check_interval=0)
+    first = cache.get(db)
+    assert cache.get(db) is first
+    assert cache.stats["hits"] == 1
+    with db.get_connection(write=True) as con:
+        con.execute("INSERT INTO sales VALUES ('A', TIMESTAMP '2025-01-11', 100)")
+    second = cache.get(db)
+    assert second is not first
+    assert cache.sigma(db, "A") > 0
+    assert cache.sigma(db, "missing") is None
+
+
+def test_watermark_checked_once_per_interval(db):
+    cache = DemandSigmaCache(check_interval=60)
+    frame = cache.get(db)
+    for item in ["A", "B", "missing"] * 100:
+        cache.sigma(db, item)
+    assert cache.stats["checks"] == 1 and cache.stats["misses"] == 1
+    assert cache.sigma(db, "B") == pytest.approx(float(frame.set_index("item_id").loc["B", "sigma_daily"]))
+
+
+def test_safety_stock_feeds_reorder_plan(db):
+    sigma = DemandSigmaCache().get(db)
+    inv = pd.DataFrame({
+        "sku": ["A", "B", "C"],
+        "product_name": ["a", "b", "c"],
+        "on_hand": [0.0, 0.0, 0.0],
+        "backroom_units": 0.0,
+        "shelf_units": 0.0,
+        "avg_daily_sales": [10.0, 4.0, 5.0],
+        "lead_time_days": [4.0, 4.0, 4.0],
+    })
+    out = with_service_level_safety_stock(inv, sigma, service_level=0.95)
+    sig_b = float(sigma.set_index("item_id").loc["B", "sigma_daily"])
+    assert out.loc[0, "safety_stock"] == pytest.approx(0.0)                  # no variability
+    assert out.loc[1, "safety_stock"] == pytest.approx(float(safety_stock_units(sig_b, 4, 0.95)) / 4.0)
+    assert out.loc[2, "safety_stock"] == 2.0                                 # no sales history
+    plan = compute_reorder_plan(out)
+    assert plan["reorder_qty"].tolist()[0] == np.ceil((4 + 0.0 - 0.0001 / 10) * 10)
+
+
+def test_sigma_sums_rows_per_day_across_stores(tmp_path):
+    path = str(tmp_path / "stores.duckdb")
+    rng = np.random.default_rng(0)
+    per_store = rng.integers(0, 10, size=(2, 30))
+    with duckdb.connect(path) as con:
+        con.execute("CREATE TABLE sales (store_id VARCHAR, item_id VARCHAR, date TIMESTAMP, sale BIGINT)")
+        con.executemany(
+            "INSERT INTO sales VALUES (?, 'A', TIMESTAMP '2025-01-01' + INTERVAL (?) DAY, ?)",
+            [(f"S{s}", d, int(per_store[s, d])) for s in range(2) for d in range(30)],
+        )
+    sigma = DemandSigmaCache().get(DatabaseManager(db_path=path)).set_index("item_id")
+    daily = per_store.sum(axis=0)
+    assert sigma.loc["A", "sigma_daily"] == pytest.approx(daily.std(ddof=1))
+    assert sigma.loc["A", "mean_daily"] == pytest.approx(daily.mean())
+    assert int(sigma.loc["A", "sales_days"]) == 30
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.search_index import NgramIndex, shared_index
+
+
+def _catalog(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array(["shampoo", "vanilla", "ice", "cream", "milk", "bread", "organic", "soap"])
+    return pd.DataFrame({
+        "sku": [f"FOODS_{i % 3}_{i:05d}" for i in range(n)],
+        "product_name": [" ".join(words[rng.integers(0, len(words), 2)]) + f" {i}" for i in range(n)],
+    })
+
+
+def _contains(df, q):
+    q = q.lower()
+    m = df["sku"].str.lower().str.contains(q, regex=False) | df["product_name"].str.lower().str.contains(q, regex=False)
+    return set(np.flatnonzero(m.to_numpy()))
+
+
+@pytest.mark.parametrize("q", ["foods_1_0012", "_0001", "cream", "milk sh", "Vanilla Ice", "7", "ic"])
+def test_substring_results_match_full_scan(q):
+    df = _catalog()
+    idx = NgramIndex(df["sku"].tolist(), df["product_name"].tolist())
+    hits = idx.search(q, limit=len(df), fuzzy=False)
+    # queries shorter than a trigram are answered by a scan
+    assert {r for r, _ in hits} == _contains(df, q)
+
+
+def test_ranking_exact_prefix_substring():
+    idx = NgramIndex(["ab123", "ab1234", "xab123", "zzz"], ["", "", "", "ab123 pack"])
+    hits = idx.search("AB123", limit=10, fuzzy=False)
+    assert hits == [
+        (0, 1.0),       # exact
+        (1, 0.9),       # prefix of sku
+        (3, 0.9),       # prefix of product_name
+        (2, 0.8),       # substring
+    ]
+
+
+def test_short_query_substrings_ranked_after_prefixes():
+    idx = NgramIndex(["xab", "ab", "abc", "zzz"], ["", "", "", "slab"])
+    assert idx.search("AB", limit=10) == [(1, 1.0), (2, 0.9), (0, 0.8), (3, 0.8)]
+    assert idx.search("b", limit=2) == [(0, 0.8), (1, 0.8)]
+
+
+def test_typo_tolerant():
+    df = _catalog()
+    idx = NgramIndex(df["sku"].tolist(), df["product_name"].tolist())
+    hits = idx.search("vanila creem", limit=5)
+    assert hits
+    top = df["product_name"].iloc[hits[0][0]]
+    assert "vanilla" in top or "cream" in top
+    assert all(s < 0.8 for _, s in hits)
+    assert idx.search("qqqqqq", limit=5) == []
+
+
+def test_search_frame_and_shared_index():
+    df = _catalog(100)
+    a = shared_index(("test", 1), df)
+    assert shared_index(("test", 1), df) is a
+    assert shared_index(("test", 2), df) is not a
+    out = a.search_frame(df, "foods_2_0000", limit=3)
+    assert list(out.columns) == ["sku", "product_name", "match_score"]
+    assert out["sku"].str.startswith("FOODS_2_0000").all()
+
+
+def test_long_values_are_capped_and_short_queries_limited():
+    from src.search_index import _MAX_CHARS
+
+    names = ["x" * 5000, "ab cream", "milk", "cab"]
+    idx = NgramIndex(["s1", "s2", "s3", "s4"], names)
+    assert max(len(v) for v in idx._fields[1]) == _MAX_CHARS
+    assert idx.search("x" * 10, fuzzy=False) == [(0, 0.9)]
+    # short queries stop at `limit` and keep row order across fields
+    assert idx.search("s", limit=2, fuzzy=False) == [(0, 0.9), (1, 0.9)]
+    assert idx.search("ab", limit=10, fuzzy=False) == [(1, 0.9), (3, 0.8)]